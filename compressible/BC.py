@@ -61,14 +61,13 @@ def user(bc_name, bc_edge, variable, ccdata):
                 ener = ccdata.get_var("energy")
 
                 grav = ccdata.get_aux("grav")
-                gamma = ccdata.get_aux("gamma")
 
                 dens_base = dens[:,myg.jlo]
                 ke_base = 0.5*(xmom[:,myg.jlo]**2 + ymom[:,myg.jlo]**2) / \
                     dens[:,myg.jlo]
 
                 eint_base = (ener[:,myg.jlo] - ke_base)/dens[:,myg.jlo]
-                pres_base = eos.pres(gamma, dens_base, eint_base)
+                pres_base = eos.pres(dens_base, eint_base)
 
                 # we are assuming that the density is constant in this
                 # formulation of HSE, so the pressure comes simply from
@@ -76,7 +75,7 @@ def user(bc_name, bc_edge, variable, ccdata):
                 j = myg.jlo-1
                 while j >= 0:
                     pres_below = pres_base - grav*dens_base*myg.dy
-                    rhoe = eos.rhoe(gamma, pres_below)
+                    rhoe = eos.rhoe(dens_base, pres_below)
 
                     ener[:,j] = rhoe + ke_base
 
@@ -106,21 +105,20 @@ def user(bc_name, bc_edge, variable, ccdata):
                 ener = ccdata.get_var("energy")
 
                 grav = ccdata.get_aux("grav")
-                gamma = ccdata.get_aux("gamma")
 
                 dens_base = dens[:,myg.jhi]
                 ke_base = 0.5*(xmom[:,myg.jhi]**2 + ymom[:,myg.jhi]**2) / \
                     dens[:,myg.jhi]
 
                 eint_base = (ener[:,myg.jhi] - ke_base)/dens[:,myg.jhi]
-                pres_base = eos.pres(gamma, dens_base, eint_base)
+                pres_base = eos.pres(dens_base, eint_base)
 
                 # we are assuming that the density is constant in this
                 # formulation of HSE, so the pressure comes simply from
                 # differencing the HSE equation
                 for j in range(myg.jhi+1, myg.jhi+myg.ng+1):
                     pres_above = pres_base + grav*dens_base*myg.dy
-                    rhoe = eos.rhoe(gamma, pres_above)
+                    rhoe = eos.rhoe(dens_base, pres_above)
 
                     ener[:,j] = rhoe + ke_base
 
@@ -0,0 +1,19 @@
+"""
+Convert the pickled NIST tables to the memory-mapped columnar format of
+compressible/nist_tables.py.  The species are then read one property
+at a time with nist_tables.NISTTable, so the database no longer needs
+to be split into per-species pickles.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+
+import compressible.nist_tables as nist_tables
+from util import msg
+
+filename = 'NIST_tables_2000.pkl'
+
+msg.bold("converting " + filename)
+names = nist_tables.convert_pickle([filename], 'NIST_tables_2000.nist')
+print("{} species: {}".format(len(names), " ".join(names)))
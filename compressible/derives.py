@@ -21,7 +21,9 @@ def derive_primitives(myd, varnames):
     e = (ener - 0.5*dens*(u*u + v*v))/dens
 
     gamma = myd.get_aux("gamma")
-    p = eos.pres(dens, e)
+
+    # p, T, c and gamma from one EOS evaluation per cell
+    p, T, cs, gamma_eos = eos.state(dens, e)
     # to import the class attributes
     p = p*dens/dens
     if isinstance(varnames, str):
@@ -49,7 +51,13 @@ def derive_primitives(myd, varnames):
             derived_vars.append(p)
 
         elif var == "soundspeed":
-            derived_vars.append(eos.sound(p, dens))
+            derived_vars.append(cs*dens/dens)
+
+        elif var in ["T", "temperature"]:
+            derived_vars.append(T*dens/dens)
+
+        elif var == "gamma":
+            derived_vars.append(gamma_eos*dens/dens)
 
 
     if len(derived_vars) > 1:
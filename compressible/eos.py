@@ -1,425 +1,131 @@
 """
-This is a gamma-law equation of state: p = rho e (gamma - 1), where
-gamma is the constant ratio of specific heats.
+The equation of state.  The EOS is evaluated by one of the backends of
+eos_backends.py, chosen with the runtime parameters eos.backend and
+eos.fluid when init() is called, and the functions
+
+  pres(dens, eint), dens(pres, eint), rhoe(dens, pres),
+  sound(p, dens), state(dens, eint), derivs(dens, eint),
+  thermo(dens, eint)
+
+of this module are those of that backend (or their memoized versions,
+see eos_cache.py).  Until init() is called, the CoolProp EOS of
+nitrogen is used.  The single-state callbacks of the flux kernels get
+the backend functions, bypassing the memoization, with direct(name).
+If eos.profile is set, all of them record their calls by call site
+(see eos_profile.py).
 """
-from CoolProp.CoolProp import PropsSI
-from CoolProp.CoolProp import PhaseSI
-fluid = 'Nitrogen'
-from pdb import set_trace as keyboard
-import numpy as np
-import preos_cy as PREOS
-#import preos
-import thermodynamics_tools as tools
+import compressible.eos_backends as eos_backends
+import compressible.eos_cache as eos_cache
+import compressible.eos_profile as eos_profile
+from util import msg
 
-#PREOS = preos.peng_robinson_fluid()
 
-eqofst = 'coolprop'
+# the EOS backend in use -- this is set up by init()
+_backend = None
 
-if eqofst == 'PREOS':
+# the EOS functions of the backend, and their memoized versions if
+# eos.memoize is set -- init() then replaces the module functions by
+# the memoized ones
+_raw = {}
+_caches = {}
 
-    def pres(dens, eint):
-        """
-        Given the density and the specific internal energy, return the
-        pressure
+# the functions returned by direct(), and the profile of the calls if
+# eos.profile is set
+_direct = {}
+_profile = None
 
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        dens : float
-            The density
-        eint : float
-            The specific internal energy
+_names = ["pres", "dens", "rhoe", "sound", "state", "derivs", "thermo"]
 
-        Returns
-        -------
-        out : float
-           The pressure
 
-         """
-        #p = dens*eint*(gamma - 1.0)
-        # p = eint.copy()
-        # if (eint.ndim == 2):
-        #     for i in range(np.shape(eint)[0]):
-        #         for j in range(np.shape(eint)[1]):
-        #             if dens[i][j] < 0.1 :
-        #                 p[i][j] = 0.0
-        #                 continue
-        #             p[i][j] = PropsSI('P', 'UMASS', eint[i][j],'DMASS', dens[i][j], fluid)
-        #     p = np.array(p, order = 'F')
-        #     return p
-        # else:
-        #     p = PropsSI('P', 'UMASS', eint,'DMASS', dens, fluid)
-        #     p = np.array(p, order = 'F')
-        #     return p
+def set_backend(backend):
+    """
+    Evaluate the EOS with backend (an EOSBackend object), without
+    memoization.
+    """
+    global _backend, _profile
 
+    _backend = backend
+    _caches.clear()
+    _profile = None
 
-        T = np.ones(np.shape(dens))
-        p = np.ones(np.shape(dens))
-        if (dens.ndim == 2):
-            for i in range(np.shape(dens)[0]):
-                # if dens[i].any() < 0.1:
-                #     temp = dens[i]
-                #     temp[temp < 0.1] = np.nan
-                #     dens[i] = temp
-                #     continue
+    for name in _names:
+        _raw[name] = getattr(backend, name)
+        _direct[name] = _raw[name]
+        globals()[name] = _raw[name]
 
-                eint[i] = tools.convertMassToMolar(eint[i], 28.0134)
-                T[i] = PREOS.getTfromEandRho(eint[i],dens[i])
-                p[i] = PREOS.getPfromTandRho(T[i], dens[i])
-            keyboard()
-            return p
-        else:
-            eint= tools.convertMassToMolar(eint, 28.0134)
-            T_in = PREOS.getTfromEandRho(eint,dens)
-            p = PREOS.getPfromTandRho(T, dens)
-            keyboard()
-        return p
 
-    def dens(pres, eint):
-        """
-        Given the pressure and the specific internal energy, return
-        the density
+def get_backend():
+    """ the EOSBackend object in use """
+    return _backend
 
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
-        eint : float
-            The specific internal energy
 
-        Returns
-        -------
-        out : float
-           The density
+def direct(name):
+    """
+    the function name of the backend, not memoized (for the single
+    states of the callbacks of the flux kernels)
+    """
+    return _direct[name]
 
-        """
-        #dens = pres/(eint*(gamma - 1.0))
-        keyboard()
-        dens = PropsSI('DMASS', 'UMASS', eint,'P', pres, fluid)
-        dens = np.array(dens, order = 'F')
-        return dens
 
+def get_profile():
+    """ the EOSProfile of the calls, or None if eos.profile is not set """
+    return _profile
 
-    def rhoe(dens, pres):
-        """
-        Given the pressure, return (rho * e)
 
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
+set_backend(eos_backends.get_backend("coolprop", "Nitrogen"))
 
-        Returns
-        -------
-        out : float
-           The internal energy density, rho e
 
-        """
-        #rhoe = pres/(gamma - 1.0)
-        #eint = pres.copy()
-        # if (eint.ndim == 2):
-        #     for i in range(np.shape(pres)[0]):
-        #         for j in range(np.shape(pres)[1]):
-        #             if dens[i][j] < 0.1 :
-        #                 eint[i][j] = 0.0
-        #                 continue
-        #             eint[i][j] = PropsSI('UMASS', 'P', pres[i][j],'DMASS', dens[i][j], fluid)
-        #     rhoe = np.array(dens*eint, order = 'F')
-        #     return rhoe
-        # else:
-        #     eint = PropsSI('P', 'UMASS', eint,'DMASS', dens, fluid)
-        #     rhoe = np.array(dens*eint, order = 'F')
-        #     return rhoe
-        MW = 28.0134
-        T = np.ones(np.shape(dens))
-        eint = np.ones(np.shape(dens))
-        if (dens.ndim == 2):
-            for i in range(np.shape(dens)[0]):
-                # if dens[i].any() < 0.1:
-                #     temp = dens[i]
-                #     temp[temp < 0.1] = np.nan
-                #     dens[i] = temp
-                #     continue
-                T[i] = PREOS.getTfromPandRho(pres[i], dens[i])
-                #T[i] = PropsSI('T', 'P', pres[i], 'DMASS', dens[i], 'Nitrogen')
-                eint[i] = PREOS.getEnergyfromTandRho(T[i], dens[i])
-                eint[i] = tools.convertMolarToMass(eint[i], MW) #J/Kg
-            keyboard()
-            return dens*eint
-        else:
-            T = PREOS.getTfromPandRho(pres, dens)
-            #T = PropsSI('T', 'P', pres, 'DMASS', dens, 'Nitrogen')
-            eint = PREOS.getEnergyfromTandRho(T, dens)
-            eint = tools.convertMolarToMass(eint, MW)
-            keyboard()
-        return dens*eint
+def init(rp, tc=None):
+    """
+    Set up the equation of state from the runtime parameters: the
+    backend eos.backend (see eos_backends.py) for the fluid eos.fluid.
+    The backends that are too slow on single states (the table) turn
+    on compressible.batched_eos.
+    If eos.memoize is enabled, pres, rhoe, sound and state are wrapped
+    in a MemoizedEOS (see eos_cache.py), whose statistics are added to
+    the report of tc.  If eos.profile is enabled, the EOS functions
+    record their calls, by call site, in an EOSProfile (see
+    eos_profile.py), which is also added to the report of tc.
 
+    Parameters
+    ----------
+    rp : RuntimeParameters object
+        The runtime parameters for the simulation
+    tc : TimerCollection object, optional
+        The timers of the simulation, for the memoization, the phase
+        index and the profile reports
 
-        # T_in = PREOS.NewtonIterate_TemperaturefromPrho(dens, pres, T_in = 300.0, eps= 1E-10, omega = 1.0)
-        # eint = PREOS.getEnergyfromVolumeTemperature(T_in)
-        # rhoe = dens*eint
-        #rhoe = np.array(dens*eint, order = 'F')
-        # return rhoe
+    """
+    global pres, rhoe, sound, state, _profile
 
-        # eint = PropsSI('UMASS', 'P', pres, 'DMASS', dens, fluid)
-        # rhoe = np.array(dens*eint, order = 'F')
-        #return rhoe
+    set_backend(eos_backends.get_backend(rp.get_param("eos.backend"),
+                                         rp.get_param("eos.fluid"), rp))
 
-elif eqofst == 'coolprop':
+    if _backend.batched and not rp.get_param("compressible.batched_eos"):
+        msg.warning("the {} EOS is too slow for the per-interface callbacks, "
+                    "setting compressible.batched_eos = 1".format(_backend.name))
+        rp.params["compressible.batched_eos"] = 1
 
-    def pres(dens, eint):
-        """
-        Given the density and the specific internal energy, return the
-        pressure
+    if tc is not None and _backend.phase_index is not None:
+        tc.add_report("EOS phase index", _backend.phase_index.report)
 
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        dens : float
-            The density
-        eint : float
-            The specific internal energy
+    if rp.get_param("eos.memoize"):
+        for name in ["pres", "rhoe", "sound", "state"]:
+            _caches[name] = eos_cache.MemoizedEOS(_raw[name], name,
+                                                  rtol=rp.get_param("eos.memoize_rtol"),
+                                                  maxsize=rp.get_param("eos.memoize_size"))
+        pres, rhoe, sound, state = \
+            _caches["pres"], _caches["rhoe"], _caches["sound"], _caches["state"]
 
-        Returns
-        -------
-        out : float
-           The pressure
+        if tc is not None:
+            tc.add_report("EOS memoization",
+                          lambda: [_caches[n].report() for n in ["pres", "rhoe", "sound", "state"]])
+
+    if rp.get_param("eos.profile"):
+        _profile = eos_profile.EOSProfile()
+        for name in _names:
+            globals()[name] = _profile.wrap(globals()[name], name)
+            _direct[name] = _profile.wrap(_raw[name], name)
 
-         """
-        # p = dens*eint*(gamma - 1.0)
-        p = np.zeros(np.shape(eint))
-        if (eint.ndim == 2):
-            for i in range(np.shape(eint)[0]):
-                for j in range(np.shape(eint)[1]):
-                    if dens[i][j] < 0.1 :
-                        p[i][j] = 0.0
-                        continue
-                    p[i][j] = PropsSI('P', 'UMASS', eint[i][j],'DMASS', dens[i][j], fluid)
-            return p
-        else:
-            p = PropsSI('P', 'UMASS', eint,'DMASS', dens, fluid)
-            #keyboard()
-            #p = np.array(p, order = 'F')
-            return p
-
-
-        # T = np.ones(np.shape(dens))
-        # p = np.ones(np.shape(dens))
-        # if (dens.ndim == 2):
-        #     for i in range(np.shape(dens)[0]):
-        #         # if dens[i].any() < 0.1:
-        #         #     temp = dens[i]
-        #         #     temp[temp < 0.1] = np.nan
-        #         #     dens[i] = temp
-        #         #     continue
-
-        #         eint[i] = tools.convertMassToMolar(eint[i], 28.0134)
-        #         T[i] = PREOS.getTfromEandRho(eint[i],dens[i])
-        #         p[i] = PREOS.getPfromTandRho(T[i], dens[i])
-        #     keyboard()
-        #     return p
-        # else:
-        #     eint= tools.convertMassToMolar(eint, 28.0134)
-        #     T_in = PREOS.getTfromEandRho(eint,dens)
-        #     p = PREOS.getPfromTandRho(T, dens)
-        #     keyboard()
-        #return p
-
-    def dens(pres, eint):
-        """
-        Given the pressure and the specific internal energy, return
-        the density
-
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
-        eint : float
-            The specific internal energy
-
-        Returns
-        -------
-        out : float
-           The density
-
-        """
-        #dens = pres/(eint*(gamma - 1.0))
-        dens = PropsSI('DMASS', 'UMASS', eint,'P', pres, fluid)
-        dens = np.array(dens, order = 'F')
-        return dens
-
-
-    def rhoe(dens, pres):
-        """
-        Given the pressure, return (rho * e)
-
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
-
-        Returns
-        -------
-        out : float
-           The internal energy density, rho e
-
-        """
-        #rhoe = pres/(gamma - 1.0)
-        eint = np.zeros(np.shape(pres))
-        if (eint.ndim == 2):
-            for i in range(np.shape(pres)[0]):
-                for j in range(np.shape(pres)[1]):
-                    if dens[i][j] < 0.1 :
-                        eint[i][j] = 0.0
-                        continue
-                    eint[i][j] = PropsSI('UMASS', 'P', pres[i][j],'DMASS', dens[i][j], fluid)
-            rhoe = np.array(dens*eint, order = 'F')
-            return rhoe
-        else:
-            eint = PropsSI('UMASS', 'P', pres,'DMASS', dens, fluid)
-            rhoe = np.array(dens*eint, order = 'F')
-            return rhoe
-        # MW = 28.0134
-        # T = np.ones(np.shape(dens))
-        # eint = np.ones(np.shape(dens))
-        # if (dens.ndim == 2):
-        #     for i in range(np.shape(dens)[0]):
-        #         # if dens[i].any() < 0.1:
-        #         #     temp = dens[i]
-        #         #     temp[temp < 0.1] = np.nan
-        #         #     dens[i] = temp
-        #         #     continue
-        #         print pres[i], dens[i]
-        #         T[i] = PREOS.getTfromPandRho(pres[i], dens[i])
-        #         #T[i] = PropsSI('T', 'P', pres[i], 'DMASS', dens[i], 'Nitrogen')
-        #         eint[i] = PREOS.getEnergyfromTandRho(T[i], dens[i])
-        #         eint[i] = tools.convertMolarToMass(eint[i], MW) #J/Kg
-        #     keyboard()
-        #     return dens*eint
-        # else:
-        #     T = PREOS.getTfromPandRho(pres, dens)
-        #     #T = PropsSI('T', 'P', pres, 'DMASS', dens, 'Nitrogen')
-        #     eint = PREOS.getEnergyfromTandRho(T, dens)
-        #     eint = tools.convertMolarToMass(eint, MW)
-        #     keyboard()
-        #return dens*eint
-
-
-        # T_in = PREOS.NewtonIterate_TemperaturefromPrho(dens, pres, T_in = 300.0, eps= 1E-10, omega = 1.0)
-        # eint = PREOS.getEnergyfromVolumeTemperature(T_in)
-        # rhoe = dens*eint
-        #rhoe = np.array(dens*eint, order = 'F')
-        # return rhoe
-
-        # eint = PropsSI('UMASS', 'P', pres, 'DMASS', dens, fluid)
-        # rhoe = np.array(dens*eint, order = 'F')
-        #return rhoe
-
-    def sound(p, dens):
-
-        sos = np.zeros(np.shape(p))
-        # if (eint.ndim == 2):
-        #     for i in range(np.shape(pres)[0]):
-        #         for j in range(np.shape(pres)[1]):
-        #             if dens[i][j] < 0.1 :
-        #                 eint[i][j] = 0.0
-        #                 continue
-        #             eint[i][j] = PropsSI('UMASS', 'P', pres[i][j],'DMASS', dens[i][j], fluid)
-        #     rhoe = np.array(dens*eint, order = 'F')
-        #     return rhoe
-        if (sos.ndim == 2):
-            for i in range(np.shape(p)[0]):
-                sos[i] = PropsSI('A', 'P', p[i],'DMASS', dens[i], fluid)
-            sos = np.array(sos, order = 'F')
-            return sos
-        else:
-            sos = PropsSI('A', 'P', p,'DMASS', dens, fluid)
-            sos = np.array(sos, order = 'F')
-            return sos
-
-elif eqofst == 'ideal':
-
-    def pres(dens, eint):
-        """
-        Given the density and the specific internal energy, return the
-        pressure
-
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        dens : float
-            The density
-        eint : float
-            The specific internal energy
-
-        Returns
-        -------
-        out : float
-           The pressure
-
-        """
-        gamma = 1.4
-        p = dens*eint*(gamma - 1.0)
-        return p
-
-
-    def dens(gamma, pres, eint):
-        """
-        Given the pressure and the specific internal energy, return
-        the density
-
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
-        eint : float
-            The specific internal energy
-
-        Returns
-        -------
-        out : float
-           The density
-
-        """
-        dens = pres/(eint*(gamma - 1.0))
-        return dens
-
-
-    def rhoe(gamma, pres):
-        """
-        Given the pressure, return (rho * e)
-
-        Parameters
-        ----------
-        gamma : float
-            The ratio of specific heats
-        pres : float
-            The pressure
-
-        Returns
-        -------
-        out : float
-           The internal energy density, rho e
-
-        """
-        gamma = 1.4
-        rhoe = pres/(gamma - 1.0)
-        return rhoe
-
-    def sound(p, dens):
-        gamma = 1.4
-        sound = np.sqrt(gamma*p/dens)
-        return sound
\ No newline at end of file
+        if tc is not None:
+            tc.add_report("EOS calls", _profile.report)
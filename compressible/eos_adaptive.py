@@ -0,0 +1,424 @@
+"""
+An adaptively refined equation of state table.  Near the critical
+point and the pseudo-critical (Widom) line the properties vary so
+sharply that a uniform table fine enough there is far too large
+everywhere else.  This table is made of blocks in (log rho, e), each a
+uniform patch of m x m cells, and a block is split into 4 children
+until the bilinear interpolation of p, T and c at its cell centers is
+within a relative tolerance of the reference EOS (or max_level is
+reached):
+
+   level 0             level 1            level 2
+  +-------+-------+   +---+---+-------+   +---+-+-+-------+
+  |       |       |   |   |   |       |   |   +-+-+       |
+  |       |       |   +---+---+       |   +---+---+       |
+  |       |       |   |   |   |       |   |   |   |       |
+  +-------+-------+   +---+---+-------+   +---+---+-------+
+
+A query descends from the root block holding it to its leaf, with one
+comparison per level, and is interpolated in the leaf.  The table has
+the fields and the query interface of eos_table.EOSTable (lookup, pres,
+temp, sound, gamma, derivs, eint).
+
+  tab = build_adaptive_table(props, rho_min, rho_max, e_min, e_max, tol=1.e-3)
+  p = tab.pres(dens, eint)
+
+"""
+
+from __future__ import print_function
+
+import copy
+
+import numpy as np
+
+import compressible.eos_table as eos_table
+from util import msg
+
+
+class AdaptiveEOSTable(object):
+    """
+    a block-refined (log rho, e) table of thermodynamic state variables
+    """
+
+    all_fields = eos_table.EOSTable.all_fields
+
+    def __init__(self, rho_min, rho_max, e_min, e_max, nblock=(8, 8), m=8):
+        """
+        Initialize the root blocks (no data yet, see refine()).
+
+        Parameters
+        ----------
+        rho_min, rho_max : float
+            The density range covered by the table (rho_min > 0)
+        e_min, e_max : float
+            The specific internal energy range covered by the table
+        nblock : tuple of int, optional
+            The number of root blocks in log rho and in e
+        m : int, optional
+            The number of cells of a block in each direction
+
+        """
+
+        if rho_min <= 0.0:
+            msg.fail("ERROR: the adaptive EOS table needs rho_min > 0")
+
+        self.rho_min = rho_min
+        self.rho_max = rho_max
+        self.e_min = e_min
+        self.e_max = e_max
+
+        self.x_min = np.log(rho_min)
+        self.nbx, self.nby = nblock
+        self.m = m
+
+        # the size of the root blocks
+        self.hx = (np.log(rho_max) - self.x_min)/self.nbx
+        self.hy = (e_max - e_min)/self.nby
+
+        # the blocks: lower left corner, level, and the index of the
+        # first of their 4 children (-1 for the leaves).  The root
+        # block (i, j) is block i*nby + j, and child q = 2*qx + qy of
+        # block b is block child[b] + q
+        i, j = np.meshgrid(np.arange(self.nbx), np.arange(self.nby), indexing="ij")
+        self.x0 = self.x_min + self.hx*i.ravel()
+        self.y0 = self.e_min + self.hy*j.ravel()
+        self.level = np.zeros(self.nbx*self.nby, dtype=np.intp)
+        self.child = np.full(self.nbx*self.nby, -1, dtype=np.intp)
+
+        # the fields at the (m+1) x (m+1) nodes of each block, and the
+        # interpolation error measured in each block
+        self.fields = []
+        self.data = {}
+        self.error = np.zeros(0)
+
+
+    def astype(self, dtype):
+        """ a copy of the table with the fields stored as dtype """
+        tab = copy.copy(self)
+        tab.data = {n: np.asarray(self.data[n], dtype=dtype) for n in self.fields}
+        return tab
+
+    @property
+    def nbytes(self):
+        """ the memory used by the tabulated fields """
+        return sum(self.data[n].nbytes for n in self.fields)
+
+    @property
+    def nblocks(self):
+        return len(self.level)
+
+    @property
+    def max_level(self):
+        return int(self.level.max())
+
+    def leaves(self):
+        """ the indices of the leaf blocks """
+        return np.flatnonzero(self.child < 0)
+
+
+    def _points(self, blocks, offset):
+        """
+        the (rho, e) of the nodes (offset = 0, shape (n, m+1, m+1)) or
+        of the cell centers (offset = 0.5, shape (n, m, m)) of blocks
+        """
+        npt = self.m + 1 - 2*offset
+        s = (np.arange(int(npt)) + offset)/self.m
+        hx = self.hx/2.0**self.level[blocks]
+        hy = self.hy/2.0**self.level[blocks]
+        x = self.x0[blocks, np.newaxis, np.newaxis] + hx[:, np.newaxis, np.newaxis]*s[np.newaxis, :, np.newaxis]
+        y = self.y0[blocks, np.newaxis, np.newaxis] + hy[:, np.newaxis, np.newaxis]*s[np.newaxis, np.newaxis, :]
+        x, y = np.broadcast_arrays(x, y)
+        return np.exp(x), y.copy()
+
+    def _evaluate(self, props, blocks):
+        """ evaluate the reference EOS at the nodes of blocks """
+        rho, e = self._points(blocks, 0)
+        new = eos_table._evaluate(props, rho, e)
+        if not self.data:
+            self.fields = [n for n in self.all_fields if n in new]
+            self.data = {n: new[n] for n in self.fields}
+        else:
+            for n in self.fields:
+                self.data[n] = np.concatenate([self.data[n], new[n]])
+        self.error = np.concatenate([self.error, np.zeros(len(blocks))])
+
+    def _block_error(self, props, blocks):
+        """
+        the max. relative error of p, T and c at the cell centers of
+        each of blocks.  States the reference cannot evaluate are
+        ignored
+        """
+        rho, e = self._points(blocks, 0.5)
+        exact = eos_table._evaluate(props, rho, e)
+
+        err = np.zeros(len(blocks))
+        for n in ["p", "T", "c"]:
+            f = self.data[n][blocks]
+            approx = 0.25*(f[:, :-1, :-1] + f[:, 1:, :-1] + f[:, :-1, 1:] + f[:, 1:, 1:])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                r = np.abs(approx - exact[n])/np.abs(exact[n])
+            r[~np.isfinite(r)] = 0.0
+            err = np.maximum(err, r.reshape(len(blocks), -1).max(axis=1))
+        return err
+
+    def _split(self, blocks):
+        """ create the 4 children of each of blocks, return their indices """
+        n = len(blocks)
+        first = self.nblocks + 4*np.arange(n)
+        self.child[blocks] = first
+
+        lev = self.level[blocks] + 1
+        hx = self.hx/2.0**lev
+        hy = self.hy/2.0**lev
+
+        x0 = np.repeat(self.x0[blocks], 4) + np.tile([0, 0, 1, 1], n)*np.repeat(hx, 4)
+        y0 = np.repeat(self.y0[blocks], 4) + np.tile([0, 1, 0, 1], n)*np.repeat(hy, 4)
+
+        self.x0 = np.concatenate([self.x0, x0])
+        self.y0 = np.concatenate([self.y0, y0])
+        self.level = np.concatenate([self.level, np.repeat(lev, 4)])
+        self.child = np.concatenate([self.child, np.full(4*n, -1, dtype=np.intp)])
+
+        return self.nblocks - 4*n + np.arange(4*n)
+
+    def refine(self, props, tol, max_level):
+        """
+        Evaluate the root blocks and split the blocks, level by level,
+        until the interpolation error of each leaf is below tol or the
+        leaf is at max_level.  Each level is a single (vectorized) call
+        of props.
+        """
+        blocks = np.arange(self.nblocks)
+        self._evaluate(props, blocks)
+
+        for lev in range(max_level + 1):
+            err = self._block_error(props, blocks)
+            self.error[blocks] = err
+            if lev == max_level:
+                break
+            coarse = blocks[err > tol]
+            if len(coarse) == 0:
+                break
+            blocks = self._split(coarse)
+            self._evaluate(props, blocks)
+
+
+    def _log_rho(self, rho):
+        """
+        log rho, with rho clamped to the range of the table (the empty
+        cells of the solids have rho = 0)
+        """
+        return np.log(np.clip(rho, self.rho_min, self.rho_max))
+
+    def leaf(self, rho, e):
+        """
+        the leaf block holding each state (rho, e), found by descending
+        from its root block, one comparison per level
+        """
+        return self._leaf(self._log_rho(rho), e)
+
+    def _leaf(self, x, e):
+        """ the leaf block holding each state (exp(x), e) """
+        i = np.clip(np.floor((x - self.x_min)/self.hx).astype(np.intp), 0, self.nbx-1)
+        j = np.clip(np.floor((e - self.e_min)/self.hy).astype(np.intp), 0, self.nby-1)
+        b = i*self.nby + j
+
+        while True:
+            c = self.child[b]
+            act = np.flatnonzero(c >= 0)
+            if len(act) == 0:
+                break
+            ba = b[act]
+            half = 0.5**(self.level[ba] + 1)
+            qx = x[act] - self.x0[ba] >= self.hx*half
+            qy = e[act] - self.y0[ba] >= self.hy*half
+            b[act] = c[act] + 2*qx + qy
+
+        return b
+
+    def lookup(self, rho, e, names=None):
+        """
+        Interpolate several fields at once, sharing the leaf search.
+
+        Parameters
+        ----------
+        rho : ndarray
+            The density
+        e : ndarray
+            The specific internal energy
+        names : list of str, optional
+            The fields to return (defaults to all of them)
+
+        Returns
+        -------
+        out : list of ndarray
+            The interpolated fields, in the order of names
+
+        """
+
+        if names is None:
+            names = self.fields
+        shape = np.shape(rho)
+        rho = np.asarray(rho, dtype=np.float64).ravel()
+        e = np.broadcast_to(np.asarray(e, dtype=np.float64), shape).ravel()
+
+        x = self._log_rho(rho)
+        b = self._leaf(x, e)
+
+        # bilinear interpolation in the leaf (linear extrapolation in e
+        # outside of the table, the density is clamped to its range)
+        scale = self.m*2.0**self.level[b]
+        sx = (x - self.x0[b])/self.hx*scale
+        sy = (e - self.y0[b])/self.hy*scale
+        i = np.clip(np.floor(sx).astype(np.intp), 0, self.m-1)
+        j = np.clip(np.floor(sy).astype(np.intp), 0, self.m-1)
+        tx = sx - i
+        ty = sy - j
+
+        out = []
+        for n in names:
+            f = self.data[n]
+            v = (1.0 - tx)*((1.0 - ty)*f[b, i, j] + ty*f[b, i, j+1]) + \
+                tx*((1.0 - ty)*f[b, i+1, j] + ty*f[b, i+1, j+1])
+            out.append(v.reshape(shape))
+        return out
+
+
+    def pres(self, rho, e):
+        """ the pressure as a function of (rho, e) """
+        return self.lookup(rho, e, ["p"])[0]
+
+    def temp(self, rho, e):
+        """ the temperature as a function of (rho, e) """
+        return self.lookup(rho, e, ["T"])[0]
+
+    def sound(self, rho, e):
+        """ the sound speed as a function of (rho, e) """
+        return self.lookup(rho, e, ["c"])[0]
+
+    def gamma(self, rho, e):
+        """ the effective ratio of specific heats as a function of (rho, e) """
+        return self.lookup(rho, e, ["gamma"])[0]
+
+    def derivs(self, rho, e):
+        """ (dp/drho)_e and (dp/de)_rho as functions of (rho, e) """
+        return self.lookup(rho, e, ["dpdrho_e", "dpde_rho"])
+
+    def eint(self, rho, p, niter=52):
+        """
+        Invert the table for the specific internal energy given the
+        density and the pressure, by bisection over [e_min, e_max]
+        (the pressure increases with e at fixed density away from the
+        two-phase region).
+
+        Parameters
+        ----------
+        rho : ndarray
+            The density
+        p : ndarray
+            The pressure
+        niter : int, optional
+            The number of bisections
+
+        Returns
+        -------
+        out : ndarray
+           The specific internal energy
+
+        """
+
+        shape = np.shape(rho)
+        rho = np.asarray(rho, dtype=np.float64).ravel()
+        p = np.broadcast_to(np.asarray(p, dtype=np.float64), shape).ravel()
+
+        lo = np.full(rho.shape, self.e_min)
+        hi = np.full(rho.shape, self.e_max)
+        for _ in range(niter):
+            mid = 0.5*(lo + hi)
+            below = self.pres(rho, mid) <= p
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+
+        return (0.5*(lo + hi)).reshape(shape)
+
+
+    def report(self, tol):
+        """
+        Print the number of blocks of each level, the largest leaf
+        error and the memory used, compared with a uniform table of
+        the finest resolution.
+        """
+        leaves = self.leaves()
+        nodes = self.nblocks*(self.m + 1)**2
+
+        msg.bold("EOS adaptive table: {} blocks of {} x {} cells, levels 0 - {}, rho = [{}, {}], e = [{}, {}]".format(
+            self.nblocks, self.m, self.m, self.max_level,
+            self.rho_min, self.rho_max, self.e_min, self.e_max))
+        for lev in range(self.max_level + 1):
+            n = np.count_nonzero(self.level[leaves] == lev)
+            print("   level {:2d}: {:8d} leaves".format(lev, n))
+
+        err = self.error[leaves]
+        print("   max. leaf error = {:10.4g} (tolerance {:g}), {} leaves above it".format(
+            err.max(), tol, np.count_nonzero(err > tol)))
+
+        if "dpdrho_e" in self.data:
+            rho, _ = self._points(leaves, 0)
+            err = eos_table.sound_consistency({n: self.data[n][leaves] for n in self.fields}, rho)
+            print("   c^2 vs. dp/drho|e + p/rho^2 dp/de|rho: max rel. difference = {:10.4g}".format(err))
+
+        fine = (self.nbx*self.m*2**self.max_level + 1)*(self.nby*self.m*2**self.max_level + 1)
+        size = self.data[self.fields[0]].itemsize
+        print("   {:.4g} MB, a uniform table of the finest resolution: {:.4g} MB".format(
+            size*len(self.fields)*nodes/2**20, size*len(self.fields)*fine/2**20))
+
+
+def build_adaptive_table(props, rho_min, rho_max, e_min, e_max, tol=1.e-3,
+                         nblock=(8, 8), m=8, max_level=6, report=True,
+                         dtype=np.float64):
+    """
+    Tabulate a reference EOS on blocks in (log rho, e), refined until
+    the interpolation error is below tol.
+
+    Parameters
+    ----------
+    props : function
+        The reference EOS, props(rho, e) -> (p, T, c) or (p, T, c,
+        dpdrho_e, dpde_rho), taking and returning arrays
+    rho_min, rho_max : float
+        The density range
+    e_min, e_max : float
+        The specific internal energy range
+    tol : float, optional
+        The relative interpolation error of p, T and c to refine to
+    nblock : tuple of int, optional
+        The number of root blocks in log rho and in e
+    m : int, optional
+        The number of cells of a block in each direction
+    max_level : int, optional
+        The maximum number of refinements of a root block
+    report : bool, optional
+        Print the block statistics
+    dtype : dtype, optional
+        The type the fields are stored as, as in eos_table.build_table()
+
+    Returns
+    -------
+    out : AdaptiveEOSTable object
+        The table
+
+    """
+
+    tab = AdaptiveEOSTable(rho_min, rho_max, e_min, e_max, nblock=nblock, m=m)
+    tab.refine(props, tol, max_level)
+
+    if report:
+        tab.report(tol)
+
+    if np.dtype(dtype) != np.float64:
+        ref = tab
+        tab = ref.astype(dtype)
+        if report:
+            eos_table.precision_report(tab, ref)
+
+    return tab
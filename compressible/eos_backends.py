@@ -0,0 +1,684 @@
+"""
+The equation of state backends.  A backend evaluates the EOS of one
+fluid, and every backend has the same vectorized interface, on arrays
+of any shape:
+
+  pres(dens, eint)     p(rho, e)
+  dens(pres, eint)     rho(p, e)
+  rhoe(dens, pres)     rho e(rho, p)
+  sound(p, dens)       c(p, rho)
+  state(dens, eint)    p, T, c and gamma = rho c^2 / p, from a single
+                       evaluation of the EOS per state
+  derivs(dens, eint)   (dp/drho)_e and (dp/de)_rho
+  thermo(dens, eint)   p, T, c, gamma, (dp/drho)_e and (dp/de)_rho, from
+                       a single evaluation per state
+
+The derivatives satisfy c^2 = (dp/drho)_e + p/rho^2 (dp/de)_rho.
+
+The backend and the fluid are chosen with the runtime parameters
+
+  [eos]
+  backend = coolprop
+  fluid = Nitrogen
+
+where backend is one of
+
+  ideal        gamma-law gas, with gamma = eos.gamma
+  pr_python    Peng-Robinson, evaluated with NumPy (preos.py)
+  pr_compiled  Peng-Robinson, evaluated with the compiled kernels
+               (preos_cy.pyx / preos_kernels.pyx)
+  pr_native    as pr_compiled, and the flux kernels evaluate the EOS
+               themselves with the Fortran module of preos.f90
+  coolprop     the CoolProp HEOS EOS, through vectorized PropsSImulti calls
+  table        the EOS of the backend eos.table_reference, tabulated in
+               (rho, e) once and interpolated (see eos_table.py and
+               eos_adaptive.py)
+
+and fluid is the CoolProp name of one of the fluids of the fluids
+dictionary below.  Other backends are added with register().
+
+  backend = get_backend("pr_compiled", "Nitrogen", rp)
+  p, T, c, gamma = backend.state(dens, eint)
+
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+import CoolProp.CoolProp as CP
+
+import preos
+import preos_cy
+import compressible.eos_table as eos_table
+import compressible.eos_adaptive as eos_adaptive
+import compressible.eos_phase as eos_phase
+import compressible.interface_f as interface_f
+from util import msg
+
+
+# the constants of the fluids, by CoolProp name: MW [kg/mol], Tc [K],
+# pc [Pa], the acentric factor omega and the NASA 7-coefficient
+# polynomial of the ideal gas (200 - 1000 K)
+fluids = {
+    "Nitrogen": {"MW": 28.0134e-3, "Tc": 126.19, "pc": 3.3958e+6, "omega": 0.03720,
+                 "coef": [3.531005280E+00, -1.236609870E-04, -5.029994370E-07,
+                          2.435306120E-09, -1.408812350E-12, -1.046976280E+03,
+                          2.967474680E+00]},
+    "Oxygen": {"MW": 31.9988e-3, "Tc": 154.58, "pc": 5.0430e+6, "omega": 0.02220,
+               "coef": [3.78245636E+00, -2.99673416E-03, 9.84730201E-06,
+                        -9.68129509E-09, 3.24372837E-12, -1.06394356E+03,
+                        3.65767573E+00]},
+    "CarbonDioxide": {"MW": 44.01e-3, "Tc": 304.13, "pc": 7.3773e+6, "omega": 0.22394,
+                      "coef": [2.35677352E+00, 8.98459677E-03, -7.12356269E-06,
+                               2.45919022E-09, -1.43699548E-13, -4.83719697E+04,
+                               9.90105222E+00]}}
+
+
+def fluid_constants(fluid):
+    """ the PR constants of a fluid, as (MW, Tc, pc, omega, coef) """
+    if fluid not in fluids:
+        msg.fail("ERROR: fluid {} unknown, the fluids are {}".format(
+            fluid, ", ".join(sorted(fluids))))
+    f = fluids[fluid]
+    return f["MW"], f["Tc"], f["pc"], f["omega"], f["coef"]
+
+
+class EOSBackend(object):
+    """
+    the interface of the EOS backends.  Each backend sets the name it
+    is registered under and whether the flux kernels evaluate the EOS
+    natively (native) instead of calling back into python.
+    """
+
+    name = None
+    native = False
+
+    # whether the EOS is too slow on single states for the per-interface
+    # callbacks of the flux kernels, so that eos.init() turns on
+    # compressible.batched_eos
+    batched = False
+
+    # the saturation index of the backends that use one (see eos_phase.py)
+    phase_index = None
+
+    def __init__(self, fluid, rp=None):
+        """
+        Set up the EOS of a fluid.
+
+        Parameters
+        ----------
+        fluid : str
+            The CoolProp name of the fluid
+        rp : RuntimeParameters object, optional
+            The runtime parameters, for the backends that have options
+
+        """
+        self.fluid = fluid
+
+    def key(self):
+        """
+        the description of this EOS that the cached tables are keyed
+        by: anything that changes the results must be in it
+        """
+        return {"backend": self.name, "fluid": self.fluid}
+
+    def pres(self, dens, eint):
+        """ the pressure, given the density and specific internal energy """
+        raise NotImplementedError()
+
+    def dens(self, pres, eint):
+        """ the density, given the pressure and specific internal energy """
+        msg.fail("ERROR: dens(p, e) is not available with the {} EOS".format(self.name))
+
+    def rhoe(self, dens, pres):
+        """ the internal energy density, rho e, given the density and pressure """
+        raise NotImplementedError()
+
+    def sound(self, p, dens):
+        """ the sound speed, given the pressure and density """
+        raise NotImplementedError()
+
+    def state(self, dens, eint):
+        """
+        p, T, c and gamma = rho c^2 / p, given the density and
+        specific internal energy
+        """
+        raise NotImplementedError()
+
+    def derivs(self, dens, eint):
+        """
+        (dp/drho)_e and (dp/de)_rho, given the density and specific
+        internal energy
+        """
+        raise NotImplementedError()
+
+    def thermo(self, dens, eint):
+        """
+        p, T, c, gamma, (dp/drho)_e and (dp/de)_rho, given the density
+        and specific internal energy
+        """
+        return tuple(self.state(dens, eint)) + tuple(self.derivs(dens, eint))
+
+    def props(self, dens, eint):
+        """
+        p, T, c, (dp/drho)_e and (dp/de)_rho -- the reference of the
+        EOS tables
+        """
+        p, T, c, _, dpdrho, dpde = self.thermo(dens, eint)
+        return p, T, c, dpdrho, dpde
+
+
+class IdealEOS(EOSBackend):
+    """ a gamma-law gas, p = rho e (gamma - 1) """
+
+    name = "ideal"
+
+    def __init__(self, fluid, rp=None):
+        EOSBackend.__init__(self, fluid, rp)
+        self.gamma = rp.get_param("eos.gamma") if rp is not None else 1.4
+        self.R = 8.314/fluid_constants(fluid)[0]
+
+    def key(self):
+        k = EOSBackend.key(self)
+        k["gamma"] = self.gamma
+        return k
+
+    def pres(self, dens, eint):
+        return dens*eint*(self.gamma - 1.0)
+
+    def dens(self, pres, eint):
+        return pres/(eint*(self.gamma - 1.0))
+
+    def rhoe(self, dens, pres):
+        return pres/(self.gamma - 1.0)*np.ones(np.shape(dens))
+
+    def sound(self, p, dens):
+        return np.sqrt(self.gamma*p/dens)
+
+    def state(self, dens, eint):
+        p = self.pres(dens, eint)
+        c = np.sqrt(self.gamma*p/dens)
+        return p, p/(dens*self.R), c, self.gamma*np.ones(np.shape(dens))
+
+    def derivs(self, dens, eint):
+        ones = np.ones(np.broadcast(dens, eint).shape)
+        return (self.gamma - 1.0)*eint*ones, (self.gamma - 1.0)*dens*ones
+
+
+class PengRobinsonEOS(EOSBackend):
+    """
+    the Peng-Robinson EOS, with the functions of self.pr (preos_cy or
+    a preos.peng_robinson_fluid).  T(e, rho) is a Newton iteration
+    started from the temperature found for the same array shape the
+    last time; T(p, rho) is solved in closed form.
+    """
+
+    def __init__(self, fluid, rp=None):
+        EOSBackend.__init__(self, fluid, rp)
+        self._T_last = {}
+
+    def key(self):
+        k = EOSBackend.key(self)
+        k["constants"] = fluid_constants(self.fluid)
+        return k
+
+    def _temperature(self, dens, eint):
+        T = self._T_last.get(np.shape(dens))
+        if T is None:
+            T = 300.0
+        else:
+            T = np.where(np.isfinite(T), T, 300.0)
+        T = np.reshape(self.pr.getTfromEandRho(eint, dens, T_guess=T), np.shape(dens))
+        self._T_last[np.shape(dens)] = T
+        return T
+
+    def pres(self, dens, eint):
+        T = self._temperature(dens, eint)
+        return np.reshape(self.pr.getPfromTandRho(T, dens), np.shape(dens))
+
+    def rhoe(self, dens, pres):
+        T = self.pr.getTfromPandRho_exact(pres, dens)
+        return dens*np.reshape(self.pr.getEnergyfromTandRho(T, dens), np.shape(dens))
+
+    def sound(self, p, dens):
+        return np.reshape(self.pr.getSos([p, dens]), np.shape(dens))
+
+    def state(self, dens, eint):
+        T = self._temperature(dens, eint)
+        p = np.reshape(self.pr.getPfromTandRho(T, dens), np.shape(dens))
+        c = self.sound(p, dens)
+        return p, T, c, c**2*dens/p
+
+    def _derivs(self, T, dens, p):
+        """
+        (dp/drho)_e and (dp/de)_rho from the temperature: with
+        de = cv dT + (T dp/dT|v - p) dv,
+          dp/de|v = dp/dT|v / cv
+          dp/dv|e = dp/dv|T - dp/dT|v (T dp/dT|v - p)/cv
+        """
+        a, b, R, dadT, d2adT2 = self.pr.getThermo(T)
+        v = 1.0/dens
+        D = v**2 + 2.0*v*b - b**2
+        dpdT = R/(v - b) - dadT/D
+        dpdv = -R*T/(v - b)**2 + 2.0*a*(v + b)/D**2
+        cv = np.reshape(self.pr.getCvfromTandRho(T, dens), np.shape(dens))
+        dpdv_e = dpdv - dpdT*(T*dpdT - p)/cv
+        return -v**2*dpdv_e, dpdT/cv
+
+    def derivs(self, dens, eint):
+        return self.thermo(dens, eint)[4:]
+
+    def thermo(self, dens, eint):
+        p, T, c, gamma = self.state(dens, eint)
+        return (p, T, c, gamma) + self._derivs(T, dens, p)
+
+
+class PRPythonEOS(PengRobinsonEOS):
+    """ the Peng-Robinson EOS evaluated with NumPy """
+
+    name = "pr_python"
+
+    def __init__(self, fluid, rp=None):
+        PengRobinsonEOS.__init__(self, fluid, rp)
+        self.pr = preos.peng_robinson_fluid(*fluid_constants(fluid))
+
+
+class PRCompiledEOS(PengRobinsonEOS):
+    """ the Peng-Robinson EOS evaluated with the compiled kernels """
+
+    name = "pr_compiled"
+
+    pr = preos_cy
+
+    def __init__(self, fluid, rp=None):
+        PengRobinsonEOS.__init__(self, fluid, rp)
+        preos_cy.set_fluid(*fluid_constants(fluid))
+
+    def __setstate__(self, state):
+        # the fluid of the kernels is module state, which a pickled
+        # copy (e.g. in the workers of the table builder) sets again
+        self.__dict__.update(state)
+        preos_cy.set_fluid(*fluid_constants(self.fluid))
+
+
+class PRNativeEOS(PRCompiledEOS):
+    """
+    the compiled Peng-Robinson EOS, with the flux kernels using the
+    Fortran module of preos.f90 set up for the same fluid
+    """
+
+    name = "pr_native"
+    native = True
+
+    def __init__(self, fluid, rp=None):
+        PRCompiledEOS.__init__(self, fluid, rp)
+        interface_f.pr_eos.pr_init(*fluid_constants(fluid))
+
+
+# the CoolProp AbstractStates, one per (backend, fluid), created on
+# first use
+_abstract_states = {}
+
+def abstract_state(name, backend="HEOS"):
+    """
+    Return the cached CoolProp AbstractState of a fluid, so the fluid
+    name is parsed once instead of on every PropsSI call.
+
+    Parameters
+    ----------
+    name : str
+        The CoolProp fluid name
+    backend : str, optional
+        The CoolProp backend
+
+    Returns
+    -------
+    out : AbstractState object
+
+    """
+    key = (backend, name)
+    if key not in _abstract_states:
+        _abstract_states[key] = CP.AbstractState(backend, name)
+    return _abstract_states[key]
+
+
+# the CoolProp names of the input pairs of CoolPropEOS._eval
+_input_names = {CP.DmassUmass_INPUTS: ("Dmass", "Umass"),
+                CP.DmassP_INPUTS: ("Dmass", "P"),
+                CP.PUmass_INPUTS: ("P", "Umass"),
+                CP.DmassT_INPUTS: ("Dmass", "T")}
+
+def output_name(key):
+    """
+    The CoolProp name of the output key of CoolPropEOS._eval: a
+    parameter (e.g. CP.iP -> "P") or a tuple (of, wrt, constant) for
+    the partial derivative d(of)/d(wrt) at constant constant (e.g.
+    "d(P)/d(Dmass)|Umass")
+    """
+    if isinstance(key, tuple):
+        of, wrt, constant = [CP.get_parameter_information(k, "short") for k in key]
+        return "d({})/d({})|{}".format(of, wrt, constant)
+    return CP.get_parameter_information(key, "short")
+
+
+class CoolPropEOS(EOSBackend):
+    """
+    the CoolProp EOS.  Cells with dens < 0.1 (the empty cells of the
+    solids) are not evaluated: they get p = rho e = c = 0, and in
+    state() T = 0 and gamma = 1
+    """
+
+    name = "coolprop"
+
+    # the smallest number of states evaluated with PropsSImulti
+    vector_min = 100
+
+    def key(self):
+        k = EOSBackend.key(self)
+        k["version"] = CP.get_global_param_string("version")
+        return k
+
+    def _eval(self, pair, x, y, keys, valid=None):
+        """
+        Evaluate the CoolProp outputs keys (e.g. [CP.iP, CP.iT]) at the
+        states (x, y), given as the CoolProp input pair pair (e.g.
+        CP.DmassUmass_INPUTS), with one PropsSImulti call over the
+        valid states, which flashes each state once for all the outputs.
+        Fewer than vector_min states (e.g. the single states of the
+        callbacks of the flux kernels) are updated one at a time in the
+        cached AbstractState instead, which skips the setup cost of
+        PropsSImulti.
+        A key can also be a tuple (of, wrt, constant) for the partial
+        derivative d(of)/d(wrt) at constant constant.
+        x, y and valid are arrays of any (broadcastable) shape; the
+        states where valid is False, and the outputs CoolProp cannot
+        evaluate (e.g. the sound speed of two-phase states), are
+        returned as NaN.
+        """
+        shape = np.broadcast(x, y).shape
+        x = np.broadcast_to(np.asarray(x, dtype=np.float64), shape).ravel()
+        y = np.broadcast_to(np.asarray(y, dtype=np.float64), shape).ravel()
+
+        out = np.full((len(keys), x.size), np.nan)
+
+        if valid is None:
+            idx = np.arange(x.size)
+        else:
+            idx = np.flatnonzero(np.broadcast_to(valid, shape))
+
+        if idx.size >= self.vector_min:
+            name_x, name_y = _input_names[pair]
+            q = np.array(CP.PropsSImulti([output_name(k) for k in keys],
+                                         name_x, x[idx], name_y, y[idx],
+                                         "HEOS", [self.fluid], [1.0]))
+
+            # the outputs CoolProp cannot evaluate are inf
+            q[~np.isfinite(q)] = np.nan
+            out[:, idx] = q.T
+
+        else:
+            AS = abstract_state(self.fluid)
+            output = AS.keyed_output
+            deriv = AS.first_partial_deriv
+            getters = [(lambda k=k: deriv(*k)) if isinstance(k, tuple) else (lambda k=k: output(k))
+                       for k in keys]
+
+            for i in idx:
+                try:
+                    AS.update(pair, x[i], y[i])
+                except ValueError:
+                    continue
+                for n, get in enumerate(getters):
+                    try:
+                        out[n, i] = get()
+                    except ValueError:
+                        pass
+
+        return [q.reshape(shape) for q in out]
+
+    def pres(self, dens, eint):
+        valid = np.asarray(dens) >= 0.1
+        p, = self._eval(CP.DmassUmass_INPUTS, dens, eint, [CP.iP], valid)
+        p[~valid] = 0.0
+        return p
+
+    def dens(self, pres, eint):
+        dens, = self._eval(CP.PUmass_INPUTS, pres, eint, [CP.iDmass])
+        return dens
+
+    def rhoe(self, dens, pres):
+        valid = np.asarray(dens) >= 0.1
+        eint, = self._eval(CP.DmassP_INPUTS, dens, pres, [CP.iUmass], valid)
+        eint[~valid] = 0.0
+        return dens*eint
+
+    def sound(self, p, dens):
+        valid = np.asarray(dens) >= 0.1
+        sos, = self._eval(CP.DmassP_INPUTS, dens, p, [CP.ispeed_sound], valid)
+        sos[~valid] = 0.0
+        return sos
+
+    # the outputs of thermo(): p, T, c and the derivatives
+    _thermo_keys = [CP.iP, CP.iT, CP.ispeed_sound,
+                    (CP.iP, CP.iDmass, CP.iUmass), (CP.iP, CP.iUmass, CP.iDmass)]
+
+    def props(self, dens, eint):
+        """
+        p, T, c, (dp/drho)_e and (dp/de)_rho, unmasked -- the
+        reference of the EOS tables
+        """
+        return self._eval(CP.DmassUmass_INPUTS, dens, eint, self._thermo_keys)
+
+    def derivs(self, dens, eint):
+        return self.thermo(dens, eint)[4:]
+
+    def thermo(self, dens, eint):
+        p, T, c, dpdrho, dpde = self._eval(CP.DmassUmass_INPUTS, dens, eint,
+                                           self._thermo_keys, np.asarray(dens) >= 0.1)
+        gamma = c**2*np.asarray(dens)/p
+
+        low = np.asarray(dens) < 0.1
+        for q in [p, T, c, dpdrho, dpde]:
+            q[low] = 0.0
+        gamma[low] = 1.0
+
+        return p, T, c, gamma, dpdrho, dpde
+
+    def state(self, dens, eint):
+        p, T, c = self._eval(CP.DmassUmass_INPUTS, dens, eint,
+                             [CP.iP, CP.iT, CP.ispeed_sound],
+                             np.asarray(dens) >= 0.1)
+        gamma = c**2*np.asarray(dens)/p
+
+        low = np.asarray(dens) < 0.1
+        for q in [p, T, c]:
+            q[low] = 0.0
+        gamma[low] = 1.0
+
+        return p, T, c, gamma
+
+
+class TableEOS(EOSBackend):
+    """
+    the EOS of another backend (eos.table_reference), tabulated in
+    (rho, e) over the range of the eos.table_* parameters, and kept in
+    eos.table_cache_dir if eos.table_cache is set.  If eos.table_adaptive
+    is set, the table is refined in blocks down to the tolerance
+    eos.table_tol instead (see eos_adaptive.py).  If eos.float32 is
+    set, the table is stored in float32 (and interpolated in float64).
+    If eos.table_phase_index is set, the states near or inside the
+    saturation dome (see eos_phase.py) are evaluated with the reference
+    backend instead of the table, where it is least accurate.  If
+    eos.table_inverse is set, e and c are also tabulated in (rho, p)
+    (see eos_table.InverseTable), and rhoe(dens, p) and sound(p, dens)
+    interpolate them instead of inverting the (rho, e) table.
+    Cells with dens < 0.1 (the empty cells of the solids) get
+    p = rho e = c = 0, and in thermo() T = 0 and gamma = 1.
+    dens(p, e) is not tabulated and is passed on to the reference
+    backend.
+    """
+
+    name = "table"
+    batched = True
+
+    def __init__(self, fluid, rp=None):
+        EOSBackend.__init__(self, fluid, rp)
+
+        self.reference = get_backend(rp.get_param("eos.table_reference"), fluid, rp)
+
+        bounds = [rp.get_param("eos.table_rho_min"),
+                  rp.get_param("eos.table_rho_max"),
+                  rp.get_param("eos.table_nrho"),
+                  rp.get_param("eos.table_e_min"),
+                  rp.get_param("eos.table_e_max"),
+                  rp.get_param("eos.table_ne")]
+        interp = rp.get_param("eos.table_interp")
+        nworkers = rp.get_param("eos.table_nworkers")
+        dtype = np.float32 if rp.get_param("eos.float32") else np.float64
+
+        if rp.get_param("eos.table_adaptive"):
+            self.table = eos_adaptive.build_adaptive_table(
+                self.reference.props, bounds[0], bounds[1], bounds[3], bounds[4],
+                tol=rp.get_param("eos.table_tol"),
+                m=rp.get_param("eos.table_block"),
+                max_level=rp.get_param("eos.table_max_level"), dtype=dtype)
+        elif rp.get_param("eos.table_cache"):
+            self.table = eos_table.cached_table(self.reference.props, self.reference.key(),
+                                                rp.get_param("eos.table_cache_dir"),
+                                                *bounds, interp=interp, nworkers=nworkers,
+                                                dtype=dtype)
+        else:
+            self.table = eos_table.build_table(self.reference.props, *bounds,
+                                               interp=interp, nworkers=nworkers,
+                                               dtype=dtype)
+
+        self.inverse = None
+        if rp.get_param("eos.table_inverse"):
+            self.inverse = eos_table.InverseTable(self.table, bounds[2],
+                                                  rp.get_param("eos.table_np"))
+            self.inverse.roundtrip_report(self.table)
+
+        if rp.get_param("eos.table_phase_index"):
+            if isinstance(self.reference, IdealEOS):
+                msg.warning("the ideal gas EOS has no saturation dome, no phase index")
+            else:
+                self.phase_index = eos_phase.build_phase_index(
+                    fluid, "HEOS" if isinstance(self.reference, CoolPropEOS) else "PR",
+                    margin=rp.get_param("eos.phase_margin"), reference=self.reference)
+
+    def _near_dome(self, out, dens, eint, func, *args):
+        """
+        Replace the states of out (a list of the arrays of the table
+        results) near or inside the dome by those of func(*args) of the
+        reference backend, evaluated at those states only.
+        """
+        if self.phase_index is None:
+            return out
+
+        dens, eint = np.broadcast_arrays(dens, eint)
+        near = self.phase_index.near(dens, eint) & (dens >= 0.1)
+        if np.any(near):
+            ref = func(*[np.broadcast_to(a, near.shape)[near] for a in args])
+            if not isinstance(ref, (tuple, list)):
+                ref = [ref]
+            for q, r in zip(out, ref):
+                q[near] = r
+        return out
+
+    def pres(self, dens, eint):
+        p, = self._near_dome([self.table.pres(dens, eint)], dens, eint,
+                             self.reference.pres, dens, eint)
+        p[np.asarray(dens) < 0.1] = 0.0
+        return p
+
+    def dens(self, pres, eint):
+        return self.reference.dens(pres, eint)
+
+    def _inverse(self, dens, pres):
+        """
+        e and c at (dens, pres), from the inverse table if there is one
+        (with the states it does not cover inverted from the (rho, e)
+        table), else from the inversion of the (rho, e) table
+        """
+        if self.inverse is None:
+            eint = self.table.eint(dens, pres)
+            return eint, self.table.sound(dens, eint)
+
+        eint, c = self.inverse.lookup(dens, pres)
+        miss = ~np.isfinite(eint)
+        if np.any(miss):
+            dens, pres = np.broadcast_arrays(dens, pres)
+            eint[miss] = self.table.eint(dens[miss], pres[miss])
+            c[miss] = self.table.sound(dens[miss], eint[miss])
+        return eint, c
+
+    def rhoe(self, dens, pres):
+        eint, _ = self._inverse(dens, pres)
+        rhoe, = self._near_dome([np.asarray(dens*eint)], dens, eint,
+                                self.reference.rhoe, dens, pres)
+        rhoe[np.asarray(dens) < 0.1] = 0.0
+        return rhoe
+
+    def sound(self, p, dens):
+        eint, c = self._inverse(dens, p)
+        c, = self._near_dome([c], dens, eint,
+                             self.reference.sound, p, dens)
+        c[np.asarray(dens) < 0.1] = 0.0
+        return c
+
+    def state(self, dens, eint):
+        return self.thermo(dens, eint)[:4]
+
+    def derivs(self, dens, eint):
+        return self.thermo(dens, eint)[4:]
+
+    def thermo(self, dens, eint):
+        p, T, c, gamma, dpdrho, dpde = self._near_dome(
+            self.table.lookup(dens, eint, ["p", "T", "c", "gamma", "dpdrho_e", "dpde_rho"]),
+            dens, eint, self.reference.thermo, dens, eint)
+
+        low = np.asarray(dens) < 0.1
+        for q in [p, T, c, dpdrho, dpde]:
+            q[low] = 0.0
+        gamma[low] = 1.0
+
+        return p, T, c, gamma, dpdrho, dpde
+
+
+# the registered backends, by name
+backends = {}
+
+def register(name, cls):
+    """
+    Register an EOS backend class (a subclass of EOSBackend) under
+    name, the value of eos.backend that selects it.
+    """
+    backends[name] = cls
+
+for _cls in [IdealEOS, PRPythonEOS, PRCompiledEOS, PRNativeEOS, CoolPropEOS, TableEOS]:
+    register(_cls.name, _cls)
+
+
+def get_backend(name, fluid, rp=None):
+    """
+    Create the EOS backend registered under name, for a fluid.
+
+    Parameters
+    ----------
+    name : str
+        The name of the backend (eos.backend)
+    fluid : str
+        The CoolProp name of the fluid (eos.fluid)
+    rp : RuntimeParameters object, optional
+        The runtime parameters, for the backends that have options
+
+    Returns
+    -------
+    out : EOSBackend object
+
+    """
+    if name not in backends:
+        msg.fail("ERROR: EOS backend {} unknown, the backends are {}".format(
+            name, ", ".join(sorted(backends))))
+    return backends[name](fluid, rp)
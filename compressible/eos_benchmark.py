@@ -0,0 +1,372 @@
+"""
+Timing and accuracy of the equation of state backends.
+
+  python eos_benchmark.py [-n NCELLS] [-r NREPEAT]
+
+compares the closed-form T(p, rho) inversion of the Peng-Robinson EOS
+with the Newton iteration, on random states spread over the
+(rho, T) range of the simulations, and reports the time per call, the
+time per cell and the largest difference between the two.
+
+  python eos_benchmark.py --backends [-b ideal,pr_python,...] [-o out.json]
+
+times every EOS entry point of each backend (see eos_backends.py),
+
+  pres       p(rho, e)
+  rhoe       rho e(rho, p)
+  sound      c(p, rho)
+  T(e,rho)   T from state(rho, e)
+  T(p,rho)   T from state(rho, rhoe(rho, p)/rho)
+
+on arrays of 1 to 10^6 states (--sizes), and measures their error
+against a reference backend (--reference) over the (rho, e) envelope of
+the EOS tables (the eos.table_* parameters, in the energies of the
+reference).  The backends do not share an energy reference (e.g. the PR
+backends use the NASA polynomials), so the energies of a backend are
+shifted by its difference with the reference at the most dilute and
+hottest state of the envelope, where every backend is close to the
+ideal gas.  The results, with a description of the machine and the
+versions, are written to a JSON file (one per run, for trend tracking):
+
+  {"meta": {...},
+   "backends": {"coolprop": {"timings": {"pres": [{"n": 1000,
+                                                   "time": 0.01,
+                                                   "rate": 1.e5}, ...], ...},
+                             "errors": {"pres": {"max_abs": ..., "max_rel": ...,
+                                                 "mean_rel": ..., "nonfinite": 0},
+                                        ...}},
+                ...}}
+
+Sizes whose estimated time (from the previous size) exceeds --max-time
+are skipped.  Extra runtime parameters (e.g. the table settings) are
+read from the file given with -p.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import CoolProp.CoolProp as CP
+
+import preos_cy as PREOS
+import compressible.eos_backends as eos_backends
+from util import msg, runparams
+
+
+def _timeit(func, nrepeat):
+    """ the best wall clock time of nrepeat calls of func() """
+    best = np.inf
+    for _ in range(nrepeat):
+        t0 = time.time()
+        out = func()
+        best = min(best, time.time() - t0)
+    return best, out
+
+
+def bench_T_from_p_rho(ncells=100000, nrepeat=5, seed=0):
+    """
+    Time the Newton and the closed-form T(p, rho) of preos_cy.
+
+    Parameters
+    ----------
+    ncells : int, optional
+        The number of states per call
+    nrepeat : int, optional
+        The number of calls timed (the best is kept)
+    seed : int, optional
+        The seed of the random states
+
+    Returns
+    -------
+    out : dict
+        The best time of each method and their max. relative difference
+
+    """
+
+    rng = np.random.RandomState(seed)
+    rho = rng.uniform(1.0, 800.0, ncells)
+    T = rng.uniform(80.0, 1000.0, ncells)
+    p = PREOS.getPfromTandRho(T, rho)
+
+    t_newton, T_newton = _timeit(lambda: PREOS.getTfromPandRho(p, rho), nrepeat)
+    t_exact, T_exact = _timeit(lambda: PREOS.getTfromPandRho_exact(p, rho), nrepeat)
+
+    result = {"ncells": ncells,
+              "newton": t_newton,
+              "exact": t_exact,
+              "max_rel_diff": np.max(np.abs(T_exact - T_newton)/T_newton)}
+
+    msg.bold("T(p, rho), {} cells, best of {}".format(ncells, nrepeat))
+    for name in ["newton", "exact"]:
+        print("   {:8s} {:10.4g} s/call, {:10.4g} s/cell".format(
+            name, result[name], result[name]/ncells))
+    print("   speedup  {:10.4g}".format(t_newton/t_exact))
+    print("   max. relative difference {:10.4g}".format(result["max_rel_diff"]))
+
+    return result
+
+
+# the EOS entry points, as functions of the backend, the density, the
+# (shifted) specific internal energy and the pressure of the states
+entry_points = [
+    ("pres", lambda b, rho, e, p: b.pres(rho, e)),
+    ("rhoe", lambda b, rho, e, p: b.rhoe(rho, p)),
+    ("sound", lambda b, rho, e, p: b.sound(p, rho)),
+    ("T(e,rho)", lambda b, rho, e, p: b.state(rho, e)[1]),
+    ("T(p,rho)", lambda b, rho, e, p: b.state(rho, b.rhoe(rho, p)/rho)[1])]
+
+default_sizes = [10**k for k in range(7)]
+
+
+def envelope_states(reference, rho_min, rho_max, e_min, e_max, nsample=10000, seed=0):
+    """
+    nsample random states, uniform in (rho, e) over the envelope, and
+    the values of every entry point of the reference backend there.
+    The states where the reference is not finite are dropped.
+
+    Returns
+    -------
+    out : dict
+        The states ("rho", "e", "p") and the reference value of each
+        entry point (the values of rhoe are divided by rho, to compare
+        the energies)
+
+    """
+
+    rng = np.random.RandomState(seed)
+    rho = rng.uniform(rho_min, rho_max, nsample)
+    e = rng.uniform(e_min, e_max, nsample)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p, T, c, _ = reference.state(rho, e)
+    ok = np.isfinite(p) & np.isfinite(T) & np.isfinite(c) & (p > 0.0)
+
+    return {"rho": rho[ok], "e": e[ok], "p": p[ok],
+            "pres": p[ok], "rhoe": e[ok], "sound": c[ok],
+            "T(e,rho)": T[ok], "T(p,rho)": T[ok]}
+
+
+def energy_shift(backend, reference, rho, e):
+    """
+    the difference of the energies of backend and reference at the
+    state (rho, e) of the reference
+    """
+    rho = np.array([rho])
+    p = reference.pres(rho, np.array([e]))
+    return float(backend.rhoe(rho, p)[0]/rho[0]) - e
+
+
+def _errors(value, ref):
+    """ the max. absolute, max. and mean relative errors of value """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d = np.abs(value - ref)
+        rel = d/np.abs(ref)
+    ok = np.isfinite(d)
+    if not np.any(ok):
+        return {"max_abs": None, "max_rel": None, "mean_rel": None,
+                "nonfinite": int(d.size)}
+    return {"max_abs": float(d[ok].max()), "max_rel": float(rel[ok].max()),
+            "mean_rel": float(rel[ok].mean()), "nonfinite": int(d.size - ok.sum())}
+
+
+def bench_backend(backend, states, shift=0.0, sizes=default_sizes, nrepeat=3,
+                  max_time=10.0, report=True):
+    """
+    Time the entry points of a backend on arrays of each size, and
+    measure their errors at all the states.
+
+    Parameters
+    ----------
+    backend : EOSBackend object
+        The backend
+    states : dict
+        The states and reference values (see envelope_states)
+    shift : float, optional
+        The energy of the backend minus that of the reference
+    sizes : list of int, optional
+        The array sizes timed (the states are repeated for the sizes
+        larger than the sample)
+    nrepeat : int, optional
+        The number of calls timed per size (the best is kept)
+    max_time : float, optional
+        The sizes estimated to take longer than this [s] are skipped
+    report : bool, optional
+        Print the results
+
+    Returns
+    -------
+    out : dict
+        The "timings" and the "errors" of each entry point
+
+    """
+
+    rho, e, p = states["rho"], states["e"] + shift, states["p"]
+
+    result = {"timings": {}, "errors": {}}
+    for name, func in entry_points:
+        timings = []
+        rate = None
+        for n in sizes:
+            if rate is not None and n/rate > max_time:
+                timings.append({"n": n, "time": None, "rate": None, "skipped": True})
+                continue
+            args = [np.resize(a, n) for a in [rho, e, p]]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                t, _ = _timeit(lambda: func(backend, *args), nrepeat)
+            rate = n/max(t, 1.e-9)
+            timings.append({"n": n, "time": t, "rate": rate})
+        result["timings"][name] = timings
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            value = func(backend, rho, e, p)
+        if name == "rhoe":
+            value = value/rho - shift
+        result["errors"][name] = _errors(value, states[name])
+
+    if report:
+        msg.bold("EOS backend {} ({} states, energy shift {:.6g})".format(
+            backend.name, len(rho), shift))
+        print("   {:10s} {:>12s} {:>12s} {:>12s} {:>10s}".format(
+            "", "max. rate/s", "max. rel.", "mean rel.", "nonfinite"))
+        for name, _ in entry_points:
+            rates = [x["rate"] for x in result["timings"][name] if x["rate"] is not None]
+            err = result["errors"][name]
+            print("   {:10s} {:12.4g} {:>12s} {:>12s} {:10d}".format(
+                name, max(rates),
+                "-" if err["max_rel"] is None else "{:.4g}".format(err["max_rel"]),
+                "-" if err["mean_rel"] is None else "{:.4g}".format(err["mean_rel"]),
+                err["nonfinite"]))
+
+    return result
+
+
+def _meta():
+    """ the description of the machine and the versions """
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": platform.node(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "coolprop": CP.get_global_param_string("version"),
+            "commit": commit}
+
+
+def bench_backends(names, fluid, reference="coolprop", rp=None, sizes=default_sizes,
+                   nrepeat=3, nsample=10000, max_time=10.0, path=None, report=True):
+    """
+    Benchmark several backends against a reference backend, over the
+    envelope of the eos.table_* parameters of rp.
+
+    Parameters
+    ----------
+    names : list of str
+        The backends (eos.backend)
+    fluid : str
+        The fluid (eos.fluid)
+    reference : str, optional
+        The reference backend
+    rp : RuntimeParameters object, optional
+        The runtime parameters the backends are created with (the
+        defaults of the EOS if None)
+    sizes, nrepeat, max_time, report :
+        As for bench_backend
+    nsample : int, optional
+        The number of states the errors are measured at
+    path : str, optional
+        The JSON file the results are written to
+
+    Returns
+    -------
+    out : dict
+        The "meta" data of the run and the results of bench_backend for
+        each backend
+
+    """
+
+    if rp is None:
+        rp = runparams.RuntimeParameters()
+        rp.load_params(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_defaults"))
+
+    envelope = [rp.get_param("eos.table_rho_min"), rp.get_param("eos.table_rho_max"),
+                rp.get_param("eos.table_e_min"), rp.get_param("eos.table_e_max")]
+
+    ref = eos_backends.get_backend(reference, fluid, rp)
+    states = envelope_states(ref, *envelope, nsample=nsample)
+
+    meta = _meta()
+    meta.update({"fluid": fluid, "reference": reference, "sizes": list(sizes),
+                 "nrepeat": nrepeat, "nsample": nsample, "nstates": len(states["rho"]),
+                 "envelope": dict(zip(["rho_min", "rho_max", "e_min", "e_max"], envelope))})
+
+    result = {"meta": meta, "backends": {}}
+    for name in names:
+        backend = eos_backends.get_backend(name, fluid, rp)
+        shift = energy_shift(backend, ref, envelope[0], envelope[3])
+        result["backends"][name] = bench_backend(backend, states, shift, sizes=sizes,
+                                                 nrepeat=nrepeat, max_time=max_time,
+                                                 report=report)
+        result["backends"][name]["energy_shift"] = shift
+
+    if path is not None:
+        with open(path, "w") as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+        if report:
+            msg.bold("wrote {}".format(path))
+
+    return result
+
+
+if __name__ == "__main__":
+
+    p = argparse.ArgumentParser()
+    p.add_argument("-n", type=int, default=100000, metavar="NCELLS",
+                   help="number of states per call")
+    p.add_argument("-r", type=int, default=5, metavar="NREPEAT",
+                   help="number of timed calls")
+    p.add_argument("--backends", action="store_true",
+                   help="benchmark the EOS backends instead of T(p, rho)")
+    p.add_argument("-b", default="ideal,pr_python,pr_compiled,coolprop,table",
+                   help="comma separated backends")
+    p.add_argument("--reference", default="coolprop", help="reference backend")
+    p.add_argument("--fluid", default="Nitrogen", help="fluid")
+    p.add_argument("--sizes", default=",".join(str(n) for n in default_sizes),
+                   help="comma separated array sizes")
+    p.add_argument("--nsample", type=int, default=10000,
+                   help="number of states the errors are measured at")
+    p.add_argument("--max-time", type=float, default=10.0,
+                   help="skip the sizes estimated to take longer than this [s]")
+    p.add_argument("-p", metavar="PARAMS", help="runtime parameter file")
+    p.add_argument("-o", metavar="OUT", help="JSON output file")
+    args = p.parse_args()
+
+    if not args.backends:
+        bench_T_from_p_rho(args.n, args.r)
+        sys.exit(0)
+
+    rp = runparams.RuntimeParameters()
+    rp.load_params(os.path.join(os.path.dirname(os.path.abspath(__file__)), "_defaults"))
+    if args.p is not None:
+        rp.load_params(args.p)
+
+    out = args.o
+    if out is None:
+        out = "eos_benchmark_{}.json".format(time.strftime("%Y%m%d-%H%M%S"))
+
+    bench_backends(args.b.split(","), args.fluid, reference=args.reference, rp=rp,
+                   sizes=[int(n) for n in args.sizes.split(",")], nrepeat=args.r,
+                   nsample=args.nsample, max_time=args.max_time, path=out)
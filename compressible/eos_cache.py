@@ -0,0 +1,206 @@
+"""
+Memoization of EOS queries.  A MemoizedEOS wraps one of the EOS
+functions (e.g. eos.pres(dens, eint)), so that
+
+  -- the inputs are quantized to a relative tolerance rtol: each value
+     x = m 2**k (frexp) is replaced by round(m/rtol)*rtol 2**k,
+
+  -- the quantized states are deduplicated with np.unique, so a
+     uniform region costs a single EOS evaluation,
+
+  -- the results of the unique states are kept in a bounded LRU store
+     that carries over from one call to the next, and only the states
+     missing from it are evaluated, in one vectorized call,
+
+  -- the results are scattered back to the shape of the input.
+
+Since the EOS is evaluated at the quantized state, the result is that
+of inputs perturbed by at most rtol (relative) each.  Non-finite inputs
+are passed to the EOS as they are and never stored.
+
+  cached_pres = MemoizedEOS(eos.pres, "pres", rtol=1.e-8)
+  p = cached_pres(dens, eint)
+  print(cached_pres.stats)
+
+"""
+
+from __future__ import print_function
+
+from collections import OrderedDict
+
+import numpy as np
+
+from util import msg
+
+
+class MemoizedEOS(object):
+    """
+    an EOS function with a quantized-state LRU cache in front of it
+    """
+
+    def __init__(self, func, name=None, rtol=1.e-8, maxsize=100000):
+        """
+        Wrap an EOS function.
+
+        Parameters
+        ----------
+        func : function
+            The EOS function, func(a, b, ...) of arrays of the same
+            shape, returning an array or a tuple of arrays of that
+            shape
+        name : str, optional
+            The name used in the reports
+        rtol : float, optional
+            The relative tolerance the inputs are quantized to, between
+            the machine epsilon (finer quantization is meaningless, and
+            the integer keys would overflow) and 1
+        maxsize : int, optional
+            The maximum number of states kept in the store
+
+        """
+
+        if not np.finfo(np.float64).eps <= rtol < 1.0:
+            msg.fail("ERROR: the EOS memoization tolerance must be in [{}, 1), not {}".format(
+                np.finfo(np.float64).eps, rtol))
+
+        self.func = func
+        self.name = name if name is not None else func.__name__
+        self.rtol = rtol
+        self.maxsize = maxsize
+
+        self.store = OrderedDict()
+
+        self.stats = {"calls": 0, "cells": 0, "unique": 0,
+                      "hits": 0, "evaluated": 0, "evictions": 0}
+
+
+    def clear(self):
+        """ empty the store (the statistics are kept) """
+        self.store.clear()
+
+
+    def _quantize(self, x):
+        """
+        the integer key (mantissa, exponent) of each value and the
+        value it stands for
+        """
+        m, k = np.frexp(x)
+        mq = np.rint(m/self.rtol).astype(np.int64)
+        return mq, k.astype(np.int64), np.ldexp(mq*self.rtol, k)
+
+
+    def __call__(self, *args):
+
+        args = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in args])
+        shape = args[0].shape
+        args = [a.ravel() for a in args]
+        n = args[0].size
+
+        if n == 0:
+            return self.func(*args)
+
+        self.stats["calls"] += 1
+        self.stats["cells"] += n
+
+        finite = np.ones(n, dtype=bool)
+        for a in args:
+            finite &= np.isfinite(a)
+        good = np.flatnonzero(finite)
+
+        keys = []
+        reps = []
+        for a in args:
+            mq, k, r = self._quantize(a[good])
+            keys += [mq, k]
+            reps.append(r)
+
+        ukeys, first, inverse = np.unique(np.column_stack(keys).reshape(-1, len(keys)),
+                                          axis=0, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        nu = len(first)
+
+        self.stats["unique"] += nu
+
+        # look the unique states up in the store
+        tkeys = [tuple(row) for row in ukeys.tolist()]
+        found = [None]*nu
+        missing = []
+        for u, key in enumerate(tkeys):
+            val = self.store.get(key)
+            if val is None:
+                missing.append(u)
+            else:
+                self.store.move_to_end(key)
+                found[u] = val
+
+        self.stats["hits"] += nu - len(missing)
+        self.stats["evaluated"] += len(missing)
+
+        # evaluate the missing ones at once, at the quantized state
+        if len(missing) > 0:
+            idx = first[missing]
+            res = self._evaluate([r[idx] for r in reps])
+            for m, u in enumerate(missing):
+                found[u] = tuple(q[m] for q in res)
+                self.store[tkeys[u]] = found[u]
+
+            while len(self.store) > self.maxsize:
+                self.store.popitem(last=False)
+                self.stats["evictions"] += 1
+
+        # the non-finite states bypass the store
+        if len(good) < n:
+            bad = np.flatnonzero(~finite)
+            res_bad = self._evaluate([a[bad] for a in args])
+
+        nout = len(found[0]) if nu > 0 else len(res_bad)
+        out = [np.empty(n) for _ in range(nout)]
+
+        if nu > 0:
+            vals = np.array(found, dtype=np.float64)
+            for q in range(nout):
+                out[q][good] = vals[inverse, q]
+
+        if len(good) < n:
+            for q in range(nout):
+                out[q][bad] = res_bad[q]
+
+        out = [q.reshape(shape) for q in out]
+        if self._single:
+            return out[0]
+        return tuple(out)
+
+
+    def _evaluate(self, args):
+        """
+        call the EOS and return its result as a tuple of 1D arrays.
+        Whether the EOS returns a single array or a tuple is recorded
+        in self._single
+        """
+        res = self.func(*args)
+        self._single = not isinstance(res, (tuple, list))
+        if self._single:
+            res = (res,)
+        return [np.broadcast_to(np.asarray(q, dtype=np.float64), args[0].shape).ravel()
+                for q in res]
+
+    _single = True
+
+
+    def hit_rate(self):
+        """
+        the fraction of the queried cells that did not need an EOS
+        evaluation
+        """
+        if self.stats["cells"] == 0:
+            return 0.0
+        return 1.0 - float(self.stats["evaluated"])/self.stats["cells"]
+
+
+    def report(self):
+        """ a one line summary of the statistics """
+        s = self.stats
+        return "{}: {} calls, {} cells, {} unique states, {} store hits, " \
+            "{} evaluated, {} evictions, hit rate = {:6.4f}".format(
+                self.name, s["calls"], s["cells"], s["unique"], s["hits"],
+                s["evaluated"], s["evictions"], self.hit_rate())
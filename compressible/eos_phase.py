@@ -0,0 +1,253 @@
+"""
+A saturation-curve and spinodal index of a fluid over (rho, e).  The
+saturated vapor and liquid states (the binodal) and the limits of
+stability of the metastable states (the spinodal) are computed once,
+on a set of temperatures from the triple point up to the critical
+point, and stored as two curves e(rho): at a given density, a state is
+inside the dome if its energy is below the curve.  Since both curves
+are tabulated in increasing density, a whole array of states is
+classified with two np.interp calls:
+
+  FAR         single-phase, more than the margin above the dome
+  NEAR        single-phase, but within the margin of the dome
+  METASTABLE  between the binodal and the spinodal
+  UNSTABLE    inside the spinodal
+
+The margin is a fraction of the energy span of the dome, and covers the
+error of the interpolated curves, so that the FAR states are certain to
+be single-phase.  The table EOS (see eos_backends.TableEOS) uses the
+index to send the NEAR and two-phase states, where its interpolation
+is poor, to the reference EOS, and everything else through the table:
+
+  index = build_phase_index("Nitrogen", margin=0.05)
+  near = index.near(dens, eint)
+
+The spinodal is where (dp/drho)_T of the single-phase EOS first stops
+decreasing, coming from either side of the dome: for a cubic EOS this
+is the zero of the van der Waals loop, and a multiparameter EOS (e.g.
+CoolProp's HEOS) has spurious oscillations inside the dome, which this
+stops short of.
+
+The index keeps the number of states of each class it is asked about,
+and, with end_step(), the number of cells of each class per step.
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+import CoolProp.CoolProp as CP
+
+from util import msg
+
+
+FAR = 0
+NEAR = 1
+METASTABLE = 2
+UNSTABLE = 3
+
+names = ["far", "near", "metastable", "unstable"]
+
+
+class PhaseIndex(object):
+    """
+    the binodal and the spinodal of a fluid as curves e(rho)
+    """
+
+    def __init__(self, rho_sat, e_sat, rho_spin, e_spin, margin=0.05):
+        """
+        Set up the index from the two curves.
+
+        Parameters
+        ----------
+        rho_sat, e_sat : ndarray
+            The binodal, from the vapor at the lowest temperature to
+            the liquid at the lowest temperature (increasing density)
+        rho_spin, e_spin : ndarray
+            The spinodal, in the same order
+        margin : float, optional
+            The width of the NEAR band above the binodal, as a fraction
+            of the energy span of the binodal
+
+        """
+
+        self.rho_sat = np.asarray(rho_sat, dtype=np.float64)
+        self.e_sat = np.asarray(e_sat, dtype=np.float64)
+        self.rho_spin = np.asarray(rho_spin, dtype=np.float64)
+        self.e_spin = np.asarray(e_spin, dtype=np.float64)
+
+        if np.any(np.diff(self.rho_sat) <= 0.0) or np.any(np.diff(self.rho_spin) <= 0.0):
+            msg.fail("ERROR: the saturation curves must be in increasing density")
+
+        self.margin = margin
+        self.delta = margin*(self.e_sat.max() - self.e_sat.min())
+
+        self.stats = {n: 0 for n in ["calls", "cells"] + names}
+        self.steps = []
+
+    def _below(self, rho, e, rho_c, e_c, delta=0.0):
+        """ whether the states are below the curve (rho_c, e_c) + delta """
+        return e < np.interp(rho, rho_c, e_c + delta, left=-np.inf, right=-np.inf)
+
+    def classify(self, dens, eint, count=True):
+        """
+        the class (FAR, NEAR, METASTABLE or UNSTABLE) of each state, as
+        an int8 array of the shape of dens
+        """
+
+        dens, eint = np.broadcast_arrays(np.asarray(dens, dtype=np.float64),
+                                         np.asarray(eint, dtype=np.float64))
+
+        cls = np.zeros(dens.shape, dtype=np.int8)
+        cls[self._below(dens, eint, self.rho_sat, self.e_sat, self.delta)] = NEAR
+        cls[self._below(dens, eint, self.rho_sat, self.e_sat)] = METASTABLE
+        cls[self._below(dens, eint, self.rho_spin, self.e_spin)] = UNSTABLE
+
+        if count:
+            n = np.bincount(cls.ravel(), minlength=4)
+            self.stats["calls"] += 1
+            self.stats["cells"] += cls.size
+            for k, name in enumerate(names):
+                self.stats[name] += int(n[k])
+
+        return cls
+
+    def near(self, dens, eint):
+        """ whether each state is near or inside the dome (not FAR) """
+        return self.classify(dens, eint) != FAR
+
+    def end_step(self, dens, eint):
+        """
+        Record the number of cells of each class of the state (dens,
+        eint) at the end of a step.
+        """
+        n = np.bincount(self.classify(dens, eint, count=False).ravel(), minlength=4)
+        self.steps.append([int(x) for x in n])
+
+    def report(self):
+        """ the lines of the summary of the statistics """
+        s = self.stats
+        lines = ["{} calls, {} states: {} far, {} near, {} metastable, {} unstable "
+                 "({:6.4f} sent to the reference EOS)".format(
+                     s["calls"], s["cells"], s["far"], s["near"], s["metastable"],
+                     s["unstable"], 1.0 - s["far"]/max(s["cells"], 1))]
+
+        if self.steps:
+            steps = np.array(self.steps)
+            dome = steps[:,1:].sum(axis=1)
+            lines.append("{} steps, cells near or inside the dome per step: "
+                         "min {}, mean {:.1f}, max {}, last {} (near {}, metastable {}, unstable {})".format(
+                             len(steps), dome.min(), dome.mean(), dome.max(), dome[-1],
+                             *steps[-1,1:]))
+        return lines
+
+
+def _spinodal(AS, T, rho_v, rho_l, nrho):
+    """
+    the vapor and liquid spinodal densities and energies at T, where
+    (dp/drho)_T of the single-phase EOS (AS, with an imposed phase)
+    first stops decreasing from rho_v upwards and from rho_l downwards
+    """
+
+    rho = np.linspace(rho_v, rho_l, nrho)
+    dpdrho = np.full(nrho, np.nan)
+    for i, r in enumerate(rho):
+        try:
+            AS.update(CP.DmassT_INPUTS, r, T)
+            dpdrho[i] = AS.first_partial_deriv(CP.iP, CP.iDmass, CP.iT)
+        except ValueError:
+            continue
+
+    def stop(d):
+        # the first point where d is not positive, or turns up
+        for i in range(1, len(d) - 1):
+            if not d[i] > 0.0 or d[i+1] > d[i]:
+                return i
+        return len(d) - 1
+
+    out = []
+    for i in [stop(dpdrho), nrho - 1 - stop(dpdrho[::-1])]:
+        AS.update(CP.DmassT_INPUTS, rho[i], T)
+        out += [rho[i], AS.umass()]
+    return out
+
+
+def build_phase_index(fluid, backend="HEOS", margin=0.05, reference=None,
+                      nT=48, nrho=200):
+    """
+    Compute the binodal and the spinodal of a fluid with CoolProp.
+
+    Parameters
+    ----------
+    fluid : str
+        The CoolProp name of the fluid
+    backend : str, optional
+        The CoolProp backend ("HEOS", or "PR" for the Peng-Robinson
+        EOS), which sets the energy reference of the curves
+    margin : float, optional
+        The width of the NEAR band (see PhaseIndex)
+    reference : EOSBackend object, optional
+        The EOS the index is for, if its energy reference differs from
+        that of CoolProp (e.g. the PR backends, with the NASA
+        polynomials): the curves are shifted by the difference of the
+        energies of the two at (rho_c, 1.5 T_c)
+    nT : int, optional
+        The number of temperatures, clustered at the critical point
+    nrho : int, optional
+        The number of densities the spinodal is searched on at each
+        temperature
+
+    Returns
+    -------
+    out : PhaseIndex object
+
+    """
+
+    AS = CP.AbstractState(backend, fluid)
+    single = CP.AbstractState(backend, fluid)
+    single.specify_phase(CP.iphase_gas)
+
+    Tc = AS.T_critical()
+    T_min = max(AS.Ttriple(), AS.Tmin())
+
+    s = np.linspace(0.0, 1.0, nT, endpoint=False)
+    T = Tc - (Tc - T_min)*(1.0 - s)**2
+
+    vap, liq, spin_v, spin_l = [], [], [], []
+    for t in T:
+        try:
+            AS.update(CP.QT_INPUTS, 1.0, t)
+            rho_v, e_v = AS.rhomass(), AS.umass()
+            AS.update(CP.QT_INPUTS, 0.0, t)
+            rho_l, e_l = AS.rhomass(), AS.umass()
+        except ValueError:
+            continue
+        vap.append((rho_v, e_v))
+        liq.append((rho_l, e_l))
+
+        r_v, u_v, r_l, u_l = _spinodal(single, t, rho_v, rho_l, nrho)
+        spin_v.append((r_v, u_v))
+        spin_l.append((r_l, u_l))
+
+    AS.update(CP.DmassT_INPUTS, AS.rhomass_critical(), Tc)
+    crit = [(AS.rhomass(), AS.umass())]
+
+    def curve(lo, hi):
+        # vapor side up to the critical point and down the liquid side,
+        # keeping the points of increasing density
+        pts = np.array(lo + crit + hi[::-1])
+        prev = np.concatenate([[-np.inf], np.maximum.accumulate(pts[:-1,0])])
+        keep = pts[:,0] > prev
+        return pts[keep,0], pts[keep,1]
+
+    rho_sat, e_sat = curve(vap, liq)
+    rho_spin, e_spin = curve(spin_v, spin_l)
+
+    if reference is not None:
+        rho0 = AS.rhomass_critical()
+        AS.update(CP.DmassT_INPUTS, rho0, 1.5*Tc)
+        shift = float(reference.rhoe(np.array([rho0]), np.array([AS.p()]))[0])/rho0 - AS.umass()
+        e_sat += shift
+        e_spin += shift
+
+    return PhaseIndex(rho_sat, e_sat, rho_spin, e_spin, margin=margin)
@@ -0,0 +1,111 @@
+"""
+Instrumentation of the EOS calls.  An EOSProfile wraps the EOS
+functions (e.g. eos.pres(dens, eint)), and records for each call site
+(the file, function and line the EOS was called from) and each EOS
+function
+
+  calls     the number of calls
+  cells     the number of states evaluated
+  newton    the number of Newton iterations of the T(e, rho) solves of
+            the Peng-Robinson backends, summed over the cells (from
+            thermodynamics_tools.newton_stats)
+  seconds   the wall clock time spent in the calls
+
+  profile = EOSProfile()
+  pres = profile.wrap(eos.pres, "pres")
+  p = pres(dens, eint)
+  tc.add_report("EOS calls", profile.report)
+
+The wrapped functions are only installed by eos.init() if eos.profile
+is set, so the EOS calls cost nothing more when it is not.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+import numpy as np
+
+import thermodynamics_tools as tools
+
+
+class EOSProfile(object):
+    """ the statistics of the EOS calls, by EOS function and call site """
+
+    def __init__(self):
+        # (name, (filename, function, line)) -> [calls, cells, newton, seconds]
+        self.stats = {}
+
+    def clear(self):
+        """ forget the statistics """
+        self.stats.clear()
+
+    def record(self, name, site, ncells, seconds, newton=0):
+        """ add a call of the EOS function name from site to the statistics """
+        s = self.stats.get((name, site))
+        if s is None:
+            s = self.stats[(name, site)] = [0, 0, 0, 0.0]
+        s[0] += 1
+        s[1] += ncells
+        s[2] += newton
+        s[3] += seconds
+
+    def wrap(self, func, name=None):
+        """
+        func, recording its calls under name (func.__name__ by
+        default), by the call site of the wrapper
+        """
+        if name is None:
+            name = func.__name__
+        counter = tools.newton_stats
+
+        def instrumented(*args):
+            f = sys._getframe(1)
+            site = (f.f_code.co_filename, f.f_code.co_name, f.f_lineno)
+            n0 = counter["cell_iterations"]
+            t0 = time.perf_counter()
+            out = func(*args)
+            self.record(name, site, np.size(args[0]), time.perf_counter() - t0,
+                        counter["cell_iterations"] - n0)
+            return out
+
+        instrumented.__name__ = name
+        instrumented.__doc__ = func.__doc__
+        return instrumented
+
+    def totals(self):
+        """ the statistics summed over the call sites, by EOS function """
+        out = {}
+        for (name, _), s in self.stats.items():
+            t = out.setdefault(name, [0, 0, 0, 0.0])
+            for k in range(4):
+                t[k] += s[k]
+        return out
+
+    def report(self):
+        """ the lines of the summary of the statistics, by decreasing time """
+        if not self.stats:
+            return ["no EOS calls"]
+
+        fmt = "{:8s} {:40s} {:>9} {:>12} {:>12} {:>10}  {:>8}"
+        lines = [fmt.format("function", "call site", "calls", "cells", "newton",
+                            "seconds", "s/cell")]
+
+        def row(name, where, s):
+            return fmt.format(name, where, s[0], s[1], s[2], "{:.4g}".format(s[3]),
+                              "{:.3g}".format(s[3]/max(s[1], 1)))
+
+        for (name, site), s in sorted(self.stats.items(), key=lambda x: -x[1][3]):
+            where = "{}:{}:{}".format(os.path.basename(site[0]), site[1], site[2])
+            lines.append(row(name, where, s))
+
+        total = [0, 0, 0, 0.0]
+        for name, s in sorted(self.totals().items(), key=lambda x: -x[1][3]):
+            lines.append(row(name, "(all)", s))
+            for k in range(4):
+                total[k] += s[k]
+        lines.append(row("all", "(all)", total))
+
+        return lines
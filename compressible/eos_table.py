@@ -0,0 +1,901 @@
+"""
+A tabulated equation of state.  The thermodynamic state is stored on a
+uniform grid in density and specific internal energy, (rho, e), and
+every query is answered by interpolating in that grid.  This replaces
+the per-cell calls into CoolProp (or the Peng-Robinson iteration) with
+a handful of vectorized array operations.
+
+The table holds the fields
+
+  p     : pressure
+  T     : temperature
+  c     : sound speed
+  gamma : effective ratio of specific heats, rho c^2 / p
+
+and, if the reference EOS provides them, the derivatives
+
+  dpdrho_e : (dp/drho) at constant e
+  dpde_rho : (dp/de) at constant rho
+
+so that a single lookup gives all the thermodynamic data the Riemann
+solvers and the characteristic tracing need.  They satisfy
+c^2 = dpdrho_e + p/rho^2 dpde_rho, which error_report() checks.  The
+table is built once, from a reference function, with build_table().
+
+  tab = build_table(props, rho_min, rho_max, nrho, e_min, e_max, ne)
+  p = tab.pres(dens, eint)
+
+The inverse query, e(rho, p), is done by a vectorized bisection along
+the internal energy axis of the bilinear interpolant, so a pres() ->
+eint() round trip returns the original energy to round-off.  An
+InverseTable tabulates e and c in (rho, p) from a forward table
+instead, so that e(rho, p) is a direct interpolation, at the price of
+a round trip error of the order of the interpolation error (which it
+reports when built).
+
+Since building a fine table from CoolProp takes a while, cached_table()
+keeps the tables in a directory of binary files, one per hash of the
+EOS and the table bounds (see table_key()).  A table found there is
+memory-mapped read-only, so the runs on one node share its pages.
+
+A table can be stored in float32 (build_table(..., dtype=np.float32)),
+which halves its memory and the bandwidth of the lookups.  The
+interpolation weights and sums stay in float64, and precision_report()
+compares the float32 table with the float64 one it was rounded from.
+
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from util import msg
+
+
+class EOSTable(object):
+    """
+    a (rho, e) table of thermodynamic state variables
+    """
+
+    all_fields = ["p", "T", "c", "gamma", "dpdrho_e", "dpde_rho"]
+
+    def __init__(self, rho_min, rho_max, e_min, e_max, data,
+                 interp="bilinear"):
+        """
+        Initialize the table from already tabulated data.
+
+        Parameters
+        ----------
+        rho_min, rho_max : float
+            The density range covered by the table
+        e_min, e_max : float
+            The specific internal energy range covered by the table
+        data : dict
+            The tabulated fields (p, T, c, gamma, and optionally
+            dpdrho_e and dpde_rho), each an array of shape (nrho, ne)
+            indexed as data[name][i, j] = f(rho_i, e_j).  Other fields
+            (e.g. the transport properties of transport.py) are
+            interpolated the same way, but pres(), eint() and
+            error_report() need p, T and c
+        interp : {'bilinear', 'bicubic'}, optional
+            The interpolation used for the forward queries
+
+        """
+
+        if interp not in ["bilinear", "bicubic"]:
+            msg.fail("ERROR: table interpolation {} undefined".format(interp))
+
+        self.data = data
+        self.fields = [n for n in self.all_fields if n in data] + \
+            sorted(n for n in data if n not in self.all_fields)
+
+        self.nrho, self.ne = data[self.fields[0]].shape
+
+        self.rho_min = rho_min
+        self.rho_max = rho_max
+        self.e_min = e_min
+        self.e_max = e_max
+
+        self.drho = (rho_max - rho_min)/(self.nrho - 1)
+        self.de = (e_max - e_min)/(self.ne - 1)
+
+        self.interp = interp
+
+
+    def astype(self, dtype):
+        """ a copy of the table with the fields stored as dtype """
+        data = {n: np.asarray(self.data[n], dtype=dtype) for n in self.fields}
+        return EOSTable(self.rho_min, self.rho_max, self.e_min, self.e_max,
+                        data, interp=self.interp)
+
+    @property
+    def nbytes(self):
+        """ the memory used by the tabulated fields """
+        return sum(self.data[n].nbytes for n in self.fields)
+
+
+    def rho_nodes(self):
+        """ return the density of each table row """
+        return self.rho_min + self.drho*np.arange(self.nrho)
+
+    def e_nodes(self):
+        """ return the internal energy of each table column """
+        return self.e_min + self.de*np.arange(self.ne)
+
+
+    def _locate(self, x, x_min, dx, n):
+        """
+        find the cell (i, i+1) holding x and the fractional position
+        of x in it.  Points outside the table use the edge cell, which
+        amounts to linear extrapolation.
+        """
+        s = (x - x_min)/dx
+        i = np.clip(np.floor(s).astype(np.intp), 0, n-2)
+        return i, s - i
+
+    @staticmethod
+    def _cubic_weights(t):
+        """ Catmull-Rom (Keys, a = -1/2) weights for the 4-point stencil """
+        t2 = t*t
+        t3 = t2*t
+        return [-0.5*t3 + t2 - 0.5*t,
+                1.5*t3 - 2.5*t2 + 1.0,
+                -1.5*t3 + 2.0*t2 + 0.5*t,
+                0.5*t3 - 0.5*t2]
+
+    def stencil(self, rho, e):
+        """
+        Compute the interpolation stencil (indices and weights) for
+        the states (rho, e).  The stencil only depends on the state,
+        so it can be reused for every field.
+
+        Parameters
+        ----------
+        rho : ndarray
+            The density
+        e : ndarray
+            The specific internal energy
+
+        Returns
+        -------
+        out : tuple
+            The flattened row and column indices and the matching
+            weights, for use with apply()
+
+        """
+
+        rho = np.asarray(rho, dtype=np.float64).ravel()
+        e = np.asarray(e, dtype=np.float64).ravel()
+
+        i, tx = self._locate(rho, self.rho_min, self.drho, self.nrho)
+        j, ty = self._locate(e, self.e_min, self.de, self.ne)
+
+        if self.interp == "bilinear":
+            ii = [i, i+1]
+            jj = [j, j+1]
+            wx = [1.0 - tx, tx]
+            wy = [1.0 - ty, ty]
+        else:
+            ii = [np.clip(i + m, 0, self.nrho-1) for m in range(-1, 3)]
+            jj = [np.clip(j + m, 0, self.ne-1) for m in range(-1, 3)]
+            wx = self._edge_weights(self._cubic_weights(tx), i, self.nrho)
+            wy = self._edge_weights(self._cubic_weights(ty), j, self.ne)
+
+        return ii, jj, wx, wy
+
+    @staticmethod
+    def _edge_weights(w, i, n):
+        """
+        in the first and last cell, the stencil reaches one node past
+        the table.  We extrapolate that node linearly from the two
+        nodes inside (f_{-1} = 2 f_0 - f_1), and fold its weight into
+        theirs
+        """
+        lo = i == 0
+        hi = i == n-2
+        w0, w1, w2, w3 = w
+        return [np.where(lo, 0.0, w0),
+                w1 + np.where(lo, 2.0*w0, 0.0) - np.where(hi, w3, 0.0),
+                w2 - np.where(lo, w0, 0.0) + np.where(hi, 2.0*w3, 0.0),
+                np.where(hi, 0.0, w3)]
+
+    def apply(self, name, stencil, shape=None):
+        """
+        Interpolate the field name using a stencil returned by
+        stencil().  The result is reshaped to shape if given.
+        """
+
+        f = self.data[name]
+        ii, jj, wx, wy = stencil
+
+        out = np.zeros(ii[0].shape)
+        for a in range(len(ii)):
+            row = np.zeros(ii[0].shape)
+            for b in range(len(jj)):
+                row += wy[b]*f[ii[a], jj[b]]
+            out += wx[a]*row
+
+        if shape is not None:
+            out = out.reshape(shape)
+        return out
+
+    def lookup(self, rho, e, names=None):
+        """
+        Interpolate several fields at once, sharing the stencil.
+
+        Parameters
+        ----------
+        rho : ndarray
+            The density
+        e : ndarray
+            The specific internal energy
+        names : list of str, optional
+            The fields to return (defaults to all of them)
+
+        Returns
+        -------
+        out : list of ndarray
+            The interpolated fields, in the order of names
+
+        """
+
+        if names is None:
+            names = self.fields
+        shape = np.shape(rho)
+        st = self.stencil(rho, e)
+        return [self.apply(n, st, shape) for n in names]
+
+
+    def pres(self, rho, e):
+        """ the pressure as a function of (rho, e) """
+        return self.lookup(rho, e, ["p"])[0]
+
+    def temp(self, rho, e):
+        """ the temperature as a function of (rho, e) """
+        return self.lookup(rho, e, ["T"])[0]
+
+    def sound(self, rho, e):
+        """ the sound speed as a function of (rho, e) """
+        return self.lookup(rho, e, ["c"])[0]
+
+    def gamma(self, rho, e):
+        """ the effective ratio of specific heats as a function of (rho, e) """
+        return self.lookup(rho, e, ["gamma"])[0]
+
+    def derivs(self, rho, e):
+        """ (dp/drho)_e and (dp/de)_rho as functions of (rho, e) """
+        return self.lookup(rho, e, ["dpdrho_e", "dpde_rho"])
+
+
+    def eint(self, rho, p):
+        """
+        Invert the table for the specific internal energy given the
+        density and the pressure.  At fixed density, the pressure is
+        monotonically increasing with e away from the two-phase
+        region, so we bisect on the column index of the density-
+        interpolated pressure, and then invert the linear segment.
+        The bilinear interpolant is used regardless of self.interp.
+
+        Parameters
+        ----------
+        rho : ndarray
+            The density
+        p : ndarray
+            The pressure
+
+        Returns
+        -------
+        out : ndarray
+           The specific internal energy
+
+        """
+
+        shape = np.shape(rho)
+        rho = np.asarray(rho, dtype=np.float64).ravel()
+        p = np.broadcast_to(np.asarray(p, dtype=np.float64), shape).ravel()
+
+        P = self.data["p"]
+
+        i, tx = self._locate(rho, self.rho_min, self.drho, self.nrho)
+
+        def p_row(j):
+            return (1.0 - tx)*P[i, j] + tx*P[i+1, j]
+
+        lo = np.zeros(rho.shape, dtype=np.intp)
+        hi = np.full(rho.shape, self.ne-1, dtype=np.intp)
+
+        while np.any(hi - lo > 1):
+            mid = (lo + hi)//2
+            below = p_row(mid) <= p
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+
+        p_lo = p_row(lo)
+        p_hi = p_row(lo+1)
+
+        # a flat segment (p_hi == p_lo) does not set e: take its midpoint
+        dp = p_hi - p_lo
+        flat = dp == 0.0
+        t = (p - p_lo)/np.where(flat, 1.0, dp)
+        t[flat] = 0.5
+
+        e = self.e_min + self.de*(lo + t)
+        return e.reshape(shape)
+
+
+    def error_report(self, props, nsample=32):
+        """
+        Compare the table against the reference function at the
+        centers of a sample of table cells -- the points furthest from
+        the table nodes -- and print the maximum and mean relative
+        error of each field.
+
+        Parameters
+        ----------
+        props : function
+            The reference EOS, props(rho, e) -> (p, T, c)
+        nsample : int, optional
+            The number of sampled cells in each direction
+
+        Returns
+        -------
+        out : dict
+            The (max, mean) relative error of each field
+
+        """
+
+        si = np.unique(np.linspace(0, self.nrho-2, min(nsample, self.nrho-1)).astype(int))
+        sj = np.unique(np.linspace(0, self.ne-2, min(nsample, self.ne-1)).astype(int))
+
+        rho = self.rho_min + self.drho*(si + 0.5)
+        e = self.e_min + self.de*(sj + 0.5)
+        rho2d, e2d = np.meshgrid(rho, e, indexing="ij")
+
+        exact = _evaluate(props, rho2d, e2d)
+        approx = dict(zip(self.fields, self.lookup(rho2d, e2d)))
+
+        report = {}
+        for n in self.fields:
+            if n not in exact:
+                continue
+            valid = np.isfinite(exact[n]) & np.isfinite(approx[n])
+            if not np.any(valid):
+                continue
+            err = np.abs(approx[n][valid] - exact[n][valid])/np.abs(exact[n][valid])
+            report[n] = (err.max(), err.mean())
+
+        msg.bold("EOS table: {} x {} ({}), rho = [{}, {}], e = [{}, {}]".format(
+            self.nrho, self.ne, self.interp,
+            self.rho_min, self.rho_max, self.e_min, self.e_max))
+        for n in self.fields:
+            if n in report:
+                print("   {:6s} max rel. error = {:10.4g}, mean rel. error = {:10.4g}".format(
+                    n, report[n][0], report[n][1]))
+
+        if "dpdrho_e" in self.data:
+            err = sound_consistency(self.data, self.rho_nodes()[:, np.newaxis])
+            print("   c^2 vs. dp/drho|e + p/rho^2 dp/de|rho: max rel. difference = {:10.4g}".format(err))
+
+        nbad = np.count_nonzero(~np.isfinite(self.data["p"]))
+        if nbad > 0:
+            msg.warning("   {} of {} table points are outside the reference EOS range".format(
+                nbad, self.data["p"].size))
+
+        return report
+
+
+def precision_report(tab, ref, nsample=64, report=True):
+    """
+    Compare the lookups of a table stored in reduced precision (e.g.
+    tab = ref.astype(np.float32)) with those of the float64 table ref,
+    at nsample x nsample random states over the table range, and print
+    the maximum and mean relative difference of each field and the
+    memory of both.  This works for the tables of eos_adaptive.py too.
+
+    Returns
+    -------
+    out : dict
+        The (max, mean) relative difference of each field
+
+    """
+
+    rng = np.random.RandomState(0)
+    rho = rng.uniform(tab.rho_min, tab.rho_max, (nsample, nsample))
+    e = rng.uniform(tab.e_min, tab.e_max, (nsample, nsample))
+
+    diff = {}
+    for n, a, b in zip(tab.fields, tab.lookup(rho, e), ref.lookup(rho, e, tab.fields)):
+        valid = np.isfinite(a) & np.isfinite(b) & (b != 0.0)
+        if not np.any(valid):
+            continue
+        err = np.abs(a[valid] - b[valid])/np.abs(b[valid])
+        diff[n] = (err.max(), err.mean())
+
+    if report:
+        dtype = tab.data[tab.fields[0]].dtype
+        msg.bold("EOS table: stored in {}, {:.4g} MB (float64: {:.4g} MB)".format(
+            dtype.name, tab.nbytes/2**20, ref.nbytes/2**20))
+        for n in tab.fields:
+            if n in diff:
+                print("   {:6s} max rel. difference to float64 = {:10.4g}, mean = {:10.4g}".format(
+                    n, diff[n][0], diff[n][1]))
+
+    return diff
+
+
+class InverseTable(object):
+    """
+    e and c as functions of (rho, p), tabulated from a forward (rho, e)
+    table (an EOSTable or an AdaptiveEOSTable).  The pressure range of a
+    density varies by orders of magnitude over the table, so each row
+    i holds np points uniform in p between the smallest and the largest
+    pressure of the forward table at rho_i.  A query is interpolated
+    bilinearly in rho and in the fraction of the pressure range (itself
+    interpolated in rho) p is at.
+    """
+
+    fields = ["e", "c"]
+
+    def __init__(self, tab, nrho, np_):
+        """
+        Tabulate the inverse of the forward table tab, inverting it
+        once, for all the nodes, with tab.eint().
+
+        Parameters
+        ----------
+        tab : EOSTable or AdaptiveEOSTable object
+            The forward table
+        nrho : int
+            The number of density points (over the density range of
+            tab)
+        np_ : int
+            The number of pressure points of each density
+
+        """
+
+        self.rho_min = tab.rho_min
+        self.rho_max = tab.rho_max
+        self.nrho = nrho
+        self.np = np_
+        self.drho = (self.rho_max - self.rho_min)/(nrho - 1)
+
+        rho = self.rho_min + self.drho*np.arange(nrho)
+        e = tab.e_min + (tab.e_max - tab.e_min)/(np_ - 1)*np.arange(np_)
+        rho2d, e2d = np.meshgrid(rho, e, indexing="ij")
+
+        with np.errstate(invalid="ignore"):
+            p = tab.pres(rho2d, e2d)
+            self.p_lo = np.nanmin(p, axis=1)
+            self.p_hi = np.nanmax(p, axis=1)
+
+        s = np.linspace(0.0, 1.0, np_)
+        P = self.p_lo[:, np.newaxis] + (self.p_hi - self.p_lo)[:, np.newaxis]*s
+        with np.errstate(invalid="ignore"):
+            E = tab.eint(rho2d, P)
+            E[~((E >= tab.e_min) & (E <= tab.e_max))] = np.nan
+            C = tab.sound(rho2d, E)
+
+        dtype = tab.data[tab.fields[0]].dtype
+        self.data = {"e": E.astype(dtype), "c": C.astype(dtype)}
+
+    @property
+    def nbytes(self):
+        """ the memory used by the tabulated fields """
+        return sum(self.data[n].nbytes for n in self.fields)
+
+    def lookup(self, rho, p, names=None):
+        """
+        Interpolate several fields (e and c) at once, sharing the
+        stencil.  States outside of the pressure range of the table are
+        extrapolated linearly.
+        """
+
+        if names is None:
+            names = self.fields
+        shape = np.shape(rho)
+        rho = np.asarray(rho, dtype=np.float64).ravel()
+        p = np.broadcast_to(np.asarray(p, dtype=np.float64), shape).ravel()
+
+        x = (rho - self.rho_min)/self.drho
+        i = np.clip(np.floor(x).astype(np.intp), 0, self.nrho-2)
+        tx = x - i
+
+        # the pressure range at rho, and the fraction of it p is at
+        p_lo = (1.0 - tx)*self.p_lo[i] + tx*self.p_lo[i+1]
+        p_hi = (1.0 - tx)*self.p_hi[i] + tx*self.p_hi[i+1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            y = (p - p_lo)/(p_hi - p_lo)*(self.np - 1)
+        j = np.clip(np.floor(np.nan_to_num(y)).astype(np.intp), 0, self.np-2)
+        ty = y - j
+
+        out = []
+        for n in names:
+            f = self.data[n]
+            out.append(((1.0 - tx)*((1.0 - ty)*f[i, j] + ty*f[i, j+1]) +
+                        tx*((1.0 - ty)*f[i+1, j] + ty*f[i+1, j+1])).reshape(shape))
+        return out
+
+    def eint(self, rho, p):
+        """ the specific internal energy as a function of (rho, p) """
+        return self.lookup(rho, p, ["e"])[0]
+
+    def sound(self, rho, p):
+        """ the sound speed as a function of (rho, p) """
+        return self.lookup(rho, p, ["c"])[0]
+
+    def roundtrip_report(self, tab, nsample=64, report=True):
+        """
+        The max. and mean error of the energy (relative to the energy
+        range) after a round trip e -> p = tab.pres(rho, e) -> e(rho, p)
+        through this table, at nsample x nsample random states of the
+        forward table tab, and the relative error of the pressure
+        p(rho, e(rho, p)) after the reverse trip.
+        """
+
+        rng = np.random.RandomState(0)
+        rho = rng.uniform(tab.rho_min, tab.rho_max, (nsample, nsample))
+        e = rng.uniform(tab.e_min, tab.e_max, (nsample, nsample))
+
+        err = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p = tab.pres(rho, e)
+            e2 = self.eint(rho, p)
+            p2 = tab.pres(rho, e2)
+            for n, a, b, scale in [("e", e2, e, tab.e_max - tab.e_min), ("p", p2, p, np.abs(p))]:
+                d = np.abs(a - b)/scale
+                d = d[np.isfinite(d)]
+                err[n] = (d.max(), d.mean()) if d.size > 0 else (0.0, 0.0)
+
+        if report:
+            msg.bold("EOS inverse table: {} x {} in (rho, p), {:.4g} MB".format(
+                self.nrho, self.np, self.nbytes/2**20))
+            print("   e -> p -> e: max error = {:10.4g}, mean = {:10.4g} (of the e range)".format(*err["e"]))
+            print("   p -> e -> p: max rel. error = {:10.4g}, mean = {:10.4g}".format(*err["p"]))
+
+        return err
+
+
+def sound_consistency(data, rho):
+    """
+    The max. relative difference between c^2 and the sound speed
+    squared from the derivatives, dp/drho|e + p/rho^2 dp/de|rho, over
+    the states of data (a dict of the fields) of densities rho.
+    """
+    p, c = data["p"], data["c"]
+    c2 = data["dpdrho_e"] + p/rho**2*data["dpde_rho"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        err = np.abs(c2 - c**2)/c**2
+    err = err[np.isfinite(err)]
+    return err.max() if err.size > 0 else 0.0
+
+
+def _evaluate(props, rho, e):
+    """
+    evaluate the reference EOS and derive gamma.  States the reference
+    cannot evaluate are stored as NaN
+    """
+
+    return _fields(props(rho, e), rho)
+
+
+# the fields the reference EOS returns, in order: p, T and c, and
+# optionally the two derivatives
+_props_fields = ["p", "T", "c", "dpdrho_e", "dpde_rho"]
+
+def _fields(out, rho):
+    """
+    the table fields from the output of the reference EOS on the grid
+    of densities rho
+    """
+
+    data = {}
+    for n, q in zip(_props_fields, out):
+        data[n] = np.array(q, dtype=np.float64).reshape(rho.shape)
+        data[n][~np.isfinite(data[n])] = np.nan
+
+    data["gamma"] = data["c"]**2*rho/data["p"]
+
+    return data
+
+
+def _fill_rows(props, shm_name, shape, rho, e, i0, i1):
+    """
+    evaluate the rows i0:i1 of the table into the shared memory block
+    shm_name, an array of shape (nq, nrho, ne) holding the nq outputs
+    of props
+    """
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        rho2d, e2d = np.meshgrid(rho[i0:i1], e, indexing="ij")
+        for k, q in enumerate(props(rho2d, e2d)):
+            out[k, i0:i1, :] = np.reshape(q, rho2d.shape)
+        del out
+    finally:
+        shm.close()
+
+    return i1 - i0
+
+
+def _evaluate_parallel(props, rho, e, nworkers):
+    """
+    evaluate the reference EOS on the (rho, e) grid with a pool of
+    nworkers processes, each filling blocks of rows of a shared memory
+    buffer, and report the progress and the throughput
+    """
+
+    nrho, ne = len(rho), len(e)
+
+    # the number of outputs of props
+    nq = len(props(rho[:1], e[:1]))
+    shape = (nq, nrho, ne)
+
+    # a few blocks per worker, so that the slow (e.g. two-phase) rows
+    # are shared out
+    nrow = max(1, nrho//(4*nworkers))
+    blocks = [(i0, min(i0 + nrow, nrho)) for i0 in range(0, nrho, nrow)]
+
+    shm = shared_memory.SharedMemory(create=True, size=8*int(np.prod(shape)))
+    try:
+        out = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        out[:] = np.nan
+
+        msg.bold("EOS table: evaluating {} x {} states with {} processes".format(
+            nrho, ne, nworkers))
+
+        t0 = time.time()
+        done = 0
+        step = max(1, nrho//10)
+        with ProcessPoolExecutor(max_workers=nworkers) as pool:
+            futures = [pool.submit(_fill_rows, props, shm.name, shape, rho, e, i0, i1)
+                       for i0, i1 in blocks]
+            for f in as_completed(futures):
+                n = f.result()
+                if (done + n)//step > done//step or done + n == nrho:
+                    dt = max(time.time() - t0, 1.e-12)
+                    print("   {:6d} / {} rows ({:5.1f}%), {:10.4g} states/s".format(
+                        done + n, nrho, 100.0*(done + n)/nrho, (done + n)*ne/dt))
+                done += n
+
+        res = [q.copy() for q in out]
+        del out
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return _fields(res, rho[:, np.newaxis]*np.ones((1, ne)))
+
+
+def build_table(props, rho_min, rho_max, nrho, e_min, e_max, ne,
+                interp="bilinear", report=True, nworkers=1, dtype=np.float64):
+    """
+    Tabulate a reference EOS on a uniform (rho, e) grid.
+
+    Parameters
+    ----------
+    props : function
+        The reference EOS, props(rho, e) -> (p, T, c) or (p, T, c,
+        dpdrho_e, dpde_rho), taking and returning arrays
+    rho_min, rho_max : float
+        The density range
+    nrho : int
+        The number of density points
+    e_min, e_max : float
+        The specific internal energy range
+    ne : int
+        The number of internal energy points
+    interp : {'bilinear', 'bicubic'}, optional
+        The interpolation used for the forward queries
+    report : bool, optional
+        Print the interpolation error against the reference EOS
+    nworkers : int, optional
+        The number of processes the table is evaluated with (0: one
+        per core).  With more than one, props must be picklable (e.g. a
+        module function or the method of a backend object)
+    dtype : dtype, optional
+        The type the fields are stored as (float64 or float32).  The
+        table is built in float64 and then rounded, with a
+        precision_report() if report is set
+
+    Returns
+    -------
+    out : EOSTable object
+        The table
+
+    """
+
+    if nworkers == 0:
+        nworkers = os.cpu_count() or 1
+
+    rho = rho_min + (rho_max - rho_min)/(nrho - 1)*np.arange(nrho)
+    e = e_min + (e_max - e_min)/(ne - 1)*np.arange(ne)
+    if nworkers > 1:
+        data = _evaluate_parallel(props, rho, e, nworkers)
+    else:
+        rho2d, e2d = np.meshgrid(rho, e, indexing="ij")
+        data = _evaluate(props, rho2d, e2d)
+
+    tab = EOSTable(rho_min, rho_max, e_min, e_max, data, interp=interp)
+
+    if report:
+        tab.error_report(props)
+
+    if np.dtype(dtype) != np.float64:
+        ref = tab
+        tab = ref.astype(dtype)
+        if report:
+            precision_report(tab, ref)
+
+    return tab
+
+
+# the layout of the table files: the magic string, the format version
+# and the length of the JSON header (struct _HEAD), the JSON header, and
+# then, from offset _ALIGN*k, the fields as one array of shape
+# (len(fields), nrho, ne), of the dtype of the header (float64 if it
+# has none)
+_MAGIC = b"EOSTABLE"
+_HEAD = "<8sII"
+_ALIGN = 64
+
+FORMAT_VERSION = 2
+
+
+def table_key(**kwargs):
+    """
+    The hash identifying a table, from keyword arguments describing the
+    EOS and the table (fluid, backend, library version, bounds,
+    resolution, ...).  Any JSON-serializable values can be used.
+    """
+    kwargs["format_version"] = FORMAT_VERSION
+    s = json.dumps(kwargs, sort_keys=True)
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+
+def save_table(tab, path, meta=None):
+    """
+    Write a table to path.  The file is written under a temporary name
+    and then renamed, so that concurrent runs never see a partial file.
+
+    Parameters
+    ----------
+    tab : EOSTable object
+        The table
+    path : str
+        The file name
+    meta : dict, optional
+        Additional (JSON-serializable) information stored in the header
+
+    """
+
+    dtype = tab.data[tab.fields[0]].dtype.newbyteorder("<")
+    header = {"rho_min": tab.rho_min, "rho_max": tab.rho_max,
+              "e_min": tab.e_min, "e_max": tab.e_max,
+              "nrho": tab.nrho, "ne": tab.ne, "dtype": dtype.str,
+              "fields": tab.fields, "meta": meta or {}}
+    h = json.dumps(header, sort_keys=True).encode("utf-8")
+
+    head_len = struct.calcsize(_HEAD) + len(h)
+    offset = _ALIGN*((head_len + _ALIGN - 1)//_ALIGN)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               suffix=".tmp")
+    try:
+        os.chmod(tmp, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack(_HEAD, _MAGIC, FORMAT_VERSION, len(h)))
+            f.write(h)
+            f.write(b"\0"*(offset - head_len))
+            for n in tab.fields:
+                f.write(np.ascontiguousarray(tab.data[n], dtype=dtype).tobytes())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def load_table(path, interp="bilinear"):
+    """
+    Memory-map a table written by save_table(), read-only.
+
+    Parameters
+    ----------
+    path : str
+        The file name
+    interp : {'bilinear', 'bicubic'}, optional
+        The interpolation used for the forward queries
+
+    Returns
+    -------
+    out : EOSTable object
+        The table, or None if the file is not a table of the current
+        format version
+
+    """
+
+    with open(path, "rb") as f:
+        head = f.read(struct.calcsize(_HEAD))
+        if len(head) < struct.calcsize(_HEAD):
+            return None
+        magic, version, hlen = struct.unpack(_HEAD, head)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            return None
+        header = json.loads(f.read(hlen).decode("utf-8"))
+
+    head_len = struct.calcsize(_HEAD) + hlen
+    offset = _ALIGN*((head_len + _ALIGN - 1)//_ALIGN)
+
+    fields = header["fields"]
+    shape = (len(fields), header["nrho"], header["ne"])
+    dtype = np.dtype(header.get("dtype", "<f8"))
+
+    if os.path.getsize(path) != offset + dtype.itemsize*int(np.prod(shape)):
+        return None
+
+    mm = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+    data = dict(zip(fields, mm))
+
+    return EOSTable(header["rho_min"], header["rho_max"],
+                    header["e_min"], header["e_max"], data, interp=interp)
+
+
+def cached_table(props, key, cache_dir, rho_min, rho_max, nrho, e_min, e_max, ne,
+                 interp="bilinear", report=True, nworkers=1, dtype=np.float64):
+    """
+    Return the table of the EOS props from the cache directory, or
+    build it with build_table() and store it there.
+
+    Parameters
+    ----------
+    props : function
+        The reference EOS, props(rho, e) -> (p, T, c)
+    key : dict
+        The description of the EOS (e.g. fluid, backend and library
+        version) -- with the table bounds and resolution, this is what
+        the file is named after (see table_key())
+    cache_dir : str
+        The cache directory (created if needed)
+    rho_min, rho_max, nrho, e_min, e_max, ne, interp, report, nworkers, dtype
+        As in build_table()
+
+    Returns
+    -------
+    out : EOSTable object
+        The table
+
+    """
+
+    # the float64 tables keep the names they had before dtype existed
+    extra = {} if np.dtype(dtype) == np.float64 else {"dtype": np.dtype(dtype).name}
+    name = table_key(eos=key, rho_min=rho_min, rho_max=rho_max, nrho=nrho,
+                     e_min=e_min, e_max=e_max, ne=ne, **extra)
+    cache_dir = os.path.expanduser(cache_dir)
+    path = os.path.join(cache_dir, "eos_table_{}.bin".format(name))
+
+    if os.path.isfile(path):
+        tab = load_table(path, interp=interp)
+        if tab is not None:
+            if report:
+                msg.bold("EOS table: {} x {} ({}), read from {}".format(
+                    tab.nrho, tab.ne, tab.interp, path))
+            return tab
+
+    tab = build_table(props, rho_min, rho_max, nrho, e_min, e_max, ne,
+                      interp=interp, report=report, nworkers=nworkers, dtype=dtype)
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+    save_table(tab, path, meta=key)
+
+    # use the mapped copy, so this run shares the pages with later ones
+    return load_table(path, interp=interp)
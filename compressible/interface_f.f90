@@ -1,17 +1,18 @@
 subroutine states(idir, qx, qy, ng, dx, dt, &
-                  nvar, &
+                  nvar, native_eos, &
                   speed, &
                   r, u, v, p, &
                   ldelta_r, ldelta_u, ldelta_v, ldelta_p, &
                   q_l, q_r)
-  !implicit none
-  EXTERNAL speed
+  use pr_eos
+  implicit none
+  double precision, external :: speed
 
   integer, intent(in) :: idir
   integer, intent(in) :: qx, qy, ng
   double precision, intent(in) :: dx, dt
   integer, intent(in) :: nvar
-  !double precision, intent(in) :: gamma
+  integer, intent(in) :: native_eos
 
   ! 0-based indexing to match python
   double precision, intent(inout) :: r(0:qx-1, 0:qy-1)
@@ -91,138 +92,57 @@ subroutine states(idir, qx, qy, ng, dx, dt, &
   !                    q_l,i q_r,i  q_l,i+1    
   !
   ! q_r,i and q_l,i+1 are computed using the information in zone i,j.
+  !
+  ! The sound speed of each zone comes from the Peng-Robinson EOS of
+  ! preos.f90 (native_eos = 1) or from the speed callback; the
+  ! tracing itself is done by states_batched.
 
   integer :: ilo, ihi, jlo, jhi
   integer :: nx, ny
-  integer :: i, j, m
+  integer :: i, j
 
-  double precision :: dq(0:nvar-1), q(0:nvar-1)
-  double precision :: lvec(0:nvar-1,0:nvar-1), rvec(0:nvar-1,0:nvar-1)
-  double precision :: eval(0:nvar-1)
-  double precision :: betal(0:nvar-1), betar(0:nvar-1)
+  double precision :: cs(0:qx-1, 0:qy-1)
   double precision, dimension(0:1) :: new
 
-  double precision :: dtdx, dtdx4
-  double precision :: cs
-  real :: sound
-
-  double precision :: sum, sum_l, sum_r, factor
-
   nx = qx - 2*ng; ny = qy - 2*ng
   ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
 
-  dtdx = dt/dx
-  dtdx4 = 0.25d0*dtdx
+  cs(:,:) = 1.0d0
 
-  ! this is the loop over zones.  For zone i, we see q_l[i+1] and q_r[i]
   do j = jlo-2, jhi+2
      do i = ilo-2, ihi+2
-
-        dq(:) = [ldelta_r(i,j), &
-                 ldelta_u(i,j), & 
-                 ldelta_v(i,j), &
-                 ldelta_p(i,j)]
-        
-        q(:) = [r(i,j), u(i,j), v(i,j), p(i,j)]
-
-        new = [p(i,j), r(i,j)]
-        sound = 0.0d0 + speed(new)
-        cs = sound
-        !cs = sqrt(gamma*p(i,j)/r(i,j))
-
-        ! compute the eigenvalues and eigenvectors
-        if (idir == 1) then
-           eval(:) = [u(i,j) - cs, u(i,j), u(i,j), u(i,j) + cs]
-        
-           lvec(0,:) = [ 0.0d0, -0.5d0*r(i,j)/cs, 0.0d0, 0.5d0/(cs*cs)  ]
-           lvec(1,:) = [ 1.0d0, 0.0d0,            0.0d0, -1.0d0/(cs*cs) ]
-           lvec(2,:) = [ 0.0d0, 0.0d0,            1.0d0, 0.0d0          ]
-           lvec(3,:) = [ 0.0d0, 0.5d0*r(i,j)/cs,  0.0d0, 0.5d0/(cs*cs)  ]
-
-           rvec(0,:) = [1.0d0, -cs/r(i,j), 0.0d0, cs*cs ]
-           rvec(1,:) = [1.0d0, 0.0d0,      0.0d0, 0.0d0 ]
-           rvec(2,:) = [0.0d0, 0.0d0,      1.0d0, 0.0d0 ]
-           rvec(3,:) = [1.0d0, cs/r(i,j),  0.0d0, cs*cs ]
-
-        else
-           eval = [v(i,j) - cs, v(i,j), v(i,j), v(i,j) + cs]
-                            
-           lvec(0,:) = [ 0.0d0, 0.0d0, -0.5d0*r(i,j)/cs, 0.5d0/(cs*cs)  ]
-           lvec(1,:) = [ 1.0d0, 0.0d0, 0.0d0,            -1.0d0/(cs*cs) ]
-           lvec(2,:) = [ 0.0d0, 1.0d0, 0.0d0,            0.0d0          ]
-           lvec(3,:) = [ 0.0d0, 0.0d0, 0.5d0*r(i,j)/cs,  0.5d0/(cs*cs)  ]
-
-           rvec(0,:) = [1.0d0, 0.0d0, -cs/r(i,j), cs*cs ]
-           rvec(1,:) = [1.0d0, 0.0d0, 0.0d0,      0.0d0 ]
-           rvec(2,:) = [0.0d0, 1.0d0, 0.0d0,      0.0d0 ]
-           rvec(3,:) = [1.0d0, 0.0d0, cs/r(i,j),  cs*cs ]
-
-        endif
-
-        ! define the reference states
-        if (idir == 1) then
-           ! this is one the right face of the current zone,
-           ! so the fastest moving eigenvalue is eval[3] = u + c
-           factor = 0.5d0*(1.0d0 - dtdx*max(eval(3), 0.0d0))
-           q_l(i+1,j,:) = q(:) + factor*dq(:)
-               
-           ! left face of the current zone, so the fastest moving
-           ! eigenvalue is eval[3] = u - c
-           factor = 0.5d0*(1.0d0 + dtdx*min(eval(0), 0.0d0))
-           q_r(i,  j,:) = q(:) - factor*dq(:)
-    
+        if (native_eos == 1) then
+           cs(i,j) = pr_sound(p(i,j), r(i,j))
         else
-
-           factor = 0.5d0*(1.0d0 - dtdx*max(eval(3), 0.0d0))
-           q_l(i,j+1,:) = q(:) + factor*dq(:)
-
-           factor = 0.5d0*(1.0d0 + dtdx*min(eval(0), 0.0d0))
-           q_r(i,j,  :) = q(:) - factor*dq(:)
-
+           new = [p(i,j), r(i,j)]
+           cs(i,j) = speed(new)
         endif
-
-        ! compute the Vhat functions
-        do m = 0, 3
-           sum = dot_product(lvec(m,:),dq(:))
-
-           betal(m) = dtdx4*(eval(3) - eval(m))*(sign(1.0d0,eval(m)) + 1.0d0)*sum
-           betar(m) = dtdx4*(eval(0) - eval(m))*(1.0d0 - sign(1.0d0,eval(m)))*sum
-        enddo
-
-        ! construct the states
-        do m = 0, 3
-           sum_l = dot_product(betal(:),rvec(:,m))
-           sum_r = dot_product(betar(:),rvec(:,m))
-
-           if (idir == 1) then
-              q_l(i+1,j,m) = q_l(i+1,j,m) + sum_l
-              q_r(i,  j,m) = q_r(i,  j,m) + sum_r
-           else
-              q_l(i,j+1,m) = q_l(i,j+1,m) + sum_l
-              q_r(i,j,  m) = q_r(i,j,  m) + sum_r
-           endif
-
-        enddo
-
      enddo
   enddo
 
+  call states_batched(idir, qx, qy, ng, dx, dt, nvar, &
+                      r, u, v, p, cs, &
+                      ldelta_r, ldelta_u, ldelta_v, ldelta_p, &
+                      q_l, q_r)
+
 end subroutine states
 
 
 subroutine riemann_cgf(idir, qx, qy, ng, &
                        nvar, idens, ixmom, iymom, iener, &
-                       lower_solid, upper_solid, &
+                       lower_solid, upper_solid, native_eos, &
                        real_gamma, pres, U_l, U_r, F)
 
-  !implicit none
-  EXTERNAL real_gamma
-  EXTERNAL pres
+  use pr_eos
+  implicit none
+  double precision, external :: real_gamma
+  double precision, external :: pres
 
   integer, intent(in) :: idir
   integer, intent(in) :: qx, qy, ng
   integer, intent(in) :: nvar, idens, ixmom, iymom, iener
   integer, intent(in) :: lower_solid, upper_solid
+  integer, intent(in) :: native_eos
 
   ! 0-based indexing to match python 
   double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
@@ -260,567 +180,237 @@ subroutine riemann_cgf(idir, qx, qy, ng, &
   ! Only density jumps across the u characteristic.  All primitive
   ! variables jump across the other two.  Special attention is needed
   ! if a rarefaction spans the axis.  
+  !
+  ! The pressure and the effective gamma = rho c^2 / p of the left,
+  ! right and star states come from the Peng-Robinson EOS of
+  ! preos.f90 (native_eos = 1) or from the pres and real_gamma
+  ! callbacks; the solver itself is riemann_cgf_batched.
 
   integer :: ilo, ihi, jlo, jhi
   integer :: nx, ny
   integer :: i, j
 
-  double precision, parameter :: smallc = 1.e-10
-  double precision, parameter :: smallrho = 1.e-10
   double precision, parameter :: smallp = 1.e-10
   double precision, dimension(0:1) :: temp
-  real :: temp1
-
-  double precision :: rho_l, un_l, ut_l, rhoe_l, p_l
-  double precision :: rho_r, un_r, ut_r, rhoe_r, p_r
 
-  double precision :: rhostar_l, rhostar_r, rhoestar_l, rhoestar_r
-  double precision :: ustar, pstar, cstar_l, cstar_r
-  double precision :: lambda_l, lambdastar_l, lambda_r, lambdastar_r
-  double precision :: W_l, W_r, c_l, c_r, sigma
-  double precision :: alpha
-  double precision :: eint_l, eint_r
+  double precision :: rho_l, eint_l, rho_r, eint_r
+  double precision :: un, ut, rhoe
 
-  double precision :: rho_state, un_state, ut_state, p_state, rhoe_state
-  
+  double precision :: p_l(0:qx-1,0:qy-1), p_r(0:qx-1,0:qy-1)
+  double precision :: gamma_l(0:qx-1,0:qy-1), gamma_r(0:qx-1,0:qy-1)
+  double precision :: rhostar_l(0:qx-1,0:qy-1), rhostar_r(0:qx-1,0:qy-1)
+  double precision :: pstar(0:qx-1,0:qy-1)
+  double precision :: gammastar_l(0:qx-1,0:qy-1), gammastar_r(0:qx-1,0:qy-1)
 
   nx = qx - 2*ng; ny = qy - 2*ng
   ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
 
+  p_l(:,:) = smallp
+  p_r(:,:) = smallp
+  gamma_l(:,:) = 1.0d0
+  gamma_r(:,:) = 1.0d0
+
   do j = jlo-1, jhi+1
      do i = ilo-1, ihi+1
 
-        ! primitive variable states
-        rho_l  = U_l(i,j,idens)
+        call normal_primitives(idir, U_l(i,j,idens), U_l(i,j,ixmom), &
+                               U_l(i,j,iymom), U_l(i,j,iener), &
+                               rho_l, un, ut, rhoe)
+        eint_l = rhoe/rho_l
 
-        ! un = normal velocity; ut = transverse velocity        
-        if (idir == 1) then
-           un_l    = U_l(i,j,ixmom)/rho_l
-           ut_l    = U_l(i,j,iymom)/rho_l
+        call normal_primitives(idir, U_r(i,j,idens), U_r(i,j,ixmom), &
+                               U_r(i,j,iymom), U_r(i,j,iener), &
+                               rho_r, un, ut, rhoe)
+        eint_r = rhoe/rho_r
+
+        if (native_eos == 1) then
+           p_l(i,j) = pr_pressure_e(rho_l, eint_l)
+           p_r(i,j) = pr_pressure_e(rho_r, eint_r)
         else
-           un_l    = U_l(i,j,iymom)/rho_l
-           ut_l    = U_l(i,j,ixmom)/rho_l
+           temp = [rho_l, eint_l]
+           p_l(i,j) = pres(temp)
+           temp = [rho_r, eint_r]
+           p_r(i,j) = pres(temp)
         endif
 
-        rhoe_l = U_l(i,j,iener) - 0.5*rho_l*(un_l**2 + ut_l**2)
-        eint_l = rhoe_l/rho_l !this will be negative
+        p_l(i,j) = max(p_l(i,j), smallp)
+        p_r(i,j) = max(p_r(i,j), smallp)
 
+        if (native_eos == 1) then
+           gamma_l(i,j) = pr_gamma(rho_l, p_l(i,j))
+           gamma_r(i,j) = pr_gamma(rho_r, p_r(i,j))
+        else
+           temp = [rho_l, p_l(i,j)]
+           gamma_l(i,j) = real_gamma(temp)
+           temp = [rho_r, p_r(i,j)]
+           gamma_r(i,j) = real_gamma(temp)
+        endif
+
+     enddo
+  enddo
 
-        temp = [rho_l, eint_l]
-        temp1 = 0.0d0 + pres(temp)
-        p_l = temp1
-        !p_l   = rhoe_l*(gamma - 1.0d0)
-        p_l = max(p_l, smallp)
+  ! the sound speeds of the star states are evaluated with the EOS at
+  ! (rhostar, pstar)
+  call riemann_cgf_star(idir, qx, qy, ng, &
+                        nvar, idens, ixmom, iymom, iener, &
+                        U_l, U_r, p_l, p_r, gamma_l, gamma_r, &
+                        rhostar_l, rhostar_r, pstar)
 
-        rho_r  = U_r(i,j,idens)
+  gammastar_l(:,:) = 1.0d0
+  gammastar_r(:,:) = 1.0d0
 
-        if (idir == 1) then
-           un_r    = U_r(i,j,ixmom)/rho_r
-           ut_r    = U_r(i,j,iymom)/rho_r
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+        if (native_eos == 1) then
+           gammastar_l(i,j) = pr_gamma(rhostar_l(i,j), pstar(i,j))
+           gammastar_r(i,j) = pr_gamma(rhostar_r(i,j), pstar(i,j))
         else
-           un_r    = U_r(i,j,iymom)/rho_r
-           ut_r    = U_r(i,j,ixmom)/rho_r
+           temp = [rhostar_l(i,j), pstar(i,j)]
+           gammastar_l(i,j) = real_gamma(temp)
+           temp = [rhostar_r(i,j), pstar(i,j)]
+           gammastar_r(i,j) = real_gamma(temp)
         endif
+     enddo
+  enddo
 
-        rhoe_r = U_r(i,j,iener) - 0.5*rho_r*(un_r**2 + ut_r**2)
-        eint_r = rhoe_r/rho_r
+  call riemann_cgf_batched(idir, qx, qy, ng, &
+                           nvar, idens, ixmom, iymom, iener, &
+                           lower_solid, upper_solid, &
+                           U_l, U_r, p_l, p_r, gamma_l, gamma_r, &
+                           gammastar_l, gammastar_r, F)
 
-        temp = [rho_r, eint_r]
-        temp1 = 0.0d0 + pres(temp)
-        p_r = temp1
-        !p_r   = rhoe_r*(gamma - 1.0d0)
-        p_r = max(p_r, smallp)
-            
+end subroutine riemann_cgf
 
-        ! define the Lagrangian sound speed
-        temp = [rho_l, p_l]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_l = temp1
+subroutine riemann_HLLC(idir, qx, qy, ng, &
+                       nvar, idens, ixmom, iymom, iener, &
+                       lower_solid, upper_solid, native_eos, &
+                       real_gamma, pres, U_l, U_r, F)
 
-        temp = [rho_r, p_r]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_r = temp1
+  use pr_eos
+  implicit none
+  double precision, external :: real_gamma
+  double precision, external :: pres
 
-        W_l = max(smallrho*smallc, sqrt(gamma_l*p_l*rho_l))
-        W_r = max(smallrho*smallc, sqrt(gamma_r*p_r*rho_r))
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
+  integer, intent(in) :: lower_solid, upper_solid
+  integer, intent(in) :: native_eos
 
-        ! and the regular sound speeds
-        c_l = max(smallc, sqrt(gamma_l*p_l/rho_l))
-        c_r = max(smallc, sqrt(gamma_r*p_r/rho_r))
+  ! 0-based indexing to match python 
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
+!F2PY (CALLBACK) real_gamma
+!F2PY (CALLBACK) pres
+!f2py depend(qx, qy, nvar) :: U_l, U_r     
+!f2py intent(in) :: U_l, U_r
+!f2py intent(out) :: F
 
-        ! define the star states
-        pstar = (W_l*p_r + W_r*p_l + W_l*W_r*(un_l - un_r))/(W_l + W_r)
-        pstar = max(pstar, smallp)
-        ustar = (W_l*un_l + W_r*un_r + (p_l - p_r))/(W_l + W_r)
+  ! Solve riemann shock tube problem for a general equation of
+  ! state using HLLC.
+  !
+  ! The Riemann problem for the Euler's equation produces 4 regions,
+  ! separated by the three characteristics (u - cs, u, u + cs):
+  !
+  !
+  !        u - cs    t    u      u + cs
+  !          \       ^   .       /
+  !           \  *L  |   . *R   /
+  !            \     |  .     /
+  !             \    |  .    /
+  !         L    \   | .   /    R
+  !               \  | .  /
+  !                \ |. /
+  !                 \|./
+  !        ----------+----------------> x
+  !
+  ! The pressure and the effective gamma = rho c^2 / p of the left
+  ! and right states come from the Peng-Robinson EOS of preos.f90
+  ! (native_eos = 1) or from the pres and real_gamma callbacks; the
+  ! solver itself is riemann_hllc_batched.
 
-        ! now compute the remaining state to the left and right
-        ! of the contact (in the star region)
-        rhostar_l = rho_l + (pstar - p_l)/c_l**2
-        rhostar_r = rho_r + (pstar - p_r)/c_r**2
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
 
-        rhoestar_l = rhoe_l + &
-             (pstar - p_l)*(rhoe_l/rho_l + p_l/rho_l)/c_l**2
-        rhoestar_r = rhoe_r + &
-             (pstar - p_r)*(rhoe_r/rho_r + p_r/rho_r)/c_r**2
+  double precision, parameter :: smallp = 1.e-10
+  double precision, dimension(0:1) :: temp
 
-        temp = [rhostar_l, pstar]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_l = temp1
+  double precision :: rho_l, eint_l, rho_r, eint_r
+  double precision :: un, ut, rhoe
 
-        temp = [rhostar_r, pstar]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_r = temp1
+  double precision :: p_l(0:qx-1,0:qy-1), p_r(0:qx-1,0:qy-1)
+  double precision :: gamma_l(0:qx-1,0:qy-1), gamma_r(0:qx-1,0:qy-1)
 
-        !gamma_l = real_gamma(rhostar_l, pstar)
-        !gamma_r = real_gamma(rhostar_r, pstar)
-        cstar_l = max(smallc,sqrt(gamma_l*pstar/rhostar_l))
-        cstar_r = max(smallc,sqrt(gamma_r*pstar/rhostar_r))
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
 
-        ! figure out which state we are in, based on the location of
-        ! the waves
-        if (ustar > 0.0d0) then
-                
-           ! contact is moving to the right, we need to understand 
-           ! the L and *L states
+  p_l(:,:) = smallp
+  p_r(:,:) = smallp
+  gamma_l(:,:) = 1.0d0
+  gamma_r(:,:) = 1.0d0
 
-           ! Note: transverse velocity only jumps across contact
-           ut_state = ut_l
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
 
-           ! define eigenvalues
-           lambda_l = un_l - c_l
-           lambdastar_l = ustar - cstar_l
+        call normal_primitives(idir, U_l(i,j,idens), U_l(i,j,ixmom), &
+                               U_l(i,j,iymom), U_l(i,j,iener), &
+                               rho_l, un, ut, rhoe)
+        eint_l = rhoe/rho_l
 
-           if (pstar > p_l) then
-              ! the wave is a shock -- find the shock speed
-              sigma = (lambda_l + lambdastar_l)/2.0d0
+        call normal_primitives(idir, U_r(i,j,idens), U_r(i,j,ixmom), &
+                               U_r(i,j,iymom), U_r(i,j,iener), &
+                               rho_r, un, ut, rhoe)
+        eint_r = rhoe/rho_r
 
-              if (sigma > 0.0d0) then
-                 ! shock is moving to the right -- solution is L state
-                 rho_state = rho_l
-                 un_state = un_l
-                 p_state = p_l
-                 rhoe_state = rhoe_l
-                 
-              else
-                 ! solution is *L state
-                 rho_state = rhostar_l
-                 un_state = ustar
-                 p_state = pstar
-                 rhoe_state = rhoestar_l                        
-              endif
+        if (native_eos == 1) then
+           p_l(i,j) = pr_pressure_e(rho_l, eint_l)
+           p_r(i,j) = pr_pressure_e(rho_r, eint_r)
+        else
+           temp = [rho_l, eint_l]
+           p_l(i,j) = pres(temp)
+           temp = [rho_r, eint_r]
+           p_r(i,j) = pres(temp)
+        endif
 
-           else
-              ! the wave is a rarefaction
-              if (lambda_l < 0.0d0 .and. lambdastar_l < 0.0d0) then
-                 ! rarefaction fan is moving to the left -- solution is
-                 ! *L state
-                 rho_state = rhostar_l
-                 un_state = ustar
-                 p_state = pstar
-                 rhoe_state = rhoestar_l
-                 
-              else if (lambda_l > 0.0d0 .and. lambdastar_l > 0.0d0) then
-                 ! rarefaction fan is moving to the right -- solution is
-                 ! L state
-                 rho_state = rho_l
-                 un_state = un_l
-                 p_state = p_l
-                 rhoe_state = rhoe_l
+        p_l(i,j) = max(p_l(i,j), smallp)
+        p_r(i,j) = max(p_r(i,j), smallp)
 
-              else
-                 ! rarefaction spans x/t = 0 -- interpolate
-                 alpha = lambda_l/(lambda_l - lambdastar_l)
+        if (native_eos == 1) then
+           gamma_l(i,j) = pr_gamma(rho_l, p_l(i,j))
+           gamma_r(i,j) = pr_gamma(rho_r, p_r(i,j))
+        else
+           temp = [rho_l, p_l(i,j)]
+           gamma_l(i,j) = real_gamma(temp)
+           temp = [rho_r, p_r(i,j)]
+           gamma_r(i,j) = real_gamma(temp)
+        endif
 
-                 rho_state  = alpha*rhostar_l  + (1.0d0 - alpha)*rho_l
-                 un_state   = alpha*ustar      + (1.0d0 - alpha)*un_l
-                 p_state    = alpha*pstar      + (1.0d0 - alpha)*p_l
-                 rhoe_state = alpha*rhoestar_l + (1.0d0 - alpha)*rhoe_l
-              endif
+     enddo
+  enddo
 
-           endif
+  call riemann_hllc_batched(idir, qx, qy, ng, &
+                            nvar, idens, ixmom, iymom, iener, &
+                            lower_solid, upper_solid, &
+                            U_l, U_r, p_l, p_r, gamma_l, gamma_r, F)
 
-        else if (ustar < 0) then
-                
-           ! contact moving left, we need to understand the R and *R
-           ! states
+end subroutine riemann_HLLC
 
-           ! Note: transverse velocity only jumps across contact
-           ut_state = ut_r
-                
-           ! define eigenvalues
-           lambda_r = un_r + c_r
-           lambdastar_r = ustar + cstar_r
 
-           if (pstar > p_r) then
-              ! the wave if a shock -- find the shock speed 
-              sigma = (lambda_r + lambdastar_r)/2.0d0
+! subroutine riemann_HLLC(idir, qx, qy, ng, &
+!                         nvar, idens, ixmom, iymom, iener, &
+!                         lower_solid, upper_solid, &
+!                         real_gamma, pres, U_l, U_r, F)
 
-              if (sigma > 0.0d0) then
-                 ! shock is moving to the right -- solution is *R state
-                 rho_state = rhostar_r
-                 un_state = ustar
-                 p_state = pstar
-                 rhoe_state = rhoestar_r
 
-              else
-                 ! solution is R state
-                 rho_state = rho_r
-                 un_state = un_r
-                 p_state = p_r
-                 rhoe_state = rhoe_r
-              endif
+!   implicit none
 
-           else
-              ! the wave is a rarefaction
-              if (lambda_r < 0.0d0 .and. lambdastar_r < 0.0d0) then
-                 ! rarefaction fan is moving to the left -- solution is
-                 ! R state
-                 rho_state = rho_r
-                 un_state = un_r
-                 p_state = p_r
-                 rhoe_state = rhoe_r
-                        
-              else if (lambda_r > 0.0d0 .and. lambdastar_r > 0.0d0) then
-                 ! rarefaction fan is moving to the right -- solution is
-                 ! *R state
-                 rho_state = rhostar_r
-                 un_state = ustar
-                 p_state = pstar
-                 rhoe_state = rhoestar_r
-                 
-              else
-                 ! rarefaction spans x/t = 0 -- interpolate
-                 alpha = lambda_r/(lambda_r - lambdastar_r)
-
-                 rho_state  = alpha*rhostar_r  + (1.0d0 - alpha)*rho_r
-                 un_state   = alpha*ustar      + (1.0d0 - alpha)*un_r
-                 p_state    = alpha*pstar      + (1.0d0 - alpha)*p_r
-                 rhoe_state = alpha*rhoestar_r + (1.0d0 - alpha)*rhoe_r
-                        
-              endif
-              
-           endif
-           
-        else  ! ustar == 0
-                
-           rho_state = 0.5*(rhostar_l + rhostar_r)
-           un_state = ustar
-           ut_state = 0.5*(ut_l + ut_r)
-           p_state = pstar
-           rhoe_state = 0.5*(rhoestar_l + rhoestar_r)
-
-        endif
-
-        ! are we on a solid boundary?
-        if (idir == 1) then
-           if (i == ilo .and. lower_solid == 1) then
-              un_state = 0.0
-           endif
-
-           if (i == ihi+1 .and. upper_solid == 1) then
-              un_state = 0.0
-           endif
-
-        else if (idir == 2) then
-           if (j == jlo .and. lower_solid == 1) then
-              un_state = 0.0
-           endif
-
-           if (j == jhi+1 .and. upper_solid == 1) then
-              un_state = 0.0
-           endif
-
-        endif
-
-        ! compute the fluxes
-        F(i,j,idens) = rho_state*un_state
-
-        if (idir == 1) then
-           F(i,j,ixmom) = rho_state*un_state**2 + p_state
-           F(i,j,iymom) = rho_state*ut_state*un_state
-        else
-           F(i,j,ixmom) = rho_state*ut_state*un_state
-           F(i,j,iymom) = rho_state*un_state**2 + p_state
-        endif
-
-        F(i,j,iener) = rhoe_state*un_state + &
-             0.5*rho_state*(un_state**2 + ut_state**2)*un_state + &
-             p_state*un_state
-
-     enddo
-  enddo
-
-end subroutine riemann_cgf
-
-subroutine riemann_HLLC(idir, qx, qy, ng, &
-                       nvar, idens, ixmom, iymom, iener, &
-                       lower_solid, upper_solid, &
-                       real_gamma, pres, U_l, U_r, F)
-
-  !implicit none
-  EXTERNAL real_gamma
-  EXTERNAL pres
-
-  integer, intent(in) :: idir
-  integer, intent(in) :: qx, qy, ng
-  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
-  integer, intent(in) :: lower_solid, upper_solid
-
-  ! 0-based indexing to match python 
-  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
-!F2PY (CALLBACK) real_gamma
-!F2PY (CALLBACK) pres
-!f2py depend(qx, qy, nvar) :: U_l, U_r     
-!f2py intent(in) :: U_l, U_r
-!f2py intent(out) :: F
-
-  ! Solve riemann shock tube problem for a general equation of
-  ! state using HLLC.
-  !
-  ! The Riemann problem for the Euler's equation produces 4 regions,
-  ! separated by the three characteristics (u - cs, u, u + cs):
-  !
-  !
-  !        u - cs    t    u      u + cs
-  !          \       ^   .       /
-  !           \  *L  |   . *R   /
-  !            \     |  .     /
-  !             \    |  .    /
-  !         L    \   | .   /    R
-  !               \  | .  /
-  !                \ |. /
-  !                 \|./
-  !        ----------+----------------> x
-
-
-  integer :: ilo, ihi, jlo, jhi
-  integer :: nx, ny
-  integer :: i, j
-
-  double precision, parameter :: smallc = 1.e-10
-  double precision, parameter :: smallrho = 1.e-10
-  double precision, parameter :: smallp = 1.e-10
-  double precision, dimension(0:1) :: temp
-  real :: temp1
-
-  double precision :: rho_l, un_l, ut_l, rhoe_l, p_l
-  double precision :: rho_r, un_r, ut_r, rhoe_r, p_r
-
-  double precision :: rhostar_l, rhostar_r, rhoestar_l, rhoestar_r
-  double precision :: ustar, pstar, cstar_l, cstar_r
-  double precision :: lambda_l, lambdastar_l, lambda_r, lambdastar_r
-  double precision :: W_l, W_r, c_l, c_r, sigma
-  double precision :: alpha
-  double precision :: eint_l, eint_r
-
-  double precision :: rho_state, un_state, ut_state, p_state, rhoe_state
-  double precision :: rho_avg
-  double precision :: Q, p_min, p_max, p_lr, p_guess
-  double precision :: factor, factor2
-  double precision :: g_l, g_r, A_l, B_l, A_r, B_r, z
-  double precision :: S_l, S_r, S_c
-  double precision :: c_avg
-  
-  double precision :: U_state(0:nvar-1)
-  double precision :: HLLCfactor
-
-  nx = qx - 2*ng; ny = qy - 2*ng
-  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
-
-  do j = jlo-1, jhi+1
-     do i = ilo-1, ihi+1
-
-        ! primitive variable states
-        rho_l  = U_l(i,j,idens)
-
-        ! un = normal velocity; ut = transverse velocity        
-        if (idir == 1) then
-           un_l    = U_l(i,j,ixmom)/rho_l
-           ut_l    = U_l(i,j,iymom)/rho_l
-        else
-           un_l    = U_l(i,j,iymom)/rho_l
-           ut_l    = U_l(i,j,ixmom)/rho_l
-        endif
-
-        rhoe_l = U_l(i,j,iener) - 0.5*rho_l*(un_l**2 + ut_l**2)
-        eint_l = rhoe_l/rho_l !this will be negative
-
-
-        temp = [rho_l, eint_l]
-        temp1 = 0.0d0 + pres(temp)
-        p_l = temp1
-        !p_l   = rhoe_l*(gamma - 1.0d0)
-        p_l = max(p_l, smallp)
-
-        rho_r  = U_r(i,j,idens)
-
-        if (idir == 1) then
-           un_r    = U_r(i,j,ixmom)/rho_r
-           ut_r    = U_r(i,j,iymom)/rho_r
-        else
-           un_r    = U_r(i,j,iymom)/rho_r
-           ut_r    = U_r(i,j,ixmom)/rho_r
-        endif
-
-        rhoe_r = U_r(i,j,iener) - 0.5*rho_r*(un_r**2 + ut_r**2)
-        eint_r = rhoe_r/rho_r
-
-        temp = [rho_r, eint_r]
-        temp1 = 0.0d0 + pres(temp)
-        p_r = temp1
-        !p_r   = rhoe_r*(gamma - 1.0d0)
-        p_r = max(p_r, smallp)
-
-        ! define the Lagrangian sound speed
-        temp = [rho_l, p_l]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_l = temp1
-
-        temp = [rho_r, p_r]
-        temp1 = 0.0d0 + real_gamma(temp)
-        gamma_r = temp1
-
-        W_l = max(smallrho*smallc, sqrt(gamma_l*p_l*rho_l))
-        W_r = max(smallrho*smallc, sqrt(gamma_r*p_r*rho_r))
-
-        ! and the regular sound speeds
-        c_l = max(smallc, sqrt(gamma_l*p_l/rho_l))
-        c_r = max(smallc, sqrt(gamma_r*p_r/rho_r))
-
-        ! define the star states
-        pstar = (W_l*p_r + W_r*p_l + W_l*W_r*(un_l - un_r))/(W_l + W_r)
-        pstar = max(pstar, smallp)
-        ustar = (W_l*un_l + W_r*un_r + (p_l - p_r))/(W_l + W_r)
-
-        ! now compute the remaining state to the left and right
-        ! of the contact (in the star region)
-        rhostar_l = rho_l + (pstar - p_l)/c_l**2
-        rhostar_r = rho_r + (pstar - p_r)/c_r**2
-
-        ! step II: wave speed estimate
-        ! estimate the nonlinear wave speeds
-
-        ! use the simplest estimates of the wave speeds
-        S_l = min(un_l - sqrt(gamma_l*p_l/rho_l), un_r - sqrt(gamma_r*p_r/rho_r))
-        S_r = max(un_l + sqrt(gamma_l*p_l/rho_l), un_r + sqrt(gamma_r*p_r/rho_r))
-
-        ! if (pstar <= p_l) then
-        !    ! rarefaction
-        !    S_l = un_l - c_l
-        ! else
-        !    ! shock
-        !    S_l = un_l - c_l*sqrt(1.0d0 + ((gamma+1.0d0)/(2.0d0*gamma))* &
-        !                            (pstar/p_l - 1.0d0))
-        ! endif
-
-        ! if (pstar <= p_r) then
-        !    ! rarefaction
-        !    S_r = un_r + c_r
-        ! else
-        !    ! shock
-        !    S_r = un_r + c_r*sqrt(1.0d0 + ((gamma+1.0d0)/(2.0d0/gamma))* &
-        !                           (pstar/p_r - 1.0d0))
-        ! endif
-
-        !  We could just take S_c = u_star as the estimate for the
-        !  contact speed, but we can actually do this more accurately
-        !  by using the Rankine-Hugonoit jump conditions across each
-        !  of the waves (see Toro 10.58, Batten et al. SIAM
-        !  J. Sci. and Stat. Comp., 18:1553 (1997)
-
-        ! Eqn 10.70 in Toro
-        S_c = (p_r - p_l + rho_l*un_l*(S_l - un_l) - rho_r*un_r*(S_r - un_r))/ &
-             (rho_l*(S_l - un_l) - rho_r*(S_r - un_r))
-
-        ! step III: Compute the HLLC flux
-        ! figure out which region we are in and compute the state and 
-        ! the interface fluxes using the HLLC Riemann solver
-        if (S_r <= 0.0d0) then
-           ! R region
-           U_state(:) = U_r(i,j,:)
-
-           call consFlux(idir, pres, idens, ixmom, iymom, iener, nvar, &
-                         U_state, F(i,j,:))
-
-        else if (S_r > 0.0d0 .and. S_c <= 0) then
-           ! R* region
-           HLLCfactor = rho_r*(S_r - un_r)/(S_r - S_c)
-           
-           U_state(idens) = HLLCfactor
-
-           if (idir == 1) then
-              U_state(ixmom) = HLLCfactor*S_c
-              U_state(iymom) = HLLCfactor*ut_r
-           else
-              U_state(ixmom) = HLLCfactor*ut_r
-              U_state(iymom) = HLLCfactor*S_c
-           endif
-
-           U_state(iener) = HLLCfactor*(U_r(i,j,iener)/rho_r + &
-                (S_c - un_r)*(S_c + p_r/(rho_r*(S_r - un_r))))
-
-           ! find the flux on the right interface
-           call consFlux(idir, pres, idens, ixmom, iymom, iener, nvar, &
-                         U_r(i,j,:), F(i,j,:))
-
-           ! correct the flux
-           F(i,j,:) = F(i,j,:) + S_r*(U_state(:) - U_r(i,j,:))
-
-        else if (S_c > 0.0d0 .and. S_l < 0.0) then
-           ! L* region
-           HLLCfactor = rho_l*(S_l - un_l)/(S_l - S_c)
-
-           U_state(idens) = HLLCfactor
-
-           if (idir == 1) then
-              U_state(ixmom) = HLLCfactor*S_c
-              U_state(iymom) = HLLCfactor*ut_l
-           else
-              U_state(ixmom) = HLLCfactor*ut_l
-              U_state(iymom) = HLLCfactor*S_c
-           endif
-
-           U_state(iener) = HLLCfactor*(U_l(i,j,iener)/rho_l + &
-                (S_c - un_l)*(S_c + p_l/(rho_l*(S_l - un_l))))
-
-           ! find the flux on the left interface
-           call consFlux(idir, pres, idens, ixmom, iymom, iener, nvar, &
-                         U_l(i,j,:), F(i,j,:))
-
-           ! correct the flux
-           F(i,j,:) = F(i,j,:) + S_l*(U_state(:) - U_l(i,j,:))
-
-        else
-           ! L region
-           U_state(:) = U_l(i,j,:)
-
-           call consFlux(idir, pres, idens, ixmom, iymom, iener, nvar, &
-                         U_state, F(i,j,:))
-
-        endif
-
-        ! we should deal with solid boundaries somehow here
-           
-     enddo
-  enddo
-end subroutine riemann_HLLC
-
-
-! subroutine riemann_HLLC(idir, qx, qy, ng, &
-!                         nvar, idens, ixmom, iymom, iener, &
-!                         lower_solid, upper_solid, &
-!                         real_gamma, pres, U_l, U_r, F)
-
-
-!   implicit none
-
-!   integer, intent(in) :: idir
-!   integer, intent(in) :: qx, qy, ng
-!   integer, intent(in) :: nvar, idens, ixmom, iymom, iener
-!   integer, intent(in) :: lower_solid, upper_solid
-!   double precision, intent(in) :: gamma
+!   integer, intent(in) :: idir
+!   integer, intent(in) :: qx, qy, ng
+!   integer, intent(in) :: nvar, idens, ixmom, iymom, iener
+!   integer, intent(in) :: lower_solid, upper_solid
+!   double precision, intent(in) :: gamma
 
 !   ! 0-based indexing to match python 
 !   double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
@@ -1194,3 +784,742 @@ subroutine artificial_viscosity(qx, qy, ng, dx, dy, &
   enddo
 
 end subroutine artificial_viscosity
+
+
+subroutine states_batched(idir, qx, qy, ng, dx, dt, &
+                          nvar, &
+                          r, u, v, p, cs, &
+                          ldelta_r, ldelta_u, ldelta_v, ldelta_p, &
+                          q_l, q_r)
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  double precision, intent(in) :: dx, dt
+  integer, intent(in) :: nvar
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: r(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: u(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: v(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: p(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: cs(0:qx-1, 0:qy-1)
+
+  double precision, intent(inout) :: ldelta_r(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: ldelta_u(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: ldelta_v(0:qx-1, 0:qy-1)
+  double precision, intent(inout) :: ldelta_p(0:qx-1, 0:qy-1)
+
+  double precision, intent(  out) :: q_l(0:qx-1, 0:qy-1, 0:nvar-1)
+  double precision, intent(  out) :: q_r(0:qx-1, 0:qy-1, 0:nvar-1)
+
+!f2py depend(qx, qy) :: r, u, v, p, cs
+!f2py depend(qx, qy) :: ldelta_r, ldelta_u, ldelta_v, ldelta_p
+!f2py depend(qx, qy, nvar) :: q_l, q_r
+!f2py intent(in) :: r, u, v, p, cs
+!f2py intent(in) :: ldelta_r, ldelta_u, ldelta_v, ldelta_p
+!f2py intent(out) :: q_l, q_r
+
+  ! The characteristic tracing of states, with the sound speed passed
+  ! in as a cell-centered array, cs.  In python this comes from a
+  ! single vectorized EOS call, instead of calling back into python
+  ! for every zone.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j, m
+
+  double precision :: dq(0:nvar-1), q(0:nvar-1)
+  double precision :: lvec(0:nvar-1,0:nvar-1), rvec(0:nvar-1,0:nvar-1)
+  double precision :: eval(0:nvar-1)
+  double precision :: betal(0:nvar-1), betar(0:nvar-1)
+
+  double precision :: dtdx, dtdx4
+  double precision :: c
+
+  double precision :: sum, sum_l, sum_r, factor
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  dtdx = dt/dx
+  dtdx4 = 0.25d0*dtdx
+
+  ! this is the loop over zones.  For zone i, we see q_l[i+1] and q_r[i]
+  do j = jlo-2, jhi+2
+     do i = ilo-2, ihi+2
+
+        dq(:) = [ldelta_r(i,j), &
+                 ldelta_u(i,j), &
+                 ldelta_v(i,j), &
+                 ldelta_p(i,j)]
+
+        q(:) = [r(i,j), u(i,j), v(i,j), p(i,j)]
+
+        c = cs(i,j)
+
+        ! compute the eigenvalues and eigenvectors
+        if (idir == 1) then
+           eval(:) = [u(i,j) - c, u(i,j), u(i,j), u(i,j) + c]
+
+           lvec(0,:) = [ 0.0d0, -0.5d0*r(i,j)/c, 0.0d0, 0.5d0/(c*c)  ]
+           lvec(1,:) = [ 1.0d0, 0.0d0,           0.0d0, -1.0d0/(c*c) ]
+           lvec(2,:) = [ 0.0d0, 0.0d0,           1.0d0, 0.0d0        ]
+           lvec(3,:) = [ 0.0d0, 0.5d0*r(i,j)/c,  0.0d0, 0.5d0/(c*c)  ]
+
+           rvec(0,:) = [1.0d0, -c/r(i,j), 0.0d0, c*c ]
+           rvec(1,:) = [1.0d0, 0.0d0,     0.0d0, 0.0d0 ]
+           rvec(2,:) = [0.0d0, 0.0d0,     1.0d0, 0.0d0 ]
+           rvec(3,:) = [1.0d0, c/r(i,j),  0.0d0, c*c ]
+
+        else
+           eval = [v(i,j) - c, v(i,j), v(i,j), v(i,j) + c]
+
+           lvec(0,:) = [ 0.0d0, 0.0d0, -0.5d0*r(i,j)/c, 0.5d0/(c*c)  ]
+           lvec(1,:) = [ 1.0d0, 0.0d0, 0.0d0,           -1.0d0/(c*c) ]
+           lvec(2,:) = [ 0.0d0, 1.0d0, 0.0d0,           0.0d0        ]
+           lvec(3,:) = [ 0.0d0, 0.0d0, 0.5d0*r(i,j)/c,  0.5d0/(c*c)  ]
+
+           rvec(0,:) = [1.0d0, 0.0d0, -c/r(i,j), c*c ]
+           rvec(1,:) = [1.0d0, 0.0d0, 0.0d0,     0.0d0 ]
+           rvec(2,:) = [0.0d0, 1.0d0, 0.0d0,     0.0d0 ]
+           rvec(3,:) = [1.0d0, 0.0d0, c/r(i,j),  c*c ]
+
+        endif
+
+        ! define the reference states
+        if (idir == 1) then
+           factor = 0.5d0*(1.0d0 - dtdx*max(eval(3), 0.0d0))
+           q_l(i+1,j,:) = q(:) + factor*dq(:)
+
+           factor = 0.5d0*(1.0d0 + dtdx*min(eval(0), 0.0d0))
+           q_r(i,  j,:) = q(:) - factor*dq(:)
+
+        else
+
+           factor = 0.5d0*(1.0d0 - dtdx*max(eval(3), 0.0d0))
+           q_l(i,j+1,:) = q(:) + factor*dq(:)
+
+           factor = 0.5d0*(1.0d0 + dtdx*min(eval(0), 0.0d0))
+           q_r(i,j,  :) = q(:) - factor*dq(:)
+
+        endif
+
+        ! compute the Vhat functions
+        do m = 0, 3
+           sum = dot_product(lvec(m,:),dq(:))
+
+           betal(m) = dtdx4*(eval(3) - eval(m))*(sign(1.0d0,eval(m)) + 1.0d0)*sum
+           betar(m) = dtdx4*(eval(0) - eval(m))*(1.0d0 - sign(1.0d0,eval(m)))*sum
+        enddo
+
+        ! construct the states
+        do m = 0, 3
+           sum_l = dot_product(betal(:),rvec(:,m))
+           sum_r = dot_product(betar(:),rvec(:,m))
+
+           if (idir == 1) then
+              q_l(i+1,j,m) = q_l(i+1,j,m) + sum_l
+              q_r(i,  j,m) = q_r(i,  j,m) + sum_r
+           else
+              q_l(i,j+1,m) = q_l(i,j+1,m) + sum_l
+              q_r(i,j,  m) = q_r(i,j,  m) + sum_r
+           endif
+
+        enddo
+
+     enddo
+  enddo
+
+end subroutine states_batched
+
+
+subroutine normal_primitives(idir, dens, xmom, ymom, ener, rho, un, ut, rhoe)
+
+  ! the density, normal (un) and transverse (ut) velocity and internal
+  ! energy density of a conserved interface state
+
+  implicit none
+
+  integer, intent(in) :: idir
+  double precision, intent(in) :: dens, xmom, ymom, ener
+  double precision, intent(out) :: rho, un, ut, rhoe
+
+  rho = dens
+
+  if (idir == 1) then
+     un = xmom/rho
+     ut = ymom/rho
+  else
+     un = ymom/rho
+     ut = xmom/rho
+  endif
+
+  rhoe = ener - 0.5d0*rho*(un**2 + ut**2)
+
+end subroutine normal_primitives
+
+
+subroutine cgf_star_state(rho_l, un_l, rhoe_l, p_l, gamma_l, &
+                          rho_r, un_r, rhoe_r, p_r, gamma_r, &
+                          c_l, c_r, pstar, ustar, &
+                          rhostar_l, rhostar_r, rhoestar_l, rhoestar_r)
+
+  ! the sound speeds of the left and right states and the star states
+  ! on either side of the contact of the Colella, Glaz, and Ferguson
+  ! solver, given the pressure and effective gamma of the left and
+  ! right states
+
+  implicit none
+
+  double precision, intent(in) :: rho_l, un_l, rhoe_l, p_l, gamma_l
+  double precision, intent(in) :: rho_r, un_r, rhoe_r, p_r, gamma_r
+  double precision, intent(out) :: c_l, c_r, pstar, ustar
+  double precision, intent(out) :: rhostar_l, rhostar_r, rhoestar_l, rhoestar_r
+
+  double precision, parameter :: smallc = 1.e-10
+  double precision, parameter :: smallrho = 1.e-10
+  double precision, parameter :: smallp = 1.e-10
+
+  double precision :: W_l, W_r
+
+  ! define the Lagrangian sound speed
+  W_l = max(smallrho*smallc, sqrt(gamma_l*p_l*rho_l))
+  W_r = max(smallrho*smallc, sqrt(gamma_r*p_r*rho_r))
+
+  ! and the regular sound speeds
+  c_l = max(smallc, sqrt(gamma_l*p_l/rho_l))
+  c_r = max(smallc, sqrt(gamma_r*p_r/rho_r))
+
+  ! define the star states
+  pstar = (W_l*p_r + W_r*p_l + W_l*W_r*(un_l - un_r))/(W_l + W_r)
+  pstar = max(pstar, smallp)
+  ustar = (W_l*un_l + W_r*un_r + (p_l - p_r))/(W_l + W_r)
+
+  ! now compute the remaining state to the left and right
+  ! of the contact (in the star region)
+  rhostar_l = rho_l + (pstar - p_l)/c_l**2
+  rhostar_r = rho_r + (pstar - p_r)/c_r**2
+
+  rhoestar_l = rhoe_l + &
+       (pstar - p_l)*(rhoe_l/rho_l + p_l/rho_l)/c_l**2
+  rhoestar_r = rhoe_r + &
+       (pstar - p_r)*(rhoe_r/rho_r + p_r/rho_r)/c_r**2
+
+end subroutine cgf_star_state
+
+
+subroutine riemann_cgf_star(idir, qx, qy, ng, &
+                            nvar, idens, ixmom, iymom, iener, &
+                            U_l, U_r, p_l_in, p_r_in, gamma_l_in, gamma_r_in, &
+                            rhostar_l, rhostar_r, pstar)
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: p_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: p_r_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_r_in(0:qx-1,0:qy-1)
+  double precision, intent(  out) :: rhostar_l(0:qx-1,0:qy-1)
+  double precision, intent(  out) :: rhostar_r(0:qx-1,0:qy-1)
+  double precision, intent(  out) :: pstar(0:qx-1,0:qy-1)
+!f2py depend(qx, qy, nvar) :: U_l, U_r
+!f2py depend(qx, qy) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py depend(qx, qy) :: rhostar_l, rhostar_r, pstar
+!f2py intent(in) :: U_l, U_r
+!f2py intent(in) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py intent(out) :: rhostar_l, rhostar_r, pstar
+
+  ! The densities and pressure of the star states of the Colella,
+  ! Glaz, and Ferguson solver, so that the effective gamma of the star
+  ! states that riemann_cgf_batched needs can be evaluated with the
+  ! EOS at (rhostar, pstar) -- by a second vectorized EOS call in
+  ! python, or by riemann_cgf.  Away from the interfaces the solver
+  ! uses, rhostar = 1 and pstar = smallp.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
+
+  double precision, parameter :: smallp = 1.e-10
+
+  double precision :: rho_l, un_l, ut_l, rhoe_l, p_l
+  double precision :: rho_r, un_r, ut_r, rhoe_r, p_r
+  double precision :: c_l, c_r, ustar, rhoestar_l, rhoestar_r
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  rhostar_l(:,:) = 1.0d0
+  rhostar_r(:,:) = 1.0d0
+  pstar(:,:) = smallp
+
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+
+        call normal_primitives(idir, U_l(i,j,idens), U_l(i,j,ixmom), &
+                               U_l(i,j,iymom), U_l(i,j,iener), &
+                               rho_l, un_l, ut_l, rhoe_l)
+        call normal_primitives(idir, U_r(i,j,idens), U_r(i,j,ixmom), &
+                               U_r(i,j,iymom), U_r(i,j,iener), &
+                               rho_r, un_r, ut_r, rhoe_r)
+
+        p_l = max(p_l_in(i,j), smallp)
+        p_r = max(p_r_in(i,j), smallp)
+
+        call cgf_star_state(rho_l, un_l, rhoe_l, p_l, gamma_l_in(i,j), &
+                            rho_r, un_r, rhoe_r, p_r, gamma_r_in(i,j), &
+                            c_l, c_r, pstar(i,j), ustar, &
+                            rhostar_l(i,j), rhostar_r(i,j), &
+                            rhoestar_l, rhoestar_r)
+
+     enddo
+  enddo
+
+end subroutine riemann_cgf_star
+
+
+subroutine riemann_cgf_batched(idir, qx, qy, ng, &
+                               nvar, idens, ixmom, iymom, iener, &
+                               lower_solid, upper_solid, &
+                               U_l, U_r, p_l_in, p_r_in, gamma_l_in, gamma_r_in, &
+                               gammastar_l_in, gammastar_r_in, F)
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
+  integer, intent(in) :: lower_solid, upper_solid
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: p_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: p_r_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_r_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gammastar_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gammastar_r_in(0:qx-1,0:qy-1)
+  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
+!f2py depend(qx, qy, nvar) :: U_l, U_r
+!f2py depend(qx, qy) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py depend(qx, qy) :: gammastar_l_in, gammastar_r_in
+!f2py intent(in) :: U_l, U_r
+!f2py intent(in) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py intent(in) :: gammastar_l_in, gammastar_r_in
+!f2py intent(out) :: F
+
+  ! The Colella, Glaz, and Ferguson solver of riemann_cgf, with the
+  ! thermodynamics passed in as arrays: the pressure and the effective
+  ! gamma = rho c^2 / p of the left and right states, and the
+  ! effective gamma of the star states at (rhostar, pstar) of
+  ! riemann_cgf_star.  In python these come from vectorized EOS calls,
+  ! so there is no callback into python here.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
+
+  double precision, parameter :: smallc = 1.e-10
+  double precision, parameter :: smallp = 1.e-10
+
+  double precision :: rho_l, un_l, ut_l, rhoe_l, p_l
+  double precision :: rho_r, un_r, ut_r, rhoe_r, p_r
+
+  double precision :: rhostar_l, rhostar_r, rhoestar_l, rhoestar_r
+  double precision :: ustar, pstar, cstar_l, cstar_r
+  double precision :: lambda_l, lambdastar_l, lambda_r, lambdastar_r
+  double precision :: c_l, c_r, sigma
+  double precision :: alpha
+
+  double precision :: rho_state, un_state, ut_state, p_state, rhoe_state
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+
+        ! primitive variable states
+        ! un = normal velocity; ut = transverse velocity
+        call normal_primitives(idir, U_l(i,j,idens), U_l(i,j,ixmom), &
+                               U_l(i,j,iymom), U_l(i,j,iener), &
+                               rho_l, un_l, ut_l, rhoe_l)
+        call normal_primitives(idir, U_r(i,j,idens), U_r(i,j,ixmom), &
+                               U_r(i,j,iymom), U_r(i,j,iener), &
+                               rho_r, un_r, ut_r, rhoe_r)
+
+        p_l = max(p_l_in(i,j), smallp)
+        p_r = max(p_r_in(i,j), smallp)
+
+        call cgf_star_state(rho_l, un_l, rhoe_l, p_l, gamma_l_in(i,j), &
+                            rho_r, un_r, rhoe_r, p_r, gamma_r_in(i,j), &
+                            c_l, c_r, pstar, ustar, &
+                            rhostar_l, rhostar_r, rhoestar_l, rhoestar_r)
+
+        cstar_l = max(smallc,sqrt(gammastar_l_in(i,j)*pstar/rhostar_l))
+        cstar_r = max(smallc,sqrt(gammastar_r_in(i,j)*pstar/rhostar_r))
+
+        ! figure out which state we are in, based on the location of
+        ! the waves
+        if (ustar > 0.0d0) then
+
+           ! contact is moving to the right, we need to understand
+           ! the L and *L states
+
+           ! Note: transverse velocity only jumps across contact
+           ut_state = ut_l
+
+           ! define eigenvalues
+           lambda_l = un_l - c_l
+           lambdastar_l = ustar - cstar_l
+
+           if (pstar > p_l) then
+              ! the wave is a shock -- find the shock speed
+              sigma = (lambda_l + lambdastar_l)/2.0d0
+
+              if (sigma > 0.0d0) then
+                 ! shock is moving to the right -- solution is L state
+                 rho_state = rho_l
+                 un_state = un_l
+                 p_state = p_l
+                 rhoe_state = rhoe_l
+
+              else
+                 ! solution is *L state
+                 rho_state = rhostar_l
+                 un_state = ustar
+                 p_state = pstar
+                 rhoe_state = rhoestar_l
+              endif
+
+           else
+              ! the wave is a rarefaction
+              if (lambda_l < 0.0d0 .and. lambdastar_l < 0.0d0) then
+                 ! rarefaction fan is moving to the left -- solution is
+                 ! *L state
+                 rho_state = rhostar_l
+                 un_state = ustar
+                 p_state = pstar
+                 rhoe_state = rhoestar_l
+
+              else if (lambda_l > 0.0d0 .and. lambdastar_l > 0.0d0) then
+                 ! rarefaction fan is moving to the right -- solution is
+                 ! L state
+                 rho_state = rho_l
+                 un_state = un_l
+                 p_state = p_l
+                 rhoe_state = rhoe_l
+
+              else
+                 ! rarefaction spans x/t = 0 -- interpolate
+                 alpha = lambda_l/(lambda_l - lambdastar_l)
+
+                 rho_state  = alpha*rhostar_l  + (1.0d0 - alpha)*rho_l
+                 un_state   = alpha*ustar      + (1.0d0 - alpha)*un_l
+                 p_state    = alpha*pstar      + (1.0d0 - alpha)*p_l
+                 rhoe_state = alpha*rhoestar_l + (1.0d0 - alpha)*rhoe_l
+              endif
+
+           endif
+
+        else if (ustar < 0) then
+
+           ! contact moving left, we need to understand the R and *R
+           ! states
+
+           ! Note: transverse velocity only jumps across contact
+           ut_state = ut_r
+
+           ! define eigenvalues
+           lambda_r = un_r + c_r
+           lambdastar_r = ustar + cstar_r
+
+           if (pstar > p_r) then
+              ! the wave if a shock -- find the shock speed
+              sigma = (lambda_r + lambdastar_r)/2.0d0
+
+              if (sigma > 0.0d0) then
+                 ! shock is moving to the right -- solution is *R state
+                 rho_state = rhostar_r
+                 un_state = ustar
+                 p_state = pstar
+                 rhoe_state = rhoestar_r
+
+              else
+                 ! solution is R state
+                 rho_state = rho_r
+                 un_state = un_r
+                 p_state = p_r
+                 rhoe_state = rhoe_r
+              endif
+
+           else
+              ! the wave is a rarefaction
+              if (lambda_r < 0.0d0 .and. lambdastar_r < 0.0d0) then
+                 ! rarefaction fan is moving to the left -- solution is
+                 ! R state
+                 rho_state = rho_r
+                 un_state = un_r
+                 p_state = p_r
+                 rhoe_state = rhoe_r
+
+              else if (lambda_r > 0.0d0 .and. lambdastar_r > 0.0d0) then
+                 ! rarefaction fan is moving to the right -- solution is
+                 ! *R state
+                 rho_state = rhostar_r
+                 un_state = ustar
+                 p_state = pstar
+                 rhoe_state = rhoestar_r
+
+              else
+                 ! rarefaction spans x/t = 0 -- interpolate
+                 alpha = lambda_r/(lambda_r - lambdastar_r)
+
+                 rho_state  = alpha*rhostar_r  + (1.0d0 - alpha)*rho_r
+                 un_state   = alpha*ustar      + (1.0d0 - alpha)*un_r
+                 p_state    = alpha*pstar      + (1.0d0 - alpha)*p_r
+                 rhoe_state = alpha*rhoestar_r + (1.0d0 - alpha)*rhoe_r
+
+              endif
+
+           endif
+
+        else  ! ustar == 0
+
+           rho_state = 0.5d0*(rhostar_l + rhostar_r)
+           un_state = ustar
+           ut_state = 0.5d0*(ut_l + ut_r)
+           p_state = pstar
+           rhoe_state = 0.5d0*(rhoestar_l + rhoestar_r)
+
+        endif
+
+        ! are we on a solid boundary?
+        if (idir == 1) then
+           if (i == ilo .and. lower_solid == 1) then
+              un_state = 0.0d0
+           endif
+
+           if (i == ihi+1 .and. upper_solid == 1) then
+              un_state = 0.0d0
+           endif
+
+        else if (idir == 2) then
+           if (j == jlo .and. lower_solid == 1) then
+              un_state = 0.0d0
+           endif
+
+           if (j == jhi+1 .and. upper_solid == 1) then
+              un_state = 0.0d0
+           endif
+
+        endif
+
+        ! compute the fluxes
+        F(i,j,idens) = rho_state*un_state
+
+        if (idir == 1) then
+           F(i,j,ixmom) = rho_state*un_state**2 + p_state
+           F(i,j,iymom) = rho_state*ut_state*un_state
+        else
+           F(i,j,ixmom) = rho_state*ut_state*un_state
+           F(i,j,iymom) = rho_state*un_state**2 + p_state
+        endif
+
+        F(i,j,iener) = rhoe_state*un_state + &
+             0.5d0*rho_state*(un_state**2 + ut_state**2)*un_state + &
+             p_state*un_state
+
+     enddo
+  enddo
+
+end subroutine riemann_cgf_batched
+
+
+subroutine riemann_hllc_batched(idir, qx, qy, ng, &
+                                nvar, idens, ixmom, iymom, iener, &
+                                lower_solid, upper_solid, &
+                                U_l, U_r, p_l_in, p_r_in, gamma_l_in, gamma_r_in, F)
+
+  implicit none
+
+  integer, intent(in) :: idir
+  integer, intent(in) :: qx, qy, ng
+  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
+  integer, intent(in) :: lower_solid, upper_solid
+
+  ! 0-based indexing to match python
+  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
+  double precision, intent(inout) :: p_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: p_r_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_l_in(0:qx-1,0:qy-1)
+  double precision, intent(inout) :: gamma_r_in(0:qx-1,0:qy-1)
+  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
+!f2py depend(qx, qy, nvar) :: U_l, U_r
+!f2py depend(qx, qy) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py intent(in) :: U_l, U_r
+!f2py intent(in) :: p_l_in, p_r_in, gamma_l_in, gamma_r_in
+!f2py intent(out) :: F
+
+  ! The HLLC solver of riemann_HLLC, with the pressure and effective
+  ! gamma of the left and right states passed in as arrays.  In python
+  ! these come from a single vectorized EOS call.
+
+  integer :: ilo, ihi, jlo, jhi
+  integer :: nx, ny
+  integer :: i, j
+
+  double precision, parameter :: smallp = 1.e-10
+
+  double precision :: rho_l, un_l, ut_l, rhoe_l, p_l
+  double precision :: rho_r, un_r, ut_r, rhoe_r, p_r
+  double precision :: gamma_l, gamma_r
+
+  double precision :: S_l, S_r, S_c
+
+  double precision :: U_state(0:nvar-1)
+  double precision :: HLLCfactor
+
+  nx = qx - 2*ng; ny = qy - 2*ng
+  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
+
+  do j = jlo-1, jhi+1
+     do i = ilo-1, ihi+1
+
+        ! primitive variable states
+        ! un = normal velocity; ut = transverse velocity
+        call normal_primitives(idir, U_l(i,j,idens), U_l(i,j,ixmom), &
+                               U_l(i,j,iymom), U_l(i,j,iener), &
+                               rho_l, un_l, ut_l, rhoe_l)
+        call normal_primitives(idir, U_r(i,j,idens), U_r(i,j,ixmom), &
+                               U_r(i,j,iymom), U_r(i,j,iener), &
+                               rho_r, un_r, ut_r, rhoe_r)
+
+        p_l = max(p_l_in(i,j), smallp)
+        p_r = max(p_r_in(i,j), smallp)
+
+        gamma_l = gamma_l_in(i,j)
+        gamma_r = gamma_r_in(i,j)
+
+        ! use the simplest estimates of the wave speeds
+        S_l = min(un_l - sqrt(gamma_l*p_l/rho_l), un_r - sqrt(gamma_r*p_r/rho_r))
+        S_r = max(un_l + sqrt(gamma_l*p_l/rho_l), un_r + sqrt(gamma_r*p_r/rho_r))
+
+        ! Eqn 10.70 in Toro
+        S_c = (p_r - p_l + rho_l*un_l*(S_l - un_l) - rho_r*un_r*(S_r - un_r))/ &
+             (rho_l*(S_l - un_l) - rho_r*(S_r - un_r))
+
+        ! figure out which region we are in and compute the state and
+        ! the interface fluxes using the HLLC Riemann solver
+        if (S_r <= 0.0d0) then
+           ! R region
+           U_state(:) = U_r(i,j,:)
+
+           call consFlux_p(idir, p_r, idens, ixmom, iymom, iener, nvar, &
+                           U_state, F(i,j,:))
+
+        else if (S_r > 0.0d0 .and. S_c <= 0) then
+           ! R* region
+           HLLCfactor = rho_r*(S_r - un_r)/(S_r - S_c)
+
+           U_state(idens) = HLLCfactor
+
+           if (idir == 1) then
+              U_state(ixmom) = HLLCfactor*S_c
+              U_state(iymom) = HLLCfactor*ut_r
+           else
+              U_state(ixmom) = HLLCfactor*ut_r
+              U_state(iymom) = HLLCfactor*S_c
+           endif
+
+           U_state(iener) = HLLCfactor*(U_r(i,j,iener)/rho_r + &
+                (S_c - un_r)*(S_c + p_r/(rho_r*(S_r - un_r))))
+
+           ! find the flux on the right interface
+           call consFlux_p(idir, p_r, idens, ixmom, iymom, iener, nvar, &
+                           U_r(i,j,:), F(i,j,:))
+
+           ! correct the flux
+           F(i,j,:) = F(i,j,:) + S_r*(U_state(:) - U_r(i,j,:))
+
+        else if (S_c > 0.0d0 .and. S_l < 0.0) then
+           ! L* region
+           HLLCfactor = rho_l*(S_l - un_l)/(S_l - S_c)
+
+           U_state(idens) = HLLCfactor
+
+           if (idir == 1) then
+              U_state(ixmom) = HLLCfactor*S_c
+              U_state(iymom) = HLLCfactor*ut_l
+           else
+              U_state(ixmom) = HLLCfactor*ut_l
+              U_state(iymom) = HLLCfactor*S_c
+           endif
+
+           U_state(iener) = HLLCfactor*(U_l(i,j,iener)/rho_l + &
+                (S_c - un_l)*(S_c + p_l/(rho_l*(S_l - un_l))))
+
+           ! find the flux on the left interface
+           call consFlux_p(idir, p_l, idens, ixmom, iymom, iener, nvar, &
+                           U_l(i,j,:), F(i,j,:))
+
+           ! correct the flux
+           F(i,j,:) = F(i,j,:) + S_l*(U_state(:) - U_l(i,j,:))
+
+        else
+           ! L region
+           U_state(:) = U_l(i,j,:)
+
+           call consFlux_p(idir, p_l, idens, ixmom, iymom, iener, nvar, &
+                           U_state, F(i,j,:))
+
+        endif
+
+        ! we should deal with solid boundaries somehow here
+
+     enddo
+  enddo
+end subroutine riemann_hllc_batched
+
+
+subroutine consFlux_p(idir, p, idens, ixmom, iymom, iener, nvar, U_state, F)
+
+  ! the flux of the conserved state U_state, given its pressure p
+
+  implicit none
+
+  integer, intent(in) :: idir
+  double precision, intent(in) :: p
+  integer, intent(in) :: idens, ixmom, iymom, iener, nvar
+  double precision, intent(in) :: U_state(0:nvar-1)
+  double precision, intent(out) :: F(0:nvar-1)
+
+  double precision :: u, v
+
+  u = U_state(ixmom)/U_state(idens)
+  v = U_state(iymom)/U_state(idens)
+
+  if (idir == 1) then
+     F(idens) = U_state(idens)*u
+     F(ixmom) = U_state(ixmom)*u + p
+     F(iymom) = U_state(iymom)*u
+     F(iener) = (U_state(iener) + p)*u
+  else
+     F(idens) = U_state(idens)*v
+     F(ixmom) = U_state(ixmom)*v
+     F(iymom) = U_state(iymom)*v + p
+     F(iener) = (U_state(iener) + p)*v
+  endif
+
+end subroutine consFlux_p
@@ -0,0 +1,184 @@
+"""
+Vectorized thermodynamics of a multi-species Peng-Robinson mixture.
+The state of the mixture is given by the partial densities rho_i of its
+species, as an array of shape (nspecies, ncells) (or (nspecies, nx,
+ny), any trailing shape works), and every property is evaluated for
+all the species and all the cells at once:
+
+  mix = Mixture(["N2", "O2"])
+  rho, Y, X, MW = mix.composition(rhoi)
+  a, b, R, dadT, d2adT2 = mix.pr_coefficients(T, X, MW)
+  cp = mix.cp_ideal(T, Y)
+
+The mixture PR coefficients follow the van der Waals one-fluid mixing
+rules,
+
+  a = sum_ij X_i X_j sqrt(a_i a_j) (1 - k_ij),   b = sum_i X_i b_i,
+
+in molar units, and are returned per unit mass (with R = Ru/MW), as
+those of preos.peng_robinson_fluid.getThermo, so that the single
+species formulas apply to the mixture unchanged.  The ideal gas cp and h
+come from the NASA polynomials of the species (the low or high
+temperature range of each species in each cell), contracted with the
+mass fractions in a single einsum.
+
+The species constants are those of the compiled species database (see
+species_db.py).
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+import compressible.species_db as species_db
+
+
+# the universal gas constant [J/(mol K)], as in preos.py
+Ru = 8.314
+
+
+class Mixture(object):
+    """ the constants of the species of a PR mixture """
+
+    def __init__(self, species, kij=None):
+        """
+        Look the species up in the species database.
+
+        Parameters
+        ----------
+        species : list of str
+            The species names
+        kij : ndarray, optional
+            The (nspecies, nspecies) binary interaction parameters
+            (zero by default)
+
+        """
+
+        self.species = list(species)
+        ns = len(self.species)
+
+        crit = np.array([species_db.crit_props(s) for s in self.species])
+        self.MW = 1.e-3*crit[:,0]       # [kg/mol]
+        self.pc = crit[:,1]
+        self.Tc = crit[:,2]
+        self.omega = crit[:,4]
+
+        self.kappa = 0.37464 + 1.54226*self.omega - 0.26992*self.omega**2
+
+        # the molar PR constants: a_i(T) = K_i alpha_i(T)^2
+        self.K = 0.457236*(Ru*self.Tc)**2/self.pc
+        self.b = 0.077796*Ru*self.Tc/self.pc
+
+        if kij is None:
+            kij = np.zeros((ns, ns))
+        self.kij = np.asarray(kij, dtype=np.float64)
+        self._M = 1.0 - self.kij
+
+        polys = [species_db.nasa_polynomials(s) for s in self.species]
+        self.Tmid = np.array([p[0][1] for p in polys])
+        self.lowT = np.array([p[1] for p in polys])
+        self.highT = np.array([p[2] for p in polys])
+
+
+    def composition(self, rhoi):
+        """
+        The density, mass fractions, mole fractions and molecular weight
+        [kg/mol] of the mixture, given the partial densities rhoi
+        (nspecies, ...).
+        """
+
+        rhoi = np.asarray(rhoi, dtype=np.float64)
+        MWi = self.MW.reshape((-1,) + (1,)*(rhoi.ndim - 1))
+
+        rho = rhoi.sum(axis=0)
+        Y = rhoi/rho
+        MW = 1.0/(Y/MWi).sum(axis=0)
+        X = Y*MW/MWi
+
+        return rho, Y, X, MW
+
+
+    def molecular_weight(self, rhoi):
+        """ the molecular weight of the mixture [kg/mol] """
+        return self.composition(rhoi)[3]
+
+
+    def pr_coefficients(self, T, X, MW=None):
+        """
+        The PR coefficients of the mixture, per unit mass: a, b, R,
+        da/dT and d^2a/dT^2, as preos.peng_robinson_fluid.getThermo.
+
+        Parameters
+        ----------
+        T : ndarray
+            The temperature
+        X : ndarray
+            The mole fractions (nspecies, ...), of the shape of T
+        MW : ndarray, optional
+            The molecular weight of the mixture (computed from X if not
+            given)
+
+        """
+
+        T = np.asarray(T, dtype=np.float64)
+        X = np.asarray(X, dtype=np.float64)
+        col = (-1,) + (1,)*T.ndim
+
+        if MW is None:
+            MW = np.einsum("i...,i->...", X, self.MW)
+
+        # sqrt(a_i) = sqrt(K_i) alpha_i and its T derivatives
+        sK = np.sqrt(self.K).reshape(col)
+        kappa = self.kappa.reshape(col)
+        Tc = self.Tc.reshape(col)
+        sTr = np.sqrt(T/Tc)
+
+        s = sK*(1.0 + kappa*(1.0 - sTr))
+        ds = -sK*kappa/(2.0*np.sqrt(T*Tc))
+        d2s = sK*kappa/(4.0*T*np.sqrt(T*Tc))
+
+        Xs, Xds, Xd2s = X*s, X*ds, X*d2s
+        M = self._M
+
+        a = np.einsum("i...,ij,j...->...", Xs, M, Xs)
+        dadT = 2.0*np.einsum("i...,ij,j...->...", Xds, M, Xs)
+        d2adT2 = 2.0*(np.einsum("i...,ij,j...->...", Xds, M, Xds) +
+                      np.einsum("i...,ij,j...->...", Xd2s, M, Xs))
+
+        b = np.einsum("i...,i->...", X, self.b)
+
+        return a/MW**2, b/MW, Ru/MW, dadT/MW**2, d2adT2/MW**2
+
+
+    def nasa_coefficients(self, T):
+        """
+        the NASA coefficients of every species in every cell, (nspecies,
+        ..., 7), from the low or high temperature range at T
+        """
+        T = np.asarray(T, dtype=np.float64)
+        shape = (-1,) + (1,)*T.ndim + (7,)
+        low = T[np.newaxis,...,np.newaxis] < self.Tmid.reshape(shape[:-1] + (1,))
+        return np.where(low, self.lowT.reshape(shape), self.highT.reshape(shape))
+
+
+    def cp_ideal(self, T, Y):
+        """ the ideal gas cp of the mixture [J/(kg K)], given T and the mass fractions """
+        T = np.asarray(T, dtype=np.float64)
+        C = self.nasa_coefficients(T)
+        Tk = np.array([np.ones_like(T), T, T**2, T**3, T**4])
+        w = np.asarray(Y)*(Ru/self.MW).reshape((-1,) + (1,)*T.ndim)
+        return np.einsum("s...,s...k,k...->...", w, C[...,:5], Tk)
+
+
+    def h_ideal(self, T, Y):
+        """ the ideal gas enthalpy of the mixture [J/kg], given T and the mass fractions """
+        T = np.asarray(T, dtype=np.float64)
+        C = self.nasa_coefficients(T)
+        Tk = np.array([T, T**2/2.0, T**3/3.0, T**4/4.0, T**5/5.0, np.ones_like(T)])
+        w = np.asarray(Y)*(Ru/self.MW).reshape((-1,) + (1,)*T.ndim)
+        return np.einsum("s...,s...k,k...->...", w, C[...,:6], Tk)
+
+
+    def e_ideal(self, T, Y, MW):
+        """ the ideal gas internal energy of the mixture [J/kg] """
+        return self.h_ideal(T, Y) - Ru/MW*T
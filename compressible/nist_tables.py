@@ -0,0 +1,259 @@
+"""
+A columnar file format for the tabulated NIST fluid properties, which
+replaces the pickled dicts of databases/NIST_fluid.  A pickle has to be
+loaded whole (NIST_tables_2000.pkl holds every species) before a single
+property can be read.  In this format, a small header locates every
+property array of every species, and the arrays themselves are stored
+contiguously, each aligned to a page:
+
+  bytes 0-15      magic b"NISTCOLS", format version, header length
+  header          JSON: for each species, its info dict and, for each
+                  property, the offset, dtype and shape of its array
+  data            the property arrays, little-endian, page-aligned
+
+The file is memory-mapped read-only, so a lookup only reads the pages
+of the arrays that are actually used:
+
+  tab = NISTTable("NIST_tables_2000.nist")
+  T = tab.get("N2", "T")
+  props = tab.lookup("N2")       # dict of all the properties of N2
+
+The pickles are converted with
+
+  python -m compressible.nist_tables NIST_tables_2000.pkl [out.nist]
+
+where a pickle is either a whole database, {"species": [names], name:
+{"info": {...}, property: array, ...}, ...}, or the dict of a single
+species as written by the old split_database.py.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import pickle
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from util import msg
+
+
+_MAGIC = b"NISTCOLS"
+_HEAD = "<8sII"
+_ALIGN = 4096
+
+FORMAT_VERSION = 1
+
+
+def _columns(props, prefix=""):
+    """
+    the numeric arrays of a species dict, by property name -- nested
+    dicts are flattened to "key/subkey"
+    """
+    cols = {}
+    for key, val in props.items():
+        name = prefix + str(key)
+        if key == "info" and not prefix:
+            continue
+        if isinstance(val, dict):
+            cols.update(_columns(val, name + "/"))
+            continue
+        a = np.asarray(val)
+        if a.dtype.kind not in "biuf":
+            msg.warning("skipping the non-numeric property {}".format(name))
+            continue
+        cols[name] = a
+    return cols
+
+
+def _jsonable(info):
+    """ info with the NumPy scalars and arrays made JSON serializable """
+    return json.loads(json.dumps(info, default=lambda x: np.asarray(x).tolist()))
+
+
+def write_table(species, path):
+    """
+    Write a set of species to path.  The file is written under a
+    temporary name and then renamed, so that readers never see a
+    partial file.
+
+    Parameters
+    ----------
+    species : dict
+        For each species name, a dict of its properties (arrays, or
+        nested dicts of arrays) and an optional "info" dict of
+        JSON-serializable metadata
+    path : str
+        The file name
+
+    """
+
+    header = {}
+    columns = []
+    offset = 0
+    for name, props in species.items():
+        cols = {}
+        for prop, a in sorted(_columns(props).items()):
+            a = np.ascontiguousarray(a, dtype=a.dtype.newbyteorder("<"))
+            cols[prop] = {"offset": offset, "dtype": a.dtype.str,
+                          "shape": list(a.shape)}
+            columns.append(a)
+            offset += _ALIGN*((a.nbytes + _ALIGN - 1)//_ALIGN)
+
+        header[name] = {"info": _jsonable(props.get("info", {})),
+                        "columns": cols}
+
+    h = json.dumps(header, sort_keys=True).encode("utf-8")
+    head_len = struct.calcsize(_HEAD) + len(h)
+    data_offset = _ALIGN*((head_len + _ALIGN - 1)//_ALIGN)
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               suffix=".tmp")
+    try:
+        os.chmod(tmp, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack(_HEAD, _MAGIC, FORMAT_VERSION, len(h)))
+            f.write(h)
+            f.write(b"\0"*(data_offset - head_len))
+            for a in columns:
+                f.write(a.tobytes())
+                f.write(b"\0"*(-a.nbytes % _ALIGN))
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+class NISTTable(object):
+    """ the species of a table file, memory-mapped read-only """
+
+    def __init__(self, path):
+        """
+        Read the header of the table file path.  No property data is
+        read until it is asked for.
+        """
+
+        self.path = path
+
+        with open(path, "rb") as f:
+            head = f.read(struct.calcsize(_HEAD))
+            if len(head) < struct.calcsize(_HEAD):
+                msg.fail("ERROR: {} is not a NIST table".format(path))
+            magic, version, hlen = struct.unpack(_HEAD, head)
+            if magic != _MAGIC:
+                msg.fail("ERROR: {} is not a NIST table".format(path))
+            if version != FORMAT_VERSION:
+                msg.fail("ERROR: {} is of format version {}, not {}".format(
+                    path, version, FORMAT_VERSION))
+            self.header = json.loads(f.read(hlen).decode("utf-8"))
+
+        head_len = struct.calcsize(_HEAD) + hlen
+        self.data_offset = _ALIGN*((head_len + _ALIGN - 1)//_ALIGN)
+
+        self._mm = None
+
+    @property
+    def species(self):
+        """ the names of the species in the table """
+        return list(self.header)
+
+    def _entry(self, name):
+        entry = self.header.get(name)
+        if entry is None:
+            msg.fail("ERROR: species {} is not in {}".format(name, self.path))
+        return entry
+
+    def info(self, name):
+        """ the info dict of the species name """
+        return self._entry(name)["info"]
+
+    def properties(self, name):
+        """ the names of the properties of the species name """
+        return sorted(self._entry(name)["columns"])
+
+    def get(self, name, prop):
+        """
+        the property prop of the species name, as a read-only view into
+        the memory-mapped file
+        """
+        col = self._entry(name)["columns"].get(prop)
+        if col is None:
+            msg.fail("ERROR: species {} has no property {}".format(name, prop))
+
+        if self._mm is None:
+            self._mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        dt = np.dtype(col["dtype"])
+        start = self.data_offset + col["offset"]
+        n = int(np.prod(col["shape"], dtype=np.int64))
+        return self._mm[start:start + n*dt.itemsize].view(dt).reshape(col["shape"])
+
+    def lookup(self, name):
+        """
+        the dict of all the properties of the species name (read-only
+        views into the file) and its "info" dict
+        """
+        props = {prop: self.get(name, prop) for prop in self.properties(name)}
+        props["info"] = self.info(name)
+        return props
+
+
+def convert_pickle(pkl_files, path):
+    """
+    Convert pickled NIST tables to a table file.
+
+    Parameters
+    ----------
+    pkl_files : list of str
+        The pickles: whole databases ({"species": [names], name: dict,
+        ...}) or single species dicts, whose info dict holds the
+        species_name
+    path : str
+        The table file to write
+
+    Returns
+    -------
+    out : list of str
+        The species written
+
+    """
+
+    species = {}
+    for fname in pkl_files:
+        with open(fname, "rb") as f:
+            try:
+                d = pickle.load(f)
+            except UnicodeDecodeError:
+                # pickles written by python 2
+                f.seek(0)
+                d = pickle.load(f, encoding="latin1")
+
+        if "species" in d:
+            for name in d["species"]:
+                species[name] = d[name]
+        else:
+            name = d.get("info", {}).get("species_name",
+                                         os.path.splitext(os.path.basename(fname))[0])
+            species[name] = d
+
+    write_table(species, path)
+    return list(species)
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) < 2:
+        print("usage: python -m compressible.nist_tables file.pkl [file.pkl ...] [out.nist]")
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    if len(args) > 1 and args[-1].endswith(".nist"):
+        out = args.pop()
+    else:
+        out = os.path.splitext(args[0])[0] + ".nist"
+
+    names = convert_pickle(args, out)
+    msg.bold("wrote {} species to {}".format(len(names), out))
@@ -1,204 +1,182 @@
-subroutine getThermo(T)
+module pr_eos
 
-  implicit none
-
-  ! 0-based indexing to match python
-  double precision, intent(inout) :: T(0:qx-1)
-
-!f2py depend(qx, qy) :: r, u, v, p
-!f2py depend(qx, qy, nvar) :: q_l, q_r
-!f2py intent(in) :: T
-!f2py intent(out) :: a, b, R, dadT, d2adT2
-
-  double precision :: dq(0:nvar-1), q(0:nvar-1)
-  double precision :: lvec(0:nvar-1,0:nvar-1), rvec(0:nvar-1,0:nvar-1)
-
-  double precision :: MW = 28.0134d-3, Tc = 126.19, pc = 3.3958d06, rhoc = 313.3, omega = 0.03720
-  double precision :: c, R, b, 
-  double precision :: a(0:)
-
-  c = 0.37464 + 1.54226*omega - 0.26992*omega**2
-
-  R = 8.314d0/MW
-
-  a = 0.457236*(R*Tc)**2 / pc*(1+c*(1-sqrt(T/Tc)))**2
-
-  b = 0.077796*R*Tc/pc
-  G = c*np.sqrt(T/Tc) / (1+c*(1-np.sqrt(T/Tc)))
-  dadT = -1./T*a*G
-  d2adT2 = 0.457236*R**2. / T/2*c*(1+c)*Tc/pc*np.sqrt(Tc/T)
-
-end subroutine states
-
-
-subroutine getEnergyfromTandRho(T, rho)
-
-  implicit none
-
-  integer, intent(in) :: idir
-  integer, intent(in) :: qx, qy, ng
-  integer, intent(in) :: nvar, idens, ixmom, iymom, iener
-  integer, intent(in) :: lower_solid, upper_solid
-  double precision, intent(in) :: gamma
-
-  ! 0-based indexing to match python 
-  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(  out) :: F(0:qx-1,0:qy-1,0:nvar-1)
-
-!f2py depend(qx, qy, nvar) :: U_l, U_r     
-!f2py intent(in) :: U_l, U_r
-!f2py intent(out) :: e
-
-  coef = [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]
-   
-  a,b,R,dadT,d2adT2 = getThermo(T)
-  h_ideal = T*R*(coef[0] + coef[1]*T/2.0 + coef[2]*T**2/3.0 + coef[3]*T**3/4.0 + coef[4] * T**4/5.0+ coef[5] / T)
-
-  v = 1/rho
-  K1 = 1.0/(2.0*sqrt(2.0)*b) * log((v+(1.0-sqrt(2))*b)/(v+(1.0+sqrt(2))*b))
-  dep = (a - T*dadT)*K1
-
-  e = h_ideal - R*T + dep
-
-end subroutine getEnergyfromTandRho
-
-
-subroutine getGamma(V)
-
-
-  implicit none
-
-  ! 0-based indexing to match python 
-  double precision, intent(inout) :: U_l(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(inout) :: U_r(0:qx-1,0:qy-1,0:nvar-1)
-  double precision, intent(  out) :: gammaS
-
-!f2py depend(qx, qy, nvar) :: U_l, U_r     
-!f2py intent(in) :: U_l, U_r
-!f2py intent(out) :: F
-
-  double precision, parameter :: smallc = 1.e-10
-  double precision, parameter :: smallrho = 1.e-10
-  double precision, parameter :: smallp = 1.e-10
-
-  rho = V[0]
-  p = V[1]
-  T = self.getTfromPandRho(p,rho)
-  e = self.getEnergyfromTandRho(T,rho)
-
-  sos = self.getSos(V)
-
-  gammaS = sos**2*rho/p 
-
-end subroutine getGamma
-   
-subroutine consFlux(idir, gamma, idens, ixmom, iymom, iener, nvar, U_state, F)        
-  
-  integer, intent(in) :: idir
-  double precision, intent(in) :: gamma
-  integer, intent(in) :: idens, ixmom, iymom, iener, nvar
-  double precision, intent(in) :: U_state(0:nvar-1)
-  double precision, intent(out) :: F(0:nvar-1)
-
-  double precision :: p, u, v
-
-  u = U_state(ixmom)/U_state(idens)
-  v = U_state(iymom)/U_state(idens)
-
-  p = (U_state(iener) - 0.5d0*U_state(idens)*(u*u + v*v))*(gamma - 1.0d0)
-
-  if (idir == 1) then
-     F(idens) = U_state(idens)*u
-     F(ixmom) = U_state(ixmom)*u + p
-     F(iymom) = U_state(iymom)*u
-     F(iener) = (U_state(iener) + p)*u
-  else
-     F(idens) = U_state(idens)*v
-     F(ixmom) = U_state(ixmom)*v 
-     F(iymom) = U_state(iymom)*v + p
-     F(iener) = (U_state(iener) + p)*v
-  endif
-
-end subroutine consFlux
-  
-
-subroutine artificial_viscosity(qx, qy, ng, dx, dy, &
-                                cvisc, u, v, avisco_x, avisco_y)
-
-  implicit none
-  integer, intent(in) :: qx, qy, ng
-  double precision, intent(in) :: dx, dy
-  double precision, intent(in) :: cvisc
-
-  ! 0-based indexing to match python
-  double precision, intent(in) :: u(0:qx-1, 0:qy-1)
-  double precision, intent(in) :: v(0:qx-1, 0:qy-1)
-  double precision, intent(out) :: avisco_x(0:qx-1, 0:qy-1)
-  double precision, intent(out) :: avisco_y(0:qx-1, 0:qy-1)
-
-!f2py depend(qx, qy) :: u, v
-!f2py depend(qx, qy) :: avisco_x, avisco_y
-!f2py intent(in) :: u, v
-!f2py intent(out) :: avisco_x, avisco_y
-
-  ! compute the artifical viscosity.  Here, we compute edge-centered
-  ! approximations to the divergence of the velocity.  This follows 
-  ! directly Colella & Woodward (1984) Eq. 4.5
+  ! The Peng-Robinson equation of state, for use directly inside the
+  ! interface and Riemann kernels (no callback into python).  The
+  ! fluid is set with pr_init, from its critical properties and the
+  ! NASA polynomial of the ideal gas, e.g. for N2
   !
-  ! data locations:
+  !   interface_f.pr_eos.pr_init(28.0134e-3, 126.19, 3.3958e6, 0.0372, coef)
   !
-  !   j+3/2--+---------+---------+---------+
-  !          |         |         |         |
-  !     j+1  +         |         |         |
-  !          |         |         |         |
-  !   j+1/2--+---------+---------+---------+
-  !          |         |         |         |
-  !        j +         X         |         |
-  !          |         |         |         |
-  !   j-1/2--+---------+----Y----+---------+ 
-  !          |         |         |         |
-  !      j-1 +         |         |         |
-  !          |         |         |         | 
-  !   j-3/2--+---------+---------+---------+
-  !          |    |    |    |    |    |    | 
-  !              i-1        i        i+1   
-  !        i-3/2     i-1/2     i+1/2     i+3/2 
-  !
-  ! X is the location of avisco_x(i,j)
-  ! Y is the location of avisco_y(i,j)
-
-  integer :: ilo, ihi, jlo, jhi
-  integer :: nx, ny
- 
-  integer :: i, j
-
-  double precision :: divU_x, divU_y
+  ! All the quantities are per unit mass (J/kg, J/kg/K).  These are the
+  ! same relations as in preos_cy.pyx / preos_kernels.pyx.
 
-  nx = qx - 2*ng; ny = qy - 2*ng
-  ilo = ng; ihi = ng+nx-1; jlo = ng; jhi = ng+ny-1
-
-  do j = jlo-1, jhi+1
-     do i = ilo-1, ihi+1
-
-        ! start by computing the divergence on the x-interface.  The
-        ! x-difference is simply the difference of the cell-centered
-        ! x-velocities on either side of the x-interface.  For the
-        ! y-difference, first average the four cells to the node on
-        ! each end of the edge, and then difference these to find the
-        ! edge centered y difference.
-        divU_x = (u(i,j) - u(i-1,j))/dx + &
-             0.25d0*(v(i,j+1) + v(i-1,j+1) - v(i,j-1) - v(i-1,j-1))/dy
-
-        avisco_x(i,j) = cvisc*max(-divU_x*dx, 0.0d0)
-
-        ! now the y-interface value
-        divU_y = 0.25d0*(u(i+1,j) + u(i+1,j-1) - u(i-1,j) - u(i-1,j-1))/dx + &
-             (v(i,j) - v(i,j-1))/dy
-
-        avisco_y(i,j) = cvisc*max(-divU_y*dy, 0.0d0)
-        
-     enddo
-  enddo
+  implicit none
 
-end subroutine artificial_viscosity
+  double precision, save :: pr_R = 0.0d0, pr_Tc = 0.0d0, pr_c = 0.0d0
+  double precision, save :: pr_K = 0.0d0, pr_b = 0.0d0
+  double precision, save :: pr_cp(0:4) = 0.0d0, pr_h5 = 0.0d0
+
+  ! set by pr_init, and checked before the native kernels are used
+  integer, save :: pr_initialized = 0
+
+  ! the Newton iteration for T(e, rho)
+  double precision, parameter :: pr_T_min = 20.0d0, pr_T_max = 1.0d4
+  double precision, parameter :: pr_xtol = 1.0d-10
+  integer, parameter :: pr_maxiter = 50
+
+contains
+
+  subroutine pr_init(MW, Tc, pc, omega, coef)
+
+    double precision, intent(in) :: MW, Tc, pc, omega
+    double precision, intent(in) :: coef(0:6)
+
+    ! MW    : molecular weight [kg/mol]
+    ! Tc    : critical temperature [K]
+    ! pc    : critical pressure [Pa]
+    ! omega : acentric factor
+    ! coef  : NASA 7-coefficient polynomial (the first 6 are used)
+
+    pr_R = 8.314d0/MW
+    pr_Tc = Tc
+    pr_c = 0.37464d0 + 1.54226d0*omega - 0.26992d0*omega**2
+    pr_K = 0.457236d0*(pr_R*Tc)**2/pc
+    pr_b = 0.077796d0*pr_R*Tc/pc
+    pr_cp(:) = coef(0:4)
+    pr_h5 = coef(5)
+
+    pr_initialized = 1
+
+  end subroutine pr_init
+
+
+  double precision function pr_a(T)
+    double precision, intent(in) :: T
+    pr_a = pr_K*(1.0d0 + pr_c*(1.0d0 - sqrt(T/pr_Tc)))**2
+  end function pr_a
+
+  double precision function pr_dadT(T)
+    double precision, intent(in) :: T
+    double precision :: sT
+    sT = sqrt(T/pr_Tc)
+    pr_dadT = -pr_K*pr_c*(1.0d0 + pr_c*(1.0d0 - sT))*sT/T
+  end function pr_dadT
+
+  double precision function pr_d2adT2(T)
+    double precision, intent(in) :: T
+    pr_d2adT2 = 0.5d0*pr_K*pr_c*(1.0d0 + pr_c)/(T*pr_Tc)*sqrt(pr_Tc/T)
+  end function pr_d2adT2
+
+  double precision function pr_K1(v)
+    double precision, intent(in) :: v
+    double precision :: s2
+    s2 = sqrt(2.0d0)
+    pr_K1 = 1.0d0/(2.0d0*s2*pr_b)*log((v + (1.0d0 - s2)*pr_b)/(v + (1.0d0 + s2)*pr_b))
+  end function pr_K1
+
+  double precision function pr_cv_ideal(T)
+    double precision, intent(in) :: T
+    pr_cv_ideal = pr_R*(pr_cp(0) + T*(pr_cp(1) + T*(pr_cp(2) + T*(pr_cp(3) + T*pr_cp(4))))) - pr_R
+  end function pr_cv_ideal
+
+
+  double precision function pr_pressure(T, rho)
+    ! p(T, rho)
+    double precision, intent(in) :: T, rho
+    double precision :: v
+    v = 1.0d0/rho
+    pr_pressure = pr_R*T/(v - pr_b) - pr_a(T)/(v*v + 2.0d0*v*pr_b - pr_b*pr_b)
+  end function pr_pressure
+
+  double precision function pr_energy(T, rho)
+    ! e(T, rho)
+    double precision, intent(in) :: T, rho
+    double precision :: h_ideal
+    h_ideal = T*pr_R*(pr_cp(0) + T*(pr_cp(1)/2.0d0 + T*(pr_cp(2)/3.0d0 + &
+         T*(pr_cp(3)/4.0d0 + T*pr_cp(4)/5.0d0)))) + pr_R*pr_h5
+    pr_energy = h_ideal - pr_R*T + (pr_a(T) - T*pr_dadT(T))*pr_K1(1.0d0/rho)
+  end function pr_energy
+
+  double precision function pr_cv(T, rho)
+    ! de/dT at constant density
+    double precision, intent(in) :: T, rho
+    pr_cv = pr_cv_ideal(T) - pr_K1(1.0d0/rho)*T*pr_d2adT2(T)
+  end function pr_cv
+
+  double precision function pr_temperature_p(p, rho)
+    ! T(p, rho).  p is a quadratic in s = sqrt(T), A s^2 + B s + C = 0,
+    ! whose positive root is taken in the form that does not cancel
+    double precision, intent(in) :: p, rho
+    double precision :: v, D, alpha, beta, A, B, C, s
+    v = 1.0d0/rho
+    D = v*v + 2.0d0*v*pr_b - pr_b*pr_b
+    alpha = 1.0d0 + pr_c
+    beta = pr_c/sqrt(pr_Tc)
+    A = pr_R/(v - pr_b) - pr_K*beta*beta/D
+    B = 2.0d0*pr_K*alpha*beta/D
+    C = -(pr_K*alpha*alpha/D + p)
+    s = -2.0d0*C/(B + sqrt(B*B - 4.0d0*A*C))
+    pr_temperature_p = s*s
+  end function pr_temperature_p
+
+  double precision function pr_temperature_e(e, rho, T_guess)
+    ! T(e, rho), by a Newton iteration safeguarded with bisection (as
+    ! tools.newtonSolveT)
+    double precision, intent(in) :: e, rho, T_guess
+    double precision :: lo, hi, T, Tn, res
+    integer :: it
+
+    lo = pr_T_min
+    hi = pr_T_max
+    T = T_guess
+    if (.not. (T > lo .and. T < hi)) T = 300.0d0
+
+    do it = 1, pr_maxiter
+       res = pr_energy(T, rho) - e
+       if (res > 0.0d0) then
+          hi = T
+       else
+          lo = T
+       endif
+       Tn = T - res/pr_cv(T, rho)
+       if (.not. (Tn >= lo .and. Tn <= hi)) Tn = 0.5d0*(lo + hi)
+       if (abs(Tn - T) <= pr_xtol*T) then
+          T = Tn
+          exit
+       endif
+       T = Tn
+    enddo
+
+    pr_temperature_e = T
+  end function pr_temperature_e
+
+  double precision function pr_pressure_e(rho, e)
+    ! p(rho, e)
+    double precision, intent(in) :: rho, e
+    pr_pressure_e = pr_pressure(pr_temperature_e(e, rho, 300.0d0), rho)
+  end function pr_pressure_e
+
+  double precision function pr_sound(p, rho)
+    ! c(p, rho)
+    double precision, intent(in) :: p, rho
+    double precision :: v, T, a, dpdT, dpdv, para, cp, kT, av, ks
+    v = 1.0d0/rho
+    T = pr_temperature_p(p, rho)
+    a = pr_a(T)
+    dpdT = pr_R/(v - pr_b) - pr_dadT(T)/(v*v + 2.0d0*v*pr_b - pr_b*pr_b)
+    para = pr_R*T*(v + pr_b)*(v/(v - pr_b) + pr_b/(v + pr_b))**2
+    dpdv = -pr_R*T/(v - pr_b)**2*(1.0d0 - 2.0d0*a/para)
+    cp = pr_cv_ideal(T) - T*dpdT*dpdT/dpdv - pr_K1(v)*T*pr_d2adT2(T)
+    kT = -1.0d0/(v*dpdv)
+    av = -dpdT/(v*dpdv)
+    ks = kT - v*T*av*av/cp
+    pr_sound = sqrt(1.0d0/(rho*ks))
+  end function pr_sound
+
+  double precision function pr_gamma(rho, p)
+    ! effective ratio of specific heats, rho c^2 / p
+    double precision, intent(in) :: rho, p
+    pr_gamma = pr_sound(p, rho)**2*rho/p
+  end function pr_gamma
+
+end module pr_eos
@@ -3,24 +3,28 @@ from pdb import set_trace as keyboard
 import thermodynamics_tools as tools
 
 class peng_robinson_fluid():
+	def __init__(self, MW=28.0134e-3, Tc=126.19, pc=3.3958e+6, omega=0.03720, coef=None):
+		# the fluid: molecular weight [kg/mol], critical temperature [K] and
+		# pressure [Pa], acentric factor and NASA polynomial of the ideal gas
+		# (N2 by default, see eos_backends.fluids)
+		if coef is None:
+			coef = [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]
+
+		self.MW = MW
+		self.Tc = Tc
+		self.pc = pc
+		self.omega = omega
+		self.coef = coef
+
 	def getThermo(self, T):
 		#function [ a,b,R,dadT,d2adT2 ] = getThermo( T )
 		#% getThermo Compute necessary thermodyamic parameters for the cubic
-		#% equation of state (N2 property is assumed).
-
-		# N2
-		# MW = 28.0134e-3
-		# Tc = 126.19
-		# pc  = 3.3958e+6
-		# rhoc = 313.3
-		# omega  = 0.03720
+		#% equation of state of the fluid.
 
-		#CO2
-		MW = 44.01e-3
-		Tc = 304.25 
-		pc  = 7.3773e+6
-		rhoc = 348.8
-		omega  = 0.22394
+		MW = self.MW
+		Tc = self.Tc
+		pc = self.pc
+		omega = self.omega
 
 
 		c = 0.37464 + 1.54226*omega - 0.26992*omega**2
@@ -41,10 +45,10 @@ class peng_robinson_fluid():
 	def getEnergyfromTandRho(self,T, rho):
 
 		# getEnergyfromTandRho Compute specific internal energy given temperature
-		# and density. NASA polynomial for N2 is used.
+		# and density. NASA polynomial of the fluid is used.
 
-		# nasa polynomial for N2
-		coef = [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]
+		# nasa polynomial of the fluid
+		coef = self.coef
 		 
 		a,b,R,dadT,d2adT2 = self.getThermo(T)
 		h_ideal = T*R*(coef[0] + coef[1]*T/2.0 + coef[2]*T**2/3.0 + coef[3]*T**3/4.0 + coef[4] * T**4/5.0+ coef[5] / T)
@@ -64,10 +68,8 @@ class peng_robinson_fluid():
 
 		rho = V[0]
 		p = V[1]
-		T = self.getTfromPandRho(p,rho)
-		e = self.getEnergyfromTandRho(T,rho)
 
-		sos = self.getSos(V)
+		sos = self.getSos([p, rho])
 
 		gammaS = sos**2*rho/p
 		#e0S = e - p./rho./(gammaS-1)
@@ -87,19 +89,32 @@ class peng_robinson_fluid():
 
 		return p
 
+	def getRhofromPandT(self, p, T):
+		# getRhofromPandT Compute density given pressure and temperature, for
+		# all the cells at once. Where the PR cubic has three roots, the
+		# liquid-like or vapor-like one of smallest Gibbs energy is taken.
+
+		a,b,R,dadT,d2adT2 = self.getThermo(T)
+
+		RT = R*T
+		Z = tools.getCompressibilityPR(a*p/RT**2, b*p/RT)
+		rho = p/(Z*RT)
+
+		return rho
+
 	def getSos(self,V):
 		# function [ sos ] = getSos( V )
 		# % getSos Compute speed of sound given primitive variables. NASA polynomial
-		# % for N2 is used.
+		# % of the fluid is used.
 
-		# nasa polynomial for N2
-		coef = [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]
+		# nasa polynomial of the fluid
+		coef = self.coef
 
 		rho = V[1]
 		p = V[0]
 		v = 1./rho
 
-		T = self.getTfromPandRho(p,rho)
+		T = self.getTfromPandRho_exact(p,rho)
 		a,b,R,dadT,d2adT2 = self.getThermo(T)
 		cp_ideal = R*(coef[0]  + coef[1]*T + coef[2]*T**2  + coef[3]*T**3  + coef[4]*T**4 )
 		cv_ideal = cp_ideal - R
@@ -120,45 +135,85 @@ class peng_robinson_fluid():
 		return sos
 
 
-	def getTfromPandRho(self,p,rho):
-		#function [ T ] = getTfromPandRho( p,rho )
-		# getTfromPandRho Compute temperature given pressure and density.
+	def getCvfromTandRho(self, T, rho):
+		# getCvfromTandRho Compute the specific heat at constant volume, de/dT at
+		# fixed density, given temperature and density. NASA polynomial of the fluid is used.
 
-		CRIT = 1.0e-2
+		# nasa polynomial of the fluid
+		coef = self.coef
 
-		v = 1./rho
-		T = 300.0*np.ones(np.size(rho))
-		p_n = self.getPfromTandRho(T,rho)
-		diff = p_n - p
-
-		while (max(abs(diff)) > CRIT):
-		    a,b,R,dadT,d2adT2 = self.getThermo(T)
-		    dpdT = R/(v-b) - 1./(v**2+2*v*b-b**2)*dadT
-		    T = T - diff/dpdT
-		    p_n = self.getPfromTandRho(T,rho)
-		    diff = p_n - p
-		return T
+		a,b,R,dadT,d2adT2 = self.getThermo(T)
+		cp_ideal = R*(coef[0]  + coef[1]*T + coef[2]*T**2  + coef[3]*T**3  + coef[4]*T**4 )
 
-	def getTfromEandRho(self,e,rho):
-		#function [ T ] = getTfromEandRho( eint,rho )
-		# getTfromEandRho Compute temperature given pressure and density.
+		v = 1.0/rho
+		K1 = 1.0/(2.0*np.sqrt(2.0)*b) * np.log((v+(1.0-np.sqrt(2))*b)/(v+(1.0+np.sqrt(2))*b))
 
-		CRIT = 1.0e-2
+		return cp_ideal - R - K1*T*d2adT2
 
+	def getTfromPandRho(self, p, rho, T_guess=300.0, stats=None):
+		#function [ T ] = getTfromPandRho( p,rho )
+		# getTfromPandRho Compute temperature given pressure and density.
+		# T_guess is the initial guess of the Newton iteration, e.g. the
+		# temperature of the previous step. See tools.newtonSolveT
+
+		rho = np.ravel(np.asarray(rho, dtype=np.float64))
 		v = 1./rho
-		T = 300.0*np.ones(np.size(rho))
-		e_n = self.getEnergyfromTandRho(T,rho)
-		diff = e_n - e
 
-		i = 0
-		while (max(abs(diff)) > CRIT):
-			i = i + 1
+		def pressure(T, idx):
 			a,b,R,dadT,d2adT2 = self.getThermo(T)
-			dpdT = R/(v-b) - 1./(v**2+2*v*b-b**2)*dadT
-			T = T - (diff/dpdT)
-			e_n = self.getEnergyfromTandRho(T,rho)
-			diff = e_n - e
-		print i
+			v_i = v[idx]
+			p_n = (R*T/(v_i-b))-(a/(v_i**2 + 2*v_i*b - b**2))
+			dpdT = R/(v_i-b) - 1./(v_i**2+2*v_i*b-b**2)*dadT
+			return p_n, dpdT
+
+		T = tools.newtonSolveT(pressure, p, T_guess=T_guess, stats=stats)
 		return T
 
+	def getTfromPandRho_exact(self, p, rho):
+		#function [ T ] = getTfromPandRho_exact( p,rho )
+		# getTfromPandRho_exact Compute temperature given pressure and density,
+		# without iterating. With a(T) = K*(alpha - beta*sqrt(T))**2, the PR
+		# pressure is a quadratic in s = sqrt(T):
+		#   A s^2 + B s + C = 0,  D = v^2 + 2 v b - b^2
+		#   A = R/(v-b) - K beta^2/D,  B = 2 K alpha beta/D,  C = -(K alpha^2/D + p)
+		# and the physical root is the positive one.
+
+		MW = self.MW
+		Tc = self.Tc
+		pc = self.pc
+		omega = self.omega
+
+		c = 0.37464 + 1.54226*omega - 0.26992*omega**2
+		R = 8.314/MW
+
+		K = 0.457236*(R*Tc)**2 / pc
+		b = 0.077796*R*Tc/pc
+		alpha = 1.0 + c
+		beta = c/np.sqrt(Tc)
+
+		v = 1.0/np.asarray(rho, dtype=np.float64)
+		D = v**2 + 2*v*b - b**2
 
+		A = R/(v-b) - K*beta**2/D
+		B = 2.0*K*alpha*beta/D
+		C = -(K*alpha**2/D + p)
+
+		# s = (-B + sqrt(B^2 - 4AC))/(2A), written so that it does not
+		# cancel (B > 0, C < 0) and stays finite as A -> 0
+		s = -2.0*C/(B + np.sqrt(B**2 - 4.0*A*C))
+
+		return s**2
+
+	def getTfromEandRho(self, e, rho, T_guess=300.0, stats=None):
+		#function [ T ] = getTfromEandRho( eint,rho )
+		# getTfromEandRho Compute temperature given internal energy and density.
+		# T_guess is the initial guess of the Newton iteration, e.g. the
+		# temperature of the previous step. See tools.newtonSolveT
+
+		rho = np.ravel(np.asarray(rho, dtype=np.float64))
+
+		def energy(T, idx):
+			return self.getEnergyfromTandRho(T, rho[idx]), self.getCvfromTandRho(T, rho[idx])
+
+		T = tools.newtonSolveT(energy, e, T_guess=T_guess, stats=stats)
+		return T
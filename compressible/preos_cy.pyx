@@ -1,23 +1,33 @@
 import numpy as np
 from pdb import set_trace as keyboard
 import thermodynamics_tools as tools
+import preos_kernels as kernels
+
+# the fluid (N2 unless set_fluid is called): molecular weight [kg/mol],
+# critical temperature [K] and pressure [Pa], acentric factor and NASA
+# polynomial of the ideal gas
+_fluid = {'MW': 28.0134e-3, 'Tc': 126.19, 'pc': 3.3958e+6, 'omega': 0.03720,
+          'coef': [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]}
+
+def set_fluid(MW, Tc, pc, omega, coef):
+	# set_fluid Set the fluid of all the functions of this module and of
+	# the compiled kernels (see eos_backends.fluids)
+
+	_fluid.update(MW=MW, Tc=Tc, pc=pc, omega=omega, coef=list(coef))
+	kernels.set_fluid(MW, Tc, pc, omega, coef)
 
 def getThermo(T):
 	#function [ a,b,R,dadT,d2adT2 ] = getThermo( T )
 	#% getThermo Compute necessary thermodyamic parameters for the cubic
-	#% equation of state (N2 property is assumed).
-
-	# N2
+	#% equation of state of the fluid.
 
-	cdef float MW, pc, rhoc, omega, c, R, b
+	cdef double MW, pc, omega, c, R, b
 
-	MW   = 28.0134e-3
-	#Tc   = 126.19
-	pc   = 3.3958e+6
-	rhoc = 313.3
-	omega= 0.03720
+	MW   = _fluid['MW']
+	pc   = _fluid['pc']
+	omega= _fluid['omega']
 
-	Tc = np.asarray(126.19)
+	Tc = np.asarray(_fluid['Tc'])
 
 	c = 0.37464 + 1.54226*omega - 0.26992*omega**2
 
@@ -29,7 +39,7 @@ def getThermo(T):
 	a = 0.457236*pow(R*Tc, 2) / pc*(1+c*(1-np.sqrt(T/Tc)))**2
 	b = 0.077796*R*Tc/pc
 	G = c*np.sqrt(T/Tc) / (1+c*(1-np.sqrt(T/Tc)))
-	dadT = pow(T*a*G, -1)
+	dadT = -a*G/T
 	d2adT2 = np.asarray(0.457236*pow(R, 2)) / T/2*c*(1+c)*Tc/pc*np.sqrt(Tc/T)
 
 	return a,b,R,dadT,d2adT2
@@ -37,21 +47,13 @@ def getThermo(T):
 def getEnergyfromTandRho(T, rho):
 
 	# getEnergyfromTandRho Compute specific internal energy given temperature
-	# and density. NASA polynomial for N2 is used.
+	# and density. NASA polynomial of the fluid is used.
 
-	# nasa polynomial for N2
-	coef = np.asarray([3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00])
-	 
-	a,b,R,dadT,d2adT2 = getThermo(T)
-	h_ideal = T*np.asarray(R)*(coef[0] + coef[1]*T/2.0 + coef[2]*pow(T,2)/3.0 + coef[3]*pow(T,3)/4.0 + coef[4] * pow(T,4)/5.0+ coef[5] / T)
-
-	v = 1/rho
-	K1 = 1.0/(2.0*np.sqrt(2.0)*b) * np.log((v+(1.0-np.sqrt(2))*b)/(v+(1.0+np.sqrt(2))*b))
-	dep = (a - T*dadT)*K1
+	shape, T, rho = _buffers(T, rho)
+	e = np.empty_like(T)
+	kernels.eint(T, rho, e)
 
-	e = h_ideal - R*T + dep
-
-	return e
+	return e.reshape(shape)
 
 def getGamma(V):
 	#function [ gammaS,e0S ] = getGammaSandE0S( V )
@@ -60,10 +62,8 @@ def getGamma(V):
 
 	rho = V[0]
 	p = V[1]
-	T = getTfromPandRho(p,rho)
-	e = getEnergyfromTandRho(T,rho)
 
-	sos = getSos(V)
+	sos = getSos([p, rho])
 
 	gammaS = sos**2*rho/p
 	#e0S = e - p./rho./(gammaS-1)
@@ -74,88 +74,102 @@ def getPfromTandRho(T,rho):
 	#function [ p ] = getPfromTandRho( T,rho )
 	#getPfromTandRho Compute pressure given temperature and density
 
-	a,b,R,dadT,d2adT2 = getThermo(T) #R is in J/Kg K
-
-	#v = tools.getVfromRho(rho, 28.0134e-3)
-	v = 1.0/rho
-	#p = R*T/(v-b) - a/(v**2+2*v*b-b**2)
-	p = (R*T/(v-b))-(a/(v**2 + 2*v*b - b**2))
+	shape, T, rho = _buffers(T, rho)
+	p = np.empty_like(T)
+	kernels.pres(T, rho, p)
 
-	return p
+	return p.reshape(shape)
 
 def getSos(V):
 	# function [ sos ] = getSos( V )
 	# % getSos Compute speed of sound given primitive variables. NASA polynomial
-	# % for N2 is used.
+	# % of the fluid is used.
 
-	# nasa polynomial for N2
-	coef = [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09, -1.408812350E-12,-1.046976280E+03,2.967474680E+00]
+	shape, p, rho = _buffers(V[0], V[1])
+	sos = np.empty_like(p)
+	kernels.sound(p, rho, sos)
 
-	rho = V[1]
-	p = V[0]
-	v = 1./rho
+	return sos.reshape(shape)
+
+
+def getCvfromTandRho(T, rho):
+	# getCvfromTandRho Compute the specific heat at constant volume, de/dT at
+	# fixed density, given temperature and density. NASA polynomial of the fluid is used.
+
+	coef = _fluid['coef']
 
-	T = getTfromPandRho(p,rho)
 	a,b,R,dadT,d2adT2 = getThermo(T)
 	cp_ideal = R*(coef[0]  + coef[1]*T + coef[2]*T**2  + coef[3]*T**3  + coef[4]*T**4 )
-	cv_ideal = cp_ideal - R
 
-	dpdT = R/(v-b) - dadT/(v**2+2*v*b-b**2)
-	coef = R*T/(v-b)**2
-	para = (R*T*(v+b)*(v/(v-b)+ b/(v+b))**2)
-	dpdv = -coef * (1.0 - 2.0*a/para)
+	v = 1.0/rho
 	K1 = 1.0/(2.0*np.sqrt(2.0)*b) * np.log((v+(1.0-np.sqrt(2))*b)/(v+(1.0+np.sqrt(2))*b))
-	cp = cv_ideal - T*(dpdT)**2 / dpdv - K1*T*d2adT2
-
-	kT = -1./v/dpdv
-	av = -dpdT/v/dpdv
-	ks = kT - v*T*av**2./cp
-
-	sos = np.sqrt(1./rho/ks)
 
-	return sos
+	return cp_ideal - R - K1*T*d2adT2
 
 
-def getTfromPandRho(p,rho):
+def getTfromPandRho(p, rho, T_guess=300.0, stats=None):
 	#function [ T ] = getTfromPandRho( p,rho )
 	# getTfromPandRho Compute temperature given pressure and density.
+	# T_guess is the initial guess of the Newton iteration, e.g. the
+	# temperature of the previous step. See tools.newtonSolveT
 
-	cdef float CRIT
-	CRIT = 1.0e-2
-
+	rho = np.ravel(np.asarray(rho, dtype=np.float64))
 	v = 1./rho
-	T = 300.0*np.ones(np.size(rho))
-	p_n = getPfromTandRho(T,rho)
-	diff = p_n - p
 
-	while (max(abs(diff)) > CRIT):
+	def pressure(T, idx):
 		a,b,R,dadT,d2adT2 = getThermo(T)
-		dpdT = R/(v-b) - 1./(v**2+2*v*b-b**2)*dadT
-		T = T - diff/dpdT
-		p_n = getPfromTandRho(T,rho)
-		diff = p_n - p
+		v_i = v[idx]
+		p_n = (R*T/(v_i-b))-(a/(v_i**2 + 2*v_i*b - b**2))
+		dpdT = R/(v_i-b) - 1./(v_i**2+2*v_i*b-b**2)*dadT
+		return p_n, dpdT
+
+	T = tools.newtonSolveT(pressure, p, T_guess=T_guess, stats=stats)
 	return T
 
-def getTfromEandRho(double[:] e, rho):
+def getTfromPandRho_exact(p, rho):
+	#function [ T ] = getTfromPandRho_exact( p,rho )
+	# getTfromPandRho_exact Compute temperature given pressure and density,
+	# without iterating. With a(T) = K*(alpha - beta*sqrt(T))**2, the PR
+	# pressure is a quadratic in s = sqrt(T):
+	#   A s^2 + B s + C = 0,  D = v^2 + 2 v b - b^2
+	#   A = R/(v-b) - K beta^2/D,  B = 2 K alpha beta/D,  C = -(K alpha^2/D + p)
+	# and the physical root is the positive one (see preos_kernels._T_p).
+
+	shape, p, rho = _buffers(p, rho)
+	T = np.empty_like(p)
+	kernels.temp_p(p, rho, T)
+
+	return T.reshape(shape)
+
+
+def getTfromEandRho(e, rho, T_guess=300.0, stats=None):
 	#function [ T ] = getTfromEandRho( eint,rho )
-	# getTfromEandRho Compute temperature given pressure and density.
+	# getTfromEandRho Compute temperature given internal energy and density.
+	# T_guess is the initial guess of the Newton iteration, e.g. the
+	# temperature of the previous step. The iteration is the one of
+	# tools.newtonSolveT, run cell by cell in preos_kernels.temp_e
 
-	cdef float CRIT = 0.001, R, b
-	#CRIT = 1.0e-2
-	cdef double[:] v, T, e_n, diff, a, dadT,d2adT2, dpdT
-	v = pow(rho, -1)
-	T = 300.0*np.ones(np.size(rho))
-	e_n = getEnergyfromTandRho(T,rho)
-	diff = np.asarray(e_n) - np.asarray(e)
+	shape, e, rho, T = _buffers(e, rho, T_guess)
+	T = T.copy()
+	niter = np.empty(T.shape, dtype=np.intc)
+	kernels.temp_e(e, rho, T, niter)
 
+	call_stats = {'calls': 1, 'cells': niter.size,
+	              'iterations': int(np.abs(niter).max()) if niter.size > 0 else 0,
+	              'cell_iterations': int(np.abs(niter).sum()),
+	              'unconverged': int(np.count_nonzero(niter < 0))}
 
+	for key in call_stats:
+		tools.newton_stats[key] += call_stats[key]
 
-	while (max(abs(diff)) > CRIT):
-		a,b,R,dadT,d2adT2 = getThermo(T)
-		dpdT = {R}/(v-{b}) - {1.0}/(pow(v,2)+{2.0}*v*{b}-{pow(b,2)})*dadT
-		T = np.asarray(T) - (diff/np.asarray(dpdT))
-		e_n = getEnergyfromTandRho(T,rho)
-		diff = np.asarray(e_n) - np.asarray(e)
-	return T
+	if stats is not None:
+		stats.update(call_stats)
+
+	return T.reshape(shape)
 
 
+def _buffers(*args):
+	# broadcast the arguments against each other and return their shape
+	# and the contiguous float64 1D buffers the kernels work on
+	args = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in args])
+	return [args[0].shape] + [np.ascontiguousarray(x).ravel() for x in args]
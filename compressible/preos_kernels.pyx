@@ -0,0 +1,265 @@
+# cython: boundscheck=False, wraparound=False, cdivision=True, language_level=3
+"""
+Compiled Peng-Robinson kernels.  The fluid constants are computed once
+(set_fluid), every state is evaluated with C scalars -- no NumPy
+temporaries -- and the loops run without the GIL, in parallel over the
+rows of 2D buffers (OpenMP prange).
+
+All the kernels take contiguous float64 buffers, 1D or 2D, and write
+into output arrays owned by the caller:
+
+  pres(T, rho, p)             p(T, rho)
+  eint(T, rho, e)             e(T, rho)
+  temp_p(p, rho, T)           T(p, rho), closed form
+  sound(p, rho, c)            c(p, rho)
+  temp_e(e, rho, T, niter)    T(e, rho), Newton; T holds the initial
+                              guess on entry, niter the iterations of
+                              each cell on exit (< 0: not converged)
+
+preos_cy wraps these with its usual array interface.
+"""
+
+from cython.parallel cimport prange
+from libc.math cimport sqrt, log, fabs, isfinite
+
+import numpy as np
+
+
+cdef struct fluid_t:
+    double R, Tc, c, K, b
+    double cp[5]
+    double h5
+
+cdef fluid_t fl
+
+
+def set_fluid(double MW, double Tc, double pc, double omega, coef):
+    """
+    Set the fluid constants.
+
+    Parameters
+    ----------
+    MW : float
+        The molecular weight [kg/mol]
+    Tc, pc : float
+        The critical temperature [K] and pressure [Pa]
+    omega : float
+        The acentric factor
+    coef : sequence
+        The NASA 7-coefficient polynomial of the ideal gas (the first 6
+        coefficients are used)
+
+    """
+    global fl
+    cdef int k
+    fl.R = 8.314/MW
+    fl.Tc = Tc
+    fl.c = 0.37464 + 1.54226*omega - 0.26992*omega**2
+    fl.K = 0.457236*(fl.R*Tc)**2/pc
+    fl.b = 0.077796*fl.R*Tc/pc
+    for k in range(5):
+        fl.cp[k] = coef[k]
+    fl.h5 = coef[5]
+
+
+# N2, as in preos_cy.getThermo
+set_fluid(28.0134e-3, 126.19, 3.3958e+6, 0.03720,
+          [3.531005280E+00,-1.236609870E-04,-5.029994370E-07,2.435306120E-09,
+           -1.408812350E-12,-1.046976280E+03,2.967474680E+00])
+
+
+#------------------------------------------------------------------
+# point functions
+#------------------------------------------------------------------
+cdef inline double _a(double T) nogil:
+    cdef double alpha = 1.0 + fl.c*(1.0 - sqrt(T/fl.Tc))
+    return fl.K*alpha*alpha
+
+cdef inline double _dadT(double T) nogil:
+    cdef double sT = sqrt(T/fl.Tc)
+    return -fl.K*fl.c*(1.0 + fl.c*(1.0 - sT))*sT/T
+
+cdef inline double _d2adT2(double T) nogil:
+    return 0.5*fl.K*fl.c*(1.0 + fl.c)/(T*fl.Tc)*sqrt(fl.Tc/T)
+
+cdef inline double _K1(double v) nogil:
+    cdef double s2 = sqrt(2.0)
+    return 1.0/(2.0*s2*fl.b)*log((v + (1.0 - s2)*fl.b)/(v + (1.0 + s2)*fl.b))
+
+cdef inline double _cv_ideal(double T) nogil:
+    return fl.R*(fl.cp[0] + T*(fl.cp[1] + T*(fl.cp[2] + T*(fl.cp[3] + T*fl.cp[4])))) - fl.R
+
+cdef inline double _p(double T, double rho) nogil:
+    cdef double v = 1.0/rho
+    cdef double b = fl.b
+    return fl.R*T/(v - b) - _a(T)/(v*v + 2.0*v*b - b*b)
+
+cdef inline double _e(double T, double rho) nogil:
+    cdef double h_ideal
+    h_ideal = T*fl.R*(fl.cp[0] + T*(fl.cp[1]/2.0 + T*(fl.cp[2]/3.0 + T*(fl.cp[3]/4.0 + T*fl.cp[4]/5.0)))) \
+        + fl.R*fl.h5
+    return h_ideal - fl.R*T + (_a(T) - T*_dadT(T))*_K1(1.0/rho)
+
+cdef inline double _cv(double T, double rho) nogil:
+    return _cv_ideal(T) - _K1(1.0/rho)*T*_d2adT2(T)
+
+cdef inline double _T_p(double p, double rho) nogil:
+    # p(T, rho) is a quadratic in s = sqrt(T), see preos_cy.getTfromPandRho_exact
+    cdef double v = 1.0/rho
+    cdef double b = fl.b
+    cdef double D = v*v + 2.0*v*b - b*b
+    cdef double alpha = 1.0 + fl.c
+    cdef double beta = fl.c/sqrt(fl.Tc)
+    cdef double A = fl.R/(v - b) - fl.K*beta*beta/D
+    cdef double B = 2.0*fl.K*alpha*beta/D
+    cdef double C = -(fl.K*alpha*alpha/D + p)
+    cdef double s = -2.0*C/(B + sqrt(B*B - 4.0*A*C))
+    return s*s
+
+cdef inline double _c(double p, double rho) nogil:
+    cdef double v = 1.0/rho
+    cdef double b = fl.b
+    cdef double T = _T_p(p, rho)
+    cdef double a = _a(T)
+    cdef double dpdT, dpdv, para, cp, kT, av, ks
+    dpdT = fl.R/(v - b) - _dadT(T)/(v*v + 2.0*v*b - b*b)
+    para = fl.R*T*(v + b)*(v/(v - b) + b/(v + b))**2
+    dpdv = -fl.R*T/((v - b)*(v - b))*(1.0 - 2.0*a/para)
+    cp = _cv_ideal(T) - T*dpdT*dpdT/dpdv - _K1(v)*T*_d2adT2(T)
+    kT = -1.0/(v*dpdv)
+    av = -dpdT/(v*dpdv)
+    ks = kT - v*T*av*av/cp
+    return sqrt(1.0/(rho*ks))
+
+cdef inline int _T_e(double e, double rho, double *T,
+                     double T_min, double T_max, double xtol, int maxiter) noexcept nogil:
+    # safeguarded Newton iteration, as tools.newtonSolveT, for one cell
+    cdef double lo = T_min
+    cdef double hi = T_max
+    cdef double Ti = T[0]
+    cdef double Tn, res
+    cdef int it
+    if not (Ti > T_min and Ti < T_max):
+        Ti = 300.0
+    for it in range(1, maxiter+1):
+        res = _e(Ti, rho) - e
+        if res > 0.0:
+            hi = Ti
+        else:
+            lo = Ti
+        Tn = Ti - res/_cv(Ti, rho)
+        if not isfinite(Tn) or Tn < lo or Tn > hi:
+            Tn = 0.5*(lo + hi)
+        if fabs(Tn - Ti) <= xtol*Ti:
+            T[0] = Tn
+            return it
+        Ti = Tn
+    T[0] = Ti
+    return -maxiter
+
+
+#------------------------------------------------------------------
+# buffer kernels
+#------------------------------------------------------------------
+cdef void _pres2d(const double[:, ::1] T, const double[:, ::1] rho, double[:, ::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in prange(T.shape[0], schedule='static'):
+        for j in range(T.shape[1]):
+            out[i, j] = _p(T[i, j], rho[i, j])
+
+cdef void _eint2d(const double[:, ::1] T, const double[:, ::1] rho, double[:, ::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in prange(T.shape[0], schedule='static'):
+        for j in range(T.shape[1]):
+            out[i, j] = _e(T[i, j], rho[i, j])
+
+cdef void _temp_p2d(const double[:, ::1] p, const double[:, ::1] rho, double[:, ::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in prange(p.shape[0], schedule='static'):
+        for j in range(p.shape[1]):
+            out[i, j] = _T_p(p[i, j], rho[i, j])
+
+cdef void _sound2d(const double[:, ::1] p, const double[:, ::1] rho, double[:, ::1] out) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in prange(p.shape[0], schedule='static'):
+        for j in range(p.shape[1]):
+            out[i, j] = _c(p[i, j], rho[i, j])
+
+cdef void _temp_e2d(const double[:, ::1] e, const double[:, ::1] rho, double[:, ::1] T,
+                    int[:, ::1] niter, double T_min, double T_max,
+                    double xtol, int maxiter) noexcept nogil:
+    cdef Py_ssize_t i, j
+    for i in prange(e.shape[0], schedule='dynamic'):
+        for j in range(e.shape[1]):
+            niter[i, j] = _T_e(e[i, j], rho[i, j], &T[i, j],
+                               T_min, T_max, xtol, maxiter)
+
+
+def _as2d(x):
+    """ view a contiguous 1D or 2D buffer as 2D, without copying """
+    if x.ndim == 1:
+        return x.reshape(1, -1)
+    return x
+
+def _rows(x):
+    """
+    view a buffer as a number of rows that prange can share out (a 1D
+    buffer would otherwise be a single row)
+    """
+    n = x.size
+    for nrow in [64, 16, 4, 1]:
+        if n % nrow == 0 and n >= 64*nrow:
+            return x.reshape(nrow, -1)
+    return _as2d(x)
+
+
+def pres(T, rho, p):
+    """ p(T, rho) into p """
+    cdef const double[:, ::1] T_ = _rows(T)
+    cdef const double[:, ::1] rho_ = _rows(rho)
+    cdef double[:, ::1] p_ = _rows(p)
+    with nogil:
+        _pres2d(T_, rho_, p_)
+    return p
+
+def eint(T, rho, e):
+    """ e(T, rho) into e """
+    cdef const double[:, ::1] T_ = _rows(T)
+    cdef const double[:, ::1] rho_ = _rows(rho)
+    cdef double[:, ::1] e_ = _rows(e)
+    with nogil:
+        _eint2d(T_, rho_, e_)
+    return e
+
+def temp_p(p, rho, T):
+    """ T(p, rho) into T """
+    cdef const double[:, ::1] p_ = _rows(p)
+    cdef const double[:, ::1] rho_ = _rows(rho)
+    cdef double[:, ::1] T_ = _rows(T)
+    with nogil:
+        _temp_p2d(p_, rho_, T_)
+    return T
+
+def sound(p, rho, c):
+    """ c(p, rho) into c """
+    cdef const double[:, ::1] p_ = _rows(p)
+    cdef const double[:, ::1] rho_ = _rows(rho)
+    cdef double[:, ::1] c_ = _rows(c)
+    with nogil:
+        _sound2d(p_, rho_, c_)
+    return c
+
+def temp_e(e, rho, T, niter, double T_min=20.0, double T_max=1.0e4,
+           double xtol=1.0e-10, int maxiter=50):
+    """
+    T(e, rho) into T, which holds the initial guess on entry.  niter
+    (int32) receives the number of iterations of each cell, negative
+    where the iteration did not converge.
+    """
+    cdef const double[:, ::1] e_ = _rows(e)
+    cdef const double[:, ::1] rho_ = _rows(rho)
+    cdef double[:, ::1] T_ = _rows(T)
+    cdef int[:, ::1] n_ = _rows(niter)
+    with nogil:
+        _temp_e2d(e_, rho_, T_, n_, T_min, T_max, xtol, maxiter)
+    return T
@@ -4,10 +4,10 @@
 '''
 import numpy as np
 import thermodynamics_tools as tools
+import compressible.species_db as species_db
 import pdb
 from pdb import set_trace as keyboard
 import matplotlib.pyplot as plt
-from CoolProp.CoolProp import PropsSI
 
 class peng_robinson_fluid():
     '''
@@ -69,7 +69,7 @@ class peng_robinson_fluid():
 
       # get critical properties of single species
       #critProp_db   = setup.settings['path_crit_prop_database']
-      critProp_db   = '/home/administrator/pyro2/compressible/databases/thermodynamic_CritPropDatabase.dat'
+      critProp_db   = species_db.crit_db
       MW,Pcrit,Tcrit, rhocrit,omega = tools.readCritPropDatabase(critProp_db,self.species)
       self.MW       = MW
       self.RoM      = self.Rcst/self.MW
@@ -82,7 +82,7 @@ class peng_robinson_fluid():
 
      # get NASA polynomials
       #NASA_db             = setup.settings['path_NASA_poly_database']
-      NASA_db             = '/home/administrator/pyro2/compressible/databases/thermodynamic_NASAdatabase.xml'
+      NASA_db             = species_db.nasa_db
       outArray            = tools.parse_database_xml(NASA_db,self.species)
       self.NASAbounds     = np.array(outArray[0])
       self.NASAcoeff      = [None]*(self.Nxc)
@@ -233,23 +233,13 @@ class peng_robinson_fluid():
 
 
     def getDensityfromPressureTemperature(self,P_in,T_in):
-      ''' Computes the density from the pressure and temperature.
+      ''' Computes the density from the pressure and temperature, for all
+         the cells at once (see tools.getCompressibilityPR).
          The values of A and B must be updated before!!!'''
-      R     = self.Rcst
-      A     = self.A
-      B     = self.B
-      Nxc   = np.size(T_in)
-      ones  = np.ones(Nxc)
-      rho   = np.ones(Nxc)
-      coef_a = ones
-      coef_b = B*ones - R * T_in/P_in
-      coef_c = - 2.0* B * R * T_in/P_in  +  A/P_in - 3*B**2*ones
-      coef_d = B**2*R*T_in/P_in + B**3*ones - A*B/P_in
-      # for ii in range(Nxc):
-      #   roots = tools.cubicSolver(coef_a[ii],coef_b[ii],coef_c[ii],coef_d[ii])
-      #   v     = roots[0]
-      #   rho[ii] = tools.getRhofromV(v,self.MW)   
-      rho = PropsSI('DMASS', 'P', P_in, 'T', T_in, 'Oxygen')
+      RT    = self.Rcst*T_in
+      Z     = tools.getCompressibilityPR(self.A*P_in/RT**2, self.B*P_in/RT)
+      v     = Z*RT/P_in
+      rho   = tools.getRhofromV(v,self.MW)
       return rho
 
     def getTemperature(self,rho,p):
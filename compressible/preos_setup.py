@@ -1,6 +1,12 @@
 from distutils.core import setup
+from distutils.extension import Extension
 from Cython.Build import cythonize
 
+# the kernels are parallelized with OpenMP (prange)
+kernels = Extension("preos_kernels", ["preos_kernels.pyx"],
+                    extra_compile_args=["-O3", "-fopenmp"],
+                    extra_link_args=["-fopenmp"])
+
 setup(
-    ext_modules = cythonize("preos_cy.pyx")
-)
\ No newline at end of file
+    ext_modules = cythonize(["preos_cy.pyx", kernels])
+)
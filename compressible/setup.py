@@ -6,8 +6,10 @@ from numpy.distutils.core import setup, Extension
 
 extra_link_args=[]
 
+# preos.f90 holds the pr_eos module used by interface_f.f90, so it is
+# compiled first
 ext = Extension("interface_f", 
-                ["interface_f.f90"])
+                ["preos.f90", "interface_f.f90"])
 
 setup(ext_modules=[ext])
 
@@ -145,6 +145,9 @@ class Simulation(NullSimulation):
 
         self.ivars = Variables(my_data)
 
+        # set up the equation of state (this may build an EOS table)
+        eos.init(self.rp, self.tc)
+
         # derived variables
         self.cc_data.add_derived(derives.derive_primitives)
 
@@ -221,17 +224,41 @@ class Simulation(NullSimulation):
 
         method = self.rp.get_param("compressible.temporal_method")
 
+        double_flux = self.rp.get_param("compressible.double_flux")
+
         rk = integration.RKIntegrator(myd.t, self.dt, method=method)
         rk.set_start(myd)
 
+        # with the double-flux model, the EOS is frozen once for all
+        # the stages, which then make no EOS calls, and the energy is
+        # brought back to the real EOS at the end of the step
+        frozen = None
+        if double_flux:
+            myd.fill_BC_all()
+            frozen = flx.double_flux_fields(
+                myd, np.float32 if self.rp.get_param("eos.float32") else np.float64)
+
         for s in range(rk.nstages()):
             ytmp = rk.get_stage_start(s)
             ytmp.fill_BC_all()
-            k = self.substep(ytmp)
+            k = self.substep(ytmp, frozen)
             rk.store_increment(s, k)
 
         rk.compute_final_update()
 
+        if double_flux:
+            flx.reset_energy(myd, frozen, self.ivars)
+
+        # the cells near or inside the saturation dome this step
+        index = eos.get_backend().phase_index
+        if index is not None:
+            # the empty cells of the solids (dens < 0.1) are left out
+            valid = dens.v() >= 0.1
+            d = dens.v()[valid]
+            ekin = 0.5*(myd.get_var("x-momentum").v()[valid]**2 +
+                        myd.get_var("y-momentum").v()[valid]**2)/d
+            index.end_step(d, (ener.v()[valid] - ekin)/d)
+
         # increment the time
         self.cc_data.t += self.dt
         self.n += 1
@@ -345,10 +372,12 @@ class Simulation(NullSimulation):
         plt.pause(0.001)
         plt.draw()
 
-    def substep(self, myd):
+    def substep(self, myd, frozen=None):
         """
         take a single substep in the RK timestepping starting with the 
-        conservative state defined as part of myd
+        conservative state defined as part of myd.  frozen holds the
+        double-flux fields of the step (see unsplit_fluxes.py), if the
+        double-flux model is used
         """
 
         myg = myd.grid
@@ -366,13 +395,28 @@ class Simulation(NullSimulation):
 
         k = myg.scratch_array(nvar=self.ivars.nvar)
 
-        flux_x, flux_y = flx.unsplit_fluxes(self.cc_data, self.aux_data, self.rp,
-                                            self.ivars, self.solid, self.tc, self.dt)
+        # the double-flux stages take their fluxes from the stage state;
+        # the default path keeps the fluxes of the start of the step, as
+        # it always has
+        state = myd if frozen is not None else self.cc_data
+
+        flux_x, flux_y = flx.unsplit_fluxes(state, self.aux_data, self.rp,
+                                            self.ivars, self.solid, self.tc, self.dt,
+                                            frozen)
+
+        # with the double-flux model, a cell takes the flux of its own
+        # frozen EOS on either face
+        if frozen is not None:
+            flux_x_lo, flux_x_hi = flux_x
+            flux_y_lo, flux_y_hi = flux_y
+        else:
+            flux_x_lo = flux_x_hi = flux_x
+            flux_y_lo = flux_y_hi = flux_y
 
         for n in range(self.ivars.nvar):
             k.v(n=n)[:,:] = \
-               (flux_x.v(n=n) - flux_x.ip(1, n=n))/myg.dx + \
-               (flux_y.v(n=n) - flux_y.jp(1, n=n))/myg.dy
+               (flux_x_hi.v(n=n) - flux_x_lo.ip(1, n=n))/myg.dx + \
+               (flux_y_hi.v(n=n) - flux_y_lo.jp(1, n=n))/myg.dy
 
         k.v(n=self.ivars.iymom)[:,:] += ymom_src.v()[:,:]
         k.v(n=self.ivars.iener)[:,:] += E_src.v()[:,:]
@@ -0,0 +1,280 @@
+"""
+A compiled database of the species properties.  The critical properties
+of databases/thermodynamic_CritPropDatabase.dat and the NASA
+polynomials of databases/thermodynamic_NASAdatabase.xml are parsed once,
+for all the species at once, into a NumPy structured array of dtype
+
+  name       the species name (as in the databases)
+  MW         molar weight [g/mol] (from the atoms of the NASA
+             database if the critical property database has none)
+  pcrit      critical pressure [Pa]
+  Tcrit      critical temperature [K]
+  rhocrit    critical density [kg/m^3]
+  omega      acentric factor
+  dipole     dipole moment [debye]
+  crit       whether the species is flagged as having critical
+             properties
+  nasa       whether the (2 range, 7 coefficient) NASA polynomials
+             are known
+  Tbounds    the temperature bounds of the low and high T polynomials
+  lowT       the low temperature NASA coefficients
+  highT      the high temperature NASA coefficients
+
+which is saved as a .npy file in cache_dir and reused as long as the
+source databases are unchanged (same size and modification time).  The
+array and a dict index by species name are kept in memory, so looking
+a species up after the first time costs a dict access:
+
+  MW, pcrit, Tcrit, rhocrit, omega = species_db.crit_props("O2")
+  Tbounds, lowT, highT = species_db.nasa_polynomials("O2")
+
+Species names are matched exactly first, then regardless of case.
+"""
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import tempfile
+from xml.etree import ElementTree
+
+import numpy as np
+
+from util import msg
+
+
+# the source databases shipped with the solver
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "databases")
+
+crit_db = os.path.join(path, "thermodynamic_CritPropDatabase.dat")
+nasa_db = os.path.join(path, "thermodynamic_NASAdatabase.xml")
+
+# where the compiled databases are kept
+cache_dir = os.path.join("~", ".cache", "eos_tables")
+
+# bump this when the layout of the compiled database changes
+FORMAT_VERSION = 1
+
+dtype = np.dtype([("name", "U16"),
+                  ("MW", "f8"), ("pcrit", "f8"), ("Tcrit", "f8"),
+                  ("rhocrit", "f8"), ("omega", "f8"), ("dipole", "f8"),
+                  ("crit", "?"), ("nasa", "?"),
+                  ("Tbounds", "f8", (4,)),
+                  ("lowT", "f8", (7,)), ("highT", "f8", (7,))])
+
+# the NASA polynomials that are not in the xml database
+extra_nasa = {
+    "C12H26": ([200., 1000., 1000., 3500.],
+               [3.70187925E+01, 5.54721488E-02, -1.92079548E-05, 3.08175574E-09,
+                -1.84800617E-13, -5.26984458E+04, -1.61453501E+02],
+               [2.13264480E+01, -3.86394002E-02, 3.99476113E-04, -5.06681097E-07,
+                2.00697878E-10, -4.22475053E+04, -4.85848300E+01]),
+    "R134a": ([200., 1000., 1000., 6000.],
+              [2.29239681, 0.030310848, -5.33714E-6, -2.19457E-8,
+               1.2997E-11, -111790.431, 16.2830568],
+              [12.5551115, 0.008401861, -3.12077E-6, 5.12285E-10,
+               -3.1011E-14, -114846.319, -38.0374329])}
+
+# the atomic weights [g/mol] of the elements of the NASA database
+atomic_weights = {"H": 1.008, "C": 12.011, "N": 14.007, "O": 15.999, "Ar": 39.948}
+
+# the compiled databases in memory, by (crit_path, nasa_path): the
+# array and its index by name
+_loaded = {}
+
+
+def _parse_crit(crit_path):
+    """
+    all the species of the critical property database: a dict of
+    name -> (crit, pcrit, Tcrit, rhocrit, omega, dipole, MW), in the
+    order of the file
+    """
+    species = {}
+    with open(crit_path, "r") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            s = line.split()
+            vals = [float(x) for x in s[2:8]]
+            vals += [np.nan]*(6 - len(vals))
+            species[s[0]] = (int(s[1]) != 0,) + tuple(vals)
+    return species
+
+
+def _parse_nasa(nasa_path):
+    """
+    all the species of the NASA polynomial database: a dict of name ->
+    (Tbounds, lowT, highT), for the species with the 2 range, 7
+    coefficient polynomials, and a dict of name -> MW from the atoms
+    """
+    species = {}
+    MW = {}
+    document = ElementTree.parse(nasa_path)
+    for specie in document.findall(".//species"):
+        atoms = specie.find("atomArray")
+        if atoms is not None and atoms.text is not None:
+            try:
+                MW[specie.attrib.get("name")] = sum(
+                    atomic_weights[a.split(":")[0]]*float(a.split(":")[1])
+                    for a in atoms.text.split())
+            except (KeyError, IndexError, ValueError):
+                pass
+
+        thermo = specie.find("thermo")
+        if thermo is None:
+            continue
+        ranges = thermo.findall("NASA")
+        if len(ranges) != 2:
+            continue
+        Tbounds = [float(ranges[0].attrib.get("Tmin")), float(ranges[0].attrib.get("Tmax")),
+                   float(ranges[1].attrib.get("Tmin")), float(ranges[1].attrib.get("Tmax"))]
+        coeffs = [[float(x) for x in r[0].text.replace("\n", "").split(",")]
+                  for r in ranges]
+        species[specie.attrib.get("name")] = (Tbounds, coeffs[0], coeffs[1])
+    return species, MW
+
+
+def compile_database(crit_path=crit_db, nasa_path=nasa_db):
+    """
+    Parse the two source databases into the structured array of all
+    the species (see the module docstring).
+
+    Parameters
+    ----------
+    crit_path : str, optional
+        The critical property database
+    nasa_path : str, optional
+        The NASA polynomial database (xml)
+
+    Returns
+    -------
+    out : ndarray
+        The species, of dtype species_db.dtype
+
+    """
+
+    crit = _parse_crit(crit_path)
+    nasa, MW = _parse_nasa(nasa_path)
+    nasa.update(extra_nasa)
+
+    names = list(crit) + [n for n in nasa if n not in crit]
+
+    db = np.zeros(len(names), dtype=dtype)
+    for n, name in enumerate(names):
+        rec = db[n]
+        rec["name"] = name
+        rec["MW"] = rec["pcrit"] = rec["Tcrit"] = rec["rhocrit"] = np.nan
+        rec["omega"] = rec["dipole"] = np.nan
+
+        if name in crit:
+            c = crit[name]
+            rec["crit"] = c[0]
+            rec["pcrit"], rec["Tcrit"], rec["rhocrit"], rec["omega"], \
+                rec["dipole"], rec["MW"] = c[1:]
+
+        if np.isnan(rec["MW"]) and name in MW:
+            rec["MW"] = MW[name]
+
+        if name in nasa:
+            rec["nasa"] = True
+            rec["Tbounds"], rec["lowT"], rec["highT"] = nasa[name]
+
+    return db
+
+
+def _key(crit_path, nasa_path):
+    """ the hash identifying the compiled database of the two sources """
+    src = []
+    for p in [crit_path, nasa_path]:
+        st = os.stat(p)
+        src.append([os.path.abspath(p), st.st_size, st.st_mtime_ns])
+    return hashlib.sha1(json.dumps([FORMAT_VERSION, src]).encode()).hexdigest()
+
+
+def load(crit_path=None, nasa_path=None, cache_dir=cache_dir):
+    """
+    The compiled database of the two sources (the default databases if
+    None) and its index by name.  It is taken from memory, else from
+    cache_dir, else compiled and saved to cache_dir.
+
+    Returns
+    -------
+    out : ndarray, dict
+        The species and the index of each name in it
+
+    """
+
+    crit_path = crit_db if crit_path is None else crit_path
+    nasa_path = nasa_db if nasa_path is None else nasa_path
+
+    loaded = _loaded.get((crit_path, nasa_path))
+    if loaded is not None:
+        return loaded
+
+    key = _key(crit_path, nasa_path)
+    cache_dir = os.path.expanduser(cache_dir)
+    fname = os.path.join(cache_dir, "species_db_{}.npy".format(key[:16]))
+
+    db = None
+    if os.path.isfile(fname):
+        try:
+            db = np.load(fname, allow_pickle=False)
+        except (ValueError, OSError):
+            db = None
+        if db is not None and db.dtype != dtype:
+            db = None
+
+    if db is None:
+        db = compile_database(crit_path, nasa_path)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, db, allow_pickle=False)
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, fname)
+        except OSError as e:
+            msg.warning("species database not cached: {}".format(e))
+
+    index = {str(name): n for n, name in enumerate(db["name"])}
+    for n, name in enumerate(db["name"]):
+        index.setdefault(str(name).lower(), n)
+
+    _loaded[(crit_path, nasa_path)] = db, index
+    return db, index
+
+
+def lookup(name, crit_path=None, nasa_path=None):
+    """ the record of the species name (see load for the paths) """
+    db, index = load(crit_path, nasa_path)
+    n = index.get(name)
+    if n is None:
+        n = index.get(name.lower())
+    if n is None:
+        msg.fail("ERROR: species {} was not found in the database".format(name))
+    return db[n]
+
+
+def crit_props(name, crit_path=None, nasa_path=None):
+    """
+    MW [g/mol], pcrit [Pa], Tcrit [K], rhocrit [kg/m^3] and the
+    acentric factor of the species name
+    """
+    rec = lookup(name, crit_path, nasa_path)
+    if np.isnan(rec["pcrit"]) or np.isnan(rec["MW"]):
+        msg.fail("ERROR: no critical properties for species {}".format(name))
+    return (float(rec["MW"]), float(rec["pcrit"]), float(rec["Tcrit"]),
+            float(rec["rhocrit"]), float(rec["omega"]))
+
+
+def nasa_polynomials(name, crit_path=None, nasa_path=None):
+    """
+    the temperature bounds and the low and high temperature NASA
+    polynomial coefficients of the species name
+    """
+    rec = lookup(name, crit_path, nasa_path)
+    if not rec["nasa"]:
+        msg.fail("ERROR: no NASA polynomials for species {}".format(name))
+    return rec["Tbounds"].copy(), rec["lowT"].copy(), rec["highT"].copy()
@@ -1,17 +1,23 @@
-import compressible.eos as eos
+import numpy as np
+from numpy.testing import assert_allclose
 
-def test_eos_consistency():
+import compressible.eos as eos
+import compressible.eos_backends as eos_backends
 
-    dens = 1.0
-    eint = 1.0
-    gamma = 1.4
 
-    p = eos.pres(gamma, dens, eint)
+def test_eos_consistency():
 
-    dens_eos = eos.dens(gamma, p, eint)
+    backend = eos.get_backend()
+    eos.set_backend(eos_backends.get_backend("ideal", "Nitrogen"))
 
-    assert dens == dens_eos
+    try:
+        dens = np.array([1.0, 2.5, 10.0])
+        eint = np.array([1.0, 3.0e5, 7.0e5])
 
-    rhoe_eos = eos.rhoe(gamma, p)
+        p = eos.pres(dens, eint)
+        assert_allclose(p, 0.4*dens*eint, rtol=1.e-14)
 
-    assert dens*eint == rhoe_eos
+        assert_allclose(eos.dens(p, eint), dens, rtol=1.e-14)
+        assert_allclose(eos.rhoe(dens, p), dens*eint, rtol=1.e-14)
+    finally:
+        eos.set_backend(backend)
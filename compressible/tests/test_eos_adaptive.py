@@ -0,0 +1,34 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+import compressible.eos_adaptive as eos_adaptive
+
+
+def front_props(dens, eint, cv=717.0):
+    # an ideal gas whose temperature has a sharp front across a line in
+    # (log rho, e), like the pseudo-critical line
+    p = 0.4*dens*eint
+    T = eint/cv*(1.5 + 0.5*np.tanh((eint - 2.0e5*np.log(dens) - 3.0e5)/1.e4))
+    return p, T, np.sqrt(1.4*p/dens)
+
+
+def test_adaptive_table():
+
+    tab = eos_adaptive.build_adaptive_table(front_props, 1.0, 10.0, 1.0e5, 1.0e6,
+                                            tol=1.e-4, nblock=(4, 4), m=4,
+                                            max_level=8, report=False)
+
+    # the blocks are only refined along the front
+    assert tab.max_level > 2
+    assert tab.nblocks < 0.1*(4*4*2**tab.max_level)**2
+
+    rng = np.random.RandomState(0)
+    dens = np.exp(rng.uniform(0.0, np.log(10.0), 1000))
+    eint = rng.uniform(1.0e5, 1.0e6, 1000)
+
+    p, T, c = front_props(dens, eint)
+    tp, tT, tc, tg = tab.lookup(dens, eint)
+
+    assert_allclose(tp, p, rtol=1.e-3)
+    assert_allclose(tT, T, rtol=1.e-3)
+    assert_allclose(tab.eint(dens, tp), eint, rtol=1.e-10)
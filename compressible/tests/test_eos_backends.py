@@ -0,0 +1,62 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+import compressible.eos_backends as eos_backends
+
+
+def test_backend_interface():
+
+    dens = np.array([[1.3, 2.7], [5.55, 9.9]])
+    eint = np.array([[1.2e5, 3.3e5], [7.1e5, 9.9e5]])
+
+    for name in ["ideal", "pr_python"]:
+        eos = eos_backends.get_backend(name, "Nitrogen")
+
+        p, T, c, gamma = eos.state(dens, eint)
+
+        assert_allclose(eos.pres(dens, eint), p, rtol=1.e-10)
+        assert_allclose(eos.rhoe(dens, p), dens*eint, rtol=1.e-8)
+        assert_allclose(eos.sound(p, dens), c, rtol=1.e-8)
+        assert_allclose(gamma, c**2*dens/p, rtol=1.e-12)
+
+
+def test_backend_derivs():
+
+    dens = np.array([[1.3, 2.7], [5.55, 9.9]])
+    eint = np.array([[1.2e5, 3.3e5], [7.1e5, 9.9e5]])
+
+    for name in ["ideal", "pr_python"]:
+        eos = eos_backends.get_backend(name, "Nitrogen")
+
+        p, T, c, gamma, dpdrho, dpde = eos.thermo(dens, eint)
+
+        # c^2 = (dp/drho)_e + p/rho^2 (dp/de)_rho
+        assert_allclose(dpdrho + p/dens**2*dpde, c**2, rtol=1.e-8)
+
+        # against centered differences of the pressure
+        h = 1.e-6
+        assert_allclose(dpdrho, (eos.pres(dens*(1 + h), eint) -
+                                 eos.pres(dens*(1 - h), eint))/(2*h*dens), rtol=1.e-5)
+        assert_allclose(dpde, (eos.pres(dens, eint*(1 + h)) -
+                               eos.pres(dens, eint*(1 - h)))/(2*h*eint), rtol=1.e-5)
+
+
+def test_coolprop_vector_path():
+
+    eos = eos_backends.get_backend("coolprop", "Nitrogen")
+
+    dens = np.linspace(1.0, 50.0, 2*eos.vector_min)
+    eint = np.linspace(2.e5, 4.e5, dens.size)
+    dens[:3] = 0.0
+
+    vector = eos.thermo(dens, eint)
+    single = [np.concatenate(q) for q in
+              zip(*[eos.thermo(dens[i:i+1], eint[i:i+1]) for i in range(dens.size)])]
+
+    for q_v, q_s in zip(vector, single):
+        assert_allclose(q_v, q_s, rtol=1.e-12)
+
+    # the empty cells are masked
+    p = vector[0]
+    assert np.all(p[:3] == 0.0)
+    assert np.all(eos.sound(p, dens)[:3] == 0.0)
@@ -0,0 +1,26 @@
+import json
+
+import compressible.eos_benchmark as eos_benchmark
+
+
+def test_bench_backends(tmp_path):
+
+    path = str(tmp_path / "bench.json")
+    result = eos_benchmark.bench_backends(["ideal"], "Nitrogen", reference="ideal",
+                                          sizes=[1, 10, 100], nrepeat=1, nsample=100,
+                                          max_time=0.0, path=path, report=False)
+
+    with open(path) as f:
+        assert json.load(f) == result
+
+    bench = result["backends"]["ideal"]
+    for name, _ in eos_benchmark.entry_points:
+        # the backend is its own reference
+        assert bench["errors"][name]["max_rel"] < 1.e-12
+        assert bench["errors"][name]["nonfinite"] == 0
+
+        # with max_time = 0, only the first size is timed
+        timings = bench["timings"][name]
+        assert [t["n"] for t in timings] == [1, 10, 100]
+        assert timings[0]["time"] is not None
+        assert all(t["skipped"] for t in timings[1:])
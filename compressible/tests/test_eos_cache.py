@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+import compressible.eos_cache as eos_cache
+
+
+def ideal_pres(dens, eint, gamma=1.4):
+    return (gamma - 1.0)*dens*eint
+
+
+def test_memoized_eos():
+
+    c = eos_cache.MemoizedEOS(ideal_pres, rtol=1.e-10, maxsize=8)
+
+    # a uniform state with a single different cell
+    dens = np.ones((6, 5))
+    eint = np.full((6, 5), 2.5e5)
+    dens[2, 3] = 3.0
+
+    assert_allclose(c(dens, eint), ideal_pres(dens, eint), rtol=1.e-9)
+    assert c.stats["evaluated"] == 2
+
+    # the second call is served from the store
+    assert_allclose(c(dens, eint), ideal_pres(dens, eint), rtol=1.e-9)
+    assert c.stats["evaluated"] == 2
+    assert c.stats["hits"] == 2
+
+    # the store is bounded
+    dens = np.linspace(1.0, 2.0, 20)
+    assert_allclose(c(dens, 1.e5), ideal_pres(dens, 1.e5), rtol=1.e-9)
+    assert len(c.store) == 8
+
+
+def test_memoized_eos_rtol():
+
+    for rtol in [0.0, -1.e-8, 1.e-20, 1.0]:
+        with pytest.raises(SystemExit):
+            eos_cache.MemoizedEOS(lambda a: a, rtol=rtol)
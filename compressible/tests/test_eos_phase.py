@@ -0,0 +1,47 @@
+import numpy as np
+
+import CoolProp.CoolProp as CP
+
+import compressible.eos_phase as eos_phase
+
+
+def test_phase_index():
+
+    index = eos_phase.build_phase_index("Nitrogen", margin=0.05)
+
+    # random states, their phase from CoolProp
+    AS = CP.AbstractState("HEOS", "Nitrogen")
+    rng = np.random.RandomState(1)
+    dens = rng.uniform(1.0, 800.0, 4000)
+    T = rng.uniform(65.0, 300.0, 4000)
+
+    eint = np.full(dens.shape, np.nan)
+    Q = np.full(dens.shape, -1.0)
+    for i in range(dens.size):
+        try:
+            AS.update(CP.DmassT_INPUTS, dens[i], T[i])
+        except ValueError:
+            continue
+        eint[i], Q[i] = AS.umass(), AS.Q()
+
+    ok = np.isfinite(eint)
+    cls = index.classify(dens[ok], eint[ok])
+    two_phase = (Q[ok] >= 0.0) & (Q[ok] <= 1.0)
+
+    # no two-phase state is taken for a single-phase one, and the
+    # two-phase states are all inside the binodal
+    assert two_phase.sum() > 100
+    assert np.all(cls[two_phase] >= eos_phase.METASTABLE)
+
+    # the supercritical states far from the dome are all FAR
+    hot = T[ok] > 200.0
+    assert np.all(cls[hot] == eos_phase.FAR)
+    assert np.count_nonzero(cls[~two_phase] == eos_phase.NEAR) > 0
+
+    assert index.stats["cells"] == ok.sum()
+    assert index.stats["far"] + index.stats["near"] + index.stats["metastable"] + \
+        index.stats["unstable"] == ok.sum()
+
+    index.end_step(dens[ok], eint[ok])
+    assert index.steps[-1][eos_phase.UNSTABLE] == np.count_nonzero(cls == eos_phase.UNSTABLE)
+    assert len(index.report()) == 2
@@ -0,0 +1,33 @@
+import numpy as np
+
+import compressible.eos_backends as eos_backends
+import compressible.eos_profile as eos_profile
+
+
+def test_profile_call_sites():
+
+    dens = np.array([[1.3, 2.7], [5.55, 9.9]])
+    eint = np.array([[1.2e5, 3.3e5], [7.1e5, 9.9e5]])
+
+    backend = eos_backends.get_backend("pr_python", "Nitrogen")
+    profile = eos_profile.EOSProfile()
+    pres = profile.wrap(backend.pres, "pres")
+    sound = profile.wrap(backend.sound, "sound")
+
+    for _ in range(3):
+        p = pres(dens, eint)
+    sound(p, dens)
+    sound(p[0], dens[0])
+
+    # the two sound calls are on different lines
+    stats = sorted(profile.stats.items(), key=lambda x: x[0][1][2])
+    assert [(name, s[0], s[1]) for (name, _), s in stats] == \
+        [("pres", 3, 12), ("sound", 1, 4), ("sound", 1, 2)]
+
+    # the PR pressure solves T(e, rho), the sound speed does not
+    assert stats[0][1][2] > 0
+    assert stats[1][1][2] == 0
+
+    totals = profile.totals()
+    assert totals["sound"][:2] == [2, 6]
+    assert len(profile.report()) == 1 + 3 + 2 + 1
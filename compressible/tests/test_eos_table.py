@@ -0,0 +1,125 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+import compressible.eos_table as eos_table
+
+
+def ideal_props(dens, eint, gamma=1.4, cv=717.0):
+    p = (gamma - 1.0)*dens*eint
+    return p, eint/cv, np.sqrt(gamma*p/dens)
+
+
+def test_table_interpolation():
+
+    for interp in ["bilinear", "bicubic"]:
+        tab = eos_table.build_table(ideal_props, 1.0, 10.0, 19, 1.0e5, 1.0e6, 37,
+                                    interp=interp, report=False)
+
+        dens = np.array([[1.3, 2.7], [5.55, 9.9]])
+        eint = np.array([[1.2e5, 3.3e5], [7.1e5, 9.9e5]])
+
+        p, T, c = ideal_props(dens, eint)
+
+        # p and T are bilinear in (rho, e), so both schemes are exact
+        assert_allclose(tab.pres(dens, eint), p, rtol=1.e-12)
+        assert_allclose(tab.temp(dens, eint), T, rtol=1.e-12)
+        assert_allclose(tab.sound(dens, eint), c, rtol=1.e-3)
+        assert_allclose(tab.gamma(dens, eint), 1.4, rtol=1.e-12)
+
+
+def test_table_inverse():
+
+    tab = eos_table.build_table(ideal_props, 1.0, 10.0, 19, 1.0e5, 1.0e6, 37,
+                                report=False)
+
+    dens = np.array([1.3, 2.7, 5.55, 9.9])
+    eint = np.array([1.2e5, 3.3e5, 7.1e5, 9.9e5])
+
+    p = tab.pres(dens, eint)
+    assert_allclose(tab.eint(dens, p), eint, rtol=1.e-12)
+
+    # a flat pressure segment gives its midpoint
+    tab.data["p"][:, -1] = tab.data["p"][:, -2]
+    e = tab.eint(np.array([1.0]), 2.0*tab.data["p"][:1, -1])
+    assert_allclose(e, tab.e_max - 0.5*tab.de, rtol=1.e-12)
+
+
+def test_inverse_table():
+
+    tab = eos_table.build_table(ideal_props, 1.0, 10.0, 19, 1.0e5, 1.0e6, 37,
+                                report=False)
+    inv = eos_table.InverseTable(tab, 19, 33)
+
+    dens = np.array([1.3, 2.7, 5.55, 9.9])
+    eint = np.array([1.2e5, 3.3e5, 7.1e5, 9.9e5])
+
+    # the ideal gas e is linear along the rows of constant p fraction, so
+    # the round trip is exact
+    p = tab.pres(dens, eint)
+    assert_allclose(inv.eint(dens, p), eint, rtol=1.e-12)
+    assert_allclose(inv.sound(dens, p), ideal_props(dens, eint)[2], rtol=5.e-3)
+
+    err = inv.roundtrip_report(tab, report=False)
+    assert err["e"][0] < 1.e-12 and err["p"][0] < 1.e-12
+
+
+def test_table_cache(tmp_path):
+
+    calls = []
+
+    def props(dens, eint):
+        calls.append(dens.size)
+        return ideal_props(dens, eint)
+
+    args = (props, {"backend": "ideal"}, str(tmp_path), 1.0, 10.0, 19, 1.0e5, 1.0e6, 37)
+
+    tab = eos_table.cached_table(*args, report=False)
+    assert len(calls) == 1
+
+    # the second time, the table is read from the cache
+    tab2 = eos_table.cached_table(*args, report=False)
+    assert len(calls) == 1
+    assert not tab2.data["p"].flags.writeable
+
+    dens = np.array([1.3, 2.7, 5.55, 9.9])
+    eint = np.array([1.2e5, 3.3e5, 7.1e5, 9.9e5])
+    for a, b in zip(tab.lookup(dens, eint), tab2.lookup(dens, eint)):
+        assert_allclose(a, b, rtol=0.0)
+
+
+def test_table_parallel():
+
+    serial = eos_table.build_table(ideal_props, 1.0, 10.0, 19, 1.0e5, 1.0e6, 37,
+                                   report=False)
+    parallel = eos_table.build_table(ideal_props, 1.0, 10.0, 19, 1.0e5, 1.0e6, 37,
+                                     report=False, nworkers=2)
+
+    for n in serial.fields:
+        assert_allclose(parallel.data[n], serial.data[n], rtol=0.0)
+
+
+def test_table_float32(tmp_path):
+
+    args = (ideal_props, {"backend": "ideal"}, str(tmp_path), 1.0, 10.0, 19, 1.0e5, 1.0e6, 37)
+
+    tab = eos_table.cached_table(*args, report=False)
+    tab32 = eos_table.cached_table(*args, report=False, dtype=np.float32)
+
+    # a table file of each precision, the float32 one half the size
+    assert len(list(tmp_path.glob("eos_table_*.bin"))) == 2
+    assert tab32.data["p"].dtype == np.float32
+    assert tab32.nbytes == tab.nbytes//2
+
+    # the lookups are still float64, within float32 round-off
+    dens = np.array([1.3, 2.7, 5.55, 9.9])
+    eint = np.array([1.2e5, 3.3e5, 7.1e5, 9.9e5])
+    for a, b in zip(tab32.lookup(dens, eint), tab.lookup(dens, eint)):
+        assert a.dtype == np.float64
+        assert_allclose(a, b, rtol=1.e-6)
+
+    diff = eos_table.precision_report(tab32, tab, report=False)
+    assert 0.0 < diff["p"][0] < 1.e-6
+
+    # and the inverse still round-trips
+    p = tab32.pres(dens, eint)
+    assert_allclose(tab32.eint(dens, p), eint, rtol=1.e-10)
@@ -0,0 +1,66 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+import compressible.mixture as mixture
+import compressible.preos as preos
+import compressible.thermodynamics_tools as tools
+
+
+def test_single_species():
+
+    # a mixture of a single species is that species
+    mix = mixture.Mixture(["N2", "N2"])
+    pr = preos.peng_robinson_fluid(MW=mix.MW[0], Tc=mix.Tc[0], pc=mix.pc[0],
+                                   omega=mix.omega[0], coef=mix.lowT[0])
+
+    rhoi = np.array([[10.0, 300.0, 50.0], [30.0, 100.0, 1.0]])
+    T = np.array([120.0, 300.0, 900.0])
+
+    rho, Y, X, MW = mix.composition(rhoi)
+    assert_allclose(rho, rhoi.sum(axis=0))
+    assert_allclose(X.sum(axis=0), 1.0)
+    assert_allclose(MW, mix.MW[0])
+
+    for q_mix, q_pr in zip(mix.pr_coefficients(T, X, MW), pr.getThermo(T)):
+        assert_allclose(q_mix, q_pr, rtol=1.e-12)
+
+    R = 8.314/mix.MW[0]
+    assert_allclose(mix.cp_ideal(T, Y), tools.getCp_ideal(mix.lowT[0], T, R), rtol=1.e-12)
+    assert_allclose(mix.h_ideal(T, Y), tools.getH_ideal(mix.lowT[0], T, R), rtol=1.e-12)
+
+
+def test_mixing_rules():
+
+    mix = mixture.Mixture(["N2", "O2", "CO2"], kij=[[0.0, 0.01, 0.0],
+                                                    [0.01, 0.0, 0.0],
+                                                    [0.0, 0.0, 0.0]])
+
+    rhoi = np.array([[[50.0, 1.0]], [[20.0, 2.0]], [[5.0, 300.0]]])
+    T = np.array([[250.0, 1200.0]])
+
+    rho, Y, X, MW = mix.composition(rhoi)
+    a, b, R, dadT, d2adT2 = mix.pr_coefficients(T, X, MW)
+
+    # against the double sum, cell by cell
+    for n in range(2):
+        Tn = T[0,n]
+        x = X[:,0,n]
+        ai = mix.K*(1.0 + mix.kappa*(1.0 - np.sqrt(Tn/mix.Tc)))**2
+        am = sum(x[i]*x[j]*np.sqrt(ai[i]*ai[j])*(1.0 - mix.kij[i,j])
+                 for i in range(3) for j in range(3))
+        assert_allclose(a[0,n], am/MW[0,n]**2, rtol=1.e-12)
+        assert_allclose(b[0,n], np.dot(x, mix.b)/MW[0,n], rtol=1.e-12)
+
+    # the T derivatives against centered differences
+    h = 1.e-4
+    ap = mix.pr_coefficients(T*(1 + h), X, MW)
+    am = mix.pr_coefficients(T*(1 - h), X, MW)
+    assert_allclose(dadT, (ap[0] - am[0])/(2*h*T), rtol=1.e-6)
+    assert_allclose(d2adT2, (ap[3] - am[3])/(2*h*T), rtol=1.e-6)
+
+    # the ideal gas cp is the mass-weighted cp of the species, each
+    # from its own temperature range
+    cp = sum(Y[s]*8.314/mix.MW[s]*
+             np.where(T < mix.Tmid[s], tools.getCp_ideal(mix.lowT[s], T, 1.0),
+                      tools.getCp_ideal(mix.highT[s], T, 1.0)) for s in range(3))
+    assert_allclose(mix.cp_ideal(T, Y), cp, rtol=1.e-12)
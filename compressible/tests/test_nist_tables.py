@@ -0,0 +1,43 @@
+import pickle
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+import compressible.nist_tables as nist_tables
+
+
+def test_nist_tables(tmp_path):
+
+    T = np.linspace(100.0, 1000.0, 91)
+    P = np.array([1.e5, 1.e6, 1.e7])
+    db = {"species": ["N2", "O2"]}
+    for n, name in enumerate(["N2", "O2"]):
+        db[name] = {"info": {"MW": 28.0 + 4*n, "units": "SI"},
+                    "T": T, "P": P,
+                    "rho": np.outer(P, 1.0/T)*(n + 1),
+                    "phase": np.arange(91, dtype=np.int32),
+                    "transport": {"mu": T*1.e-7}}
+
+    pkl = tmp_path/"tables.pkl"
+    with open(str(pkl), "wb") as f:
+        pickle.dump(db, f)
+
+    path = str(tmp_path/"tables.nist")
+    assert nist_tables.convert_pickle([str(pkl)], path) == ["N2", "O2"]
+
+    tab = nist_tables.NISTTable(path)
+    assert tab.species == ["N2", "O2"]
+    assert tab.info("O2") == {"MW": 32.0, "units": "SI"}
+    assert tab.properties("N2") == ["P", "T", "phase", "rho", "transport/mu"]
+
+    for name in ["N2", "O2"]:
+        props = tab.lookup(name)
+        for key in ["T", "P", "rho", "phase"]:
+            assert props[key].dtype == db[name][key].dtype
+            assert_array_equal(props[key], db[name][key])
+        assert_array_equal(props["transport/mu"], db[name]["transport"]["mu"])
+
+    # the properties are read-only views of the file
+    rho = tab.get("O2", "rho")
+    assert isinstance(rho.base, np.memmap) or isinstance(rho, np.memmap)
+    assert not rho.flags.writeable
@@ -0,0 +1,33 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+import compressible.species_db as species_db
+
+
+def test_species_db(tmp_path):
+
+    db = species_db.compile_database()
+
+    species_db._loaded.clear()
+    cached, index = species_db.load(cache_dir=str(tmp_path))
+    assert len(list(tmp_path.glob("species_db_*.npy"))) == 1
+
+    # a second process reads the compiled file back
+    species_db._loaded.clear()
+    loaded, index = species_db.load(cache_dir=str(tmp_path))
+
+    assert loaded.dtype == db.dtype
+    assert loaded.tobytes() == db.tobytes()
+    assert loaded[index["O2"]]["name"] == "O2"
+
+    MW, pcrit, Tcrit, rhocrit, omega = species_db.crit_props("O2")
+    assert (MW, pcrit, Tcrit, omega) == (32.0, 5.0430e6, 154.58, 0.0222)
+
+    # N2 has no molar weight in the critical property database
+    assert np.isclose(species_db.crit_props("N2")[0], 28.014)
+
+    Tbounds, lowT, highT = species_db.nasa_polynomials("c12h26")
+    assert_array_equal(Tbounds, [200., 1000., 1000., 3500.])
+    assert lowT[0] == 3.70187925E+01
+
+    species_db._loaded.clear()
@@ -0,0 +1,57 @@
+import numpy as np
+from numpy.testing import assert_allclose
+
+import compressible.preos as preos
+import compressible.thermodynamics_tools as tools
+
+
+def test_cubic_solver():
+
+    # three, one and double real roots, in one call (the last,
+    # x^3 + x^2 + x + 1 = (x+1)(x^2+1), has a single real root)
+    r = np.array([[3.0, 1.0, -2.0], [2.0, 2.0, -1.0], [0.5, 0.5, 0.5]]).T
+    a = np.array([2.0, 1.0, -1.0, 1.0])
+    b = np.append(-a[:3]*r.sum(axis=0), 1.0)
+    c = np.append(a[:3]*(r[0]*r[1] + r[0]*r[2] + r[1]*r[2]), 1.0)
+    d = np.append(-a[:3]*r.prod(axis=0), 1.0)
+
+    roots = tools.cubicSolver(a, b, c, d)
+
+    assert roots.shape == (3, 4)
+    assert_allclose(roots[:,0], [3.0, 1.0, -2.0], atol=1.e-12)
+    assert_allclose(roots[:,1], [2.0, 2.0, -1.0], atol=1.e-6)
+    assert_allclose(roots[:,2], 0.5, atol=1.e-5)
+
+    assert_allclose(roots[0,3], -1.0, atol=1.e-12)
+    assert np.isnan(roots[1:,3]).all()
+
+    # a scalar cubic
+    assert_allclose(tools.cubicSolver(1.0, -6.0, 11.0, -6.0), [3.0, 2.0, 1.0])
+
+
+def test_density_from_pressure_temperature():
+
+    eos = preos.peng_robinson_fluid()
+
+    # liquid, two-phase region (both sides of the Gibbs switch),
+    # vapor and supercritical states of N2
+    T = np.array([80.0, 110.0, 110.0, 300.0, 150.0])
+    p = np.array([2.e6, 2.e6, 1.e6, 1.e5, 5.e6])
+
+    rho = eos.getRhofromPandT(p, T)
+    assert_allclose(eos.getPfromTandRho(T, rho), p, rtol=1.e-10)
+
+    # the dense root at high p, the light one at low p
+    assert rho[1] > 300.0 and rho[2] < 100.0
+    assert rho[0] > 600.0 and rho[3] < 2.0
+
+    # where there are three roots, the one of least Gibbs energy is taken
+    a, b, R, dadT, d2adT2 = eos.getThermo(T)
+    A, B = a*p/(R*T)**2, b*p/(R*T)
+    Z = tools.cubicSolver(1.0, B - 1.0, A - 3.0*B**2 - 2.0*B, B**3 + B**2 - A*B)
+    s2 = np.sqrt(2.0)
+    with np.errstate(invalid="ignore"):
+        g = Z - 1.0 - np.log(Z - B) - A/(2*s2*B)*np.log((Z + (1 + s2)*B)/(Z + (1 - s2)*B))
+    g = np.where(Z > B, g, np.inf)
+    assert (np.isfinite(g).sum(axis=0)[1:3] == 3).all()
+    assert_allclose(p/(rho*R*T), Z[np.argmin(g, axis=0), np.arange(5)])
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+import mesh.patch as patch
+import compressible.transport as transport
+from util import runparams
+
+
+def test_chung():
+
+    chung = transport.get_model("chung", "Nitrogen")
+    ref = transport.get_model("coolprop", "Nitrogen")
+
+    # dilute gas, and dense gas and liquid states of N2
+    dens = np.array([[1.1, 50.0], [200.0, 600.0]])
+    T = np.array([[300.0, 300.0], [150.0, 100.0]])
+
+    mu, k = chung.evaluate(dens, T)
+    mu_ref, k_ref = ref.evaluate(dens, T)
+
+    assert mu.shape == dens.shape
+    assert_allclose(mu[0], mu_ref[0], rtol=0.02)
+    assert_allclose(k[0], k_ref[0], rtol=0.02)
+    assert_allclose(mu[1], mu_ref[1], rtol=0.15)
+    assert_allclose(k[1], k_ref[1], rtol=0.25)
+
+
+def test_table(tmp_path):
+
+    rp = runparams.RuntimeParameters()
+    rp.load_params(os.path.join(os.path.dirname(transport.__file__), "_defaults"))
+    rp.params.update({"eos.table_cache": 1, "eos.table_cache_dir": str(tmp_path),
+                      "eos.table_nrho": 96, "eos.table_ne": 96,
+                      "transport.table_reference": "chung"})
+
+    tab = transport.get_model("table", "Nitrogen", rp)
+    ref = tab.reference
+
+    dens = np.array([[2.0, 100.0, 400.0], [0.0, 250.0, 700.0]])
+    eint = np.array([[3.0e5, 2.5e5, 1.5e5], [2.0e5, 2.0e5, 1.0e5]])
+
+    mu, k = tab.props(dens, eint)
+    mu_ref, k_ref = ref.props(dens, eint)
+
+    assert_allclose(mu, mu_ref, rtol=0.02)
+    assert_allclose(k, k_ref, rtol=0.02)
+    assert mu[1,0] == 0.0 and k[1,0] == 0.0
+
+    # the second model reads the table back from the cache
+    assert len(list(tmp_path.glob("transport_table_*.bin"))) == 1
+    cached = transport.get_model("table", "Nitrogen", rp)
+    assert isinstance(cached.table.data["mu"], np.memmap)
+    assert_allclose(cached.props(dens, eint)[0], mu, rtol=1.e-14)
+
+
+def test_face_average():
+
+    myg = patch.Grid2d(8, 4, ng=4)
+
+    q = myg.scratch_array()
+    q[:,:] = myg.x2d + 10.0*myg.y2d
+
+    qx = transport.face_average(q, 1)
+    qy = transport.face_average(q, 2)
+
+    # q is linear, so its face averages are its values on the faces
+    assert_allclose(qx.v(), myg.x2d[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1] - 0.5*myg.dx +
+                    10.0*myg.y2d[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1])
+    assert_allclose(qy.v(), myg.x2d[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1] +
+                    10.0*(myg.y2d[myg.ilo:myg.ihi+1, myg.jlo:myg.jhi+1] - 0.5*myg.dy))
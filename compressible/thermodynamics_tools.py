@@ -1,21 +1,19 @@
 '''
  generic tools used for the thermodynamic computations
 '''
-from xml.etree import ElementTree
 import numpy as np
 import pdb
 from mpi4py import MPI
 from pdb import set_trace as keyboard
+import compressible.species_db as species_db
 
 def getMolarFraction(MW_mix,MW,scalar):
-    N_scalars,Nxc = np.shape(scalar)
-    X = np.zeros(np.shape(scalar))
-    if (N_scalars==1):
-      return np.ones(N_scalars)
-    else:
-      for ii in range(self.NSPECIES):
-        X[:,ii] = MW_mix/MW[ii]*scalar[:][ii]
-      return X
+    '''mole fractions X_i = MW_mix/MW_i Y_i of the mass fractions scalar
+      (nspecies, ncells)'''
+    scalar = np.asarray(scalar)
+    if (scalar.shape[0]==1):
+      return np.ones(np.shape(scalar))
+    return MW_mix/np.reshape(MW, (-1, 1))*scalar
 
 def convertMassToMolar(phi,MW):
     #given the MW molar weight [g/mol], compute the mass 
@@ -29,20 +27,15 @@ def getMolecularWeightFluid(MW,scalar):
     '''given the partial densities, compute the MW of single fluid
       @param MW molar weight [g/mol] '''
     N_scalars,Nxc = np.shape(scalar)
-    MW  = np.zeros(Nxc)
-    MW  = np.ones(Nxc)*MW
-    return MW
+    return np.ones(Nxc)*MW
 
 def getMolecularWeightMixture(MW,scalar):
-    '''given the partial densities, compute the MW of mixture'''
+    '''given the mole fractions scalar (nspecies, ncells), compute the MW
+      of mixture (see mixture.py for the full mixture thermodynamics)'''
     N_scalars,Nxc = np.shape(scalar)
-    MW_mix = np.zeros(Nxc)
     if (N_scalars==1):
-      MW_mix = np.ones(Nxc)*MW
-    else:
-      for ii in range(N_scalars):
-        MW_mix += scalar[:][ii]*MW[ii]
-    return MW_mix
+      return np.ones(Nxc)*MW
+    return np.einsum('i,in->n', np.ravel(MW), scalar)
 
 
 def getRhofromV(v,MW):
@@ -62,12 +55,11 @@ def getVfromRho(rho,MW):
 
 #------------------------------------------------------------------
 # Finds the Cp and Cv of the ideal gas. Output in J/(kg K)
+# coef is a single NASA polynomial (7,) or one per cell (ncells, 7)
 #------------------------------------------------------------------
 def getCp_ideal(coef,T,RoM):
-    if not(len(coef.shape) == 2):
-      coef = coef[0]
-      return RoM*(coef[0]  + coef[1]*T + coef[2]*T**2  + coef[3]*T**3  + coef[4]*T**4 )  
-    return RoM*(coef[:,0]  + coef[:,1]*T + coef[:,2]*T**2  + coef[:,3]*T**3  + coef[:,4]*T**4 )
+    coef = np.asarray(coef)
+    return RoM*(coef[...,0]  + coef[...,1]*T + coef[...,2]*T**2  + coef[...,3]*T**3  + coef[...,4]*T**4 )
 
 def getCv_ideal(coef,T,RoM):
     Cp0 = getCp_ideal(coef,T,RoM)
@@ -75,21 +67,8 @@ def getCv_ideal(coef,T,RoM):
     return(Cv0)
 
 def getH_ideal(coef,T,RoM):
-
-#    mpi_rank = MPI.COMM_WORLD.Get_rank()
-#    print "\n ###### ############## ############### \n"
-#    print "\n I am mpi_rank = " + repr(mpi_rank)
-#    print "\n ######  coef.shape" + repr(coef.shape)
-
-    #if (True in np.isnan(T)):
-	#os._exit("NAN found in temperature in processor " + repr(mpi_rank))
-    if not(len(coef.shape) == 2):
-      keyboard()
-      coef = coef[0]
-      H_ideal = T*RoM*(coef[0] + coef[1]*T/2.0 + coef[2]*T**2/3.0 + coef[3]*T**3/4.0 + coef[4] * T**4/5.0+ coef[5] / T)
-      return H_ideal
-    H_ideal = T*RoM*(coef[:,0] + coef[:,1]*T/2.0 + coef[:,2]*T**2/3.0 + coef[:,3]*T**3/4.0 + coef[:,4] * T**4/5.0+ coef[:,5] / T)
-
+    coef = np.asarray(coef)
+    H_ideal = T*RoM*(coef[...,0] + coef[...,1]*T/2.0 + coef[...,2]*T**2/3.0 + coef[...,3]*T**3/4.0 + coef[...,4] * T**4/5.0+ coef[...,5] / T)
     return H_ideal
 
 def getE_ideal(coef,T,RoM):
@@ -97,127 +76,167 @@ def getE_ideal(coef,T,RoM):
 
 
 
-def cubicSolver(a,b,c,d):	
-	# We solve for the equation of the form: 
-	# ax^3 + bx^2 + cx + d =0
-	# Followed the steps in http://www.proofwiki.org/wiki/Cardan%27s_Formula
+def cubicSolver(a,b,c,d):
+  # We solve for the equations of the form
+  #   ax^3 + bx^2 + cx + d = 0
+  # for all the (broadcast) coefficients at once, with Cardan's formula
+  # (http://www.proofwiki.org/wiki/Cardan%27s_Formula) for one real root
+  # and its trigonometric form for three.  The real roots are returned
+  # in decreasing order, as an array of shape (3,) + the shape of the
+  # coefficients; the complex ones are NaN.
+  a, b, c, d = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (a,b,c,d)])
   Q = (3.0*a*c-b**2)/(9.0*a**2)
-  R = (9.0*a*b*c - 27.0*a**2*d - 2.0*b**3)/(54.0*a**3.0)
-  roots=np.zeros([3])
-  D=Q**3.0+R**2.0	
-  if D<0.0:
-    #print "three real roots"		
-    theta=np.arccos(R/np.sqrt(-Q**3))
-    roots[0] = 2.0*np.sqrt(-Q)*np.cos(theta/3)-b/(3*a)
-    roots[1] = 2.0*np.sqrt(-Q)*np.cos(theta/3 + 2.0*np.pi/3.0)-b/(3*a)
-    roots[2] = 2.0*np.sqrt(-Q)*np.cos(theta/3 + 4.0*np.pi/3.0)-b/(3*a)	
-  elif D>0.0:
-    #print "one real and two complex conjugates", a,b,c,d
-    St = R + (Q**3+R**2)**0.5
-    Tt = R - (Q**3+R**2)**0.5
-    S= abs(St)**(1.0/3.0)
-    T= abs(Tt)**(1.0/3.0)
-    if St<0.0: S=-S
-    if Tt<0.0: T=-T
-		
-    roots[0]=   S + T    - b/(3.0*a)
-	#roots[1]= -(S + T)/2.0 - b/(3.0*a) +1j*np.sqrt(3)/2.0*(S-T)
-	#roots[2]= -(S + T)/2.0 - b/(3.0*a) -1j*np.sqrt(3)/2.0*(S-T)
-	
-  else:
-    #print "all real but two are equal"
-    if R>=0.0:	
-      R3 = math.pow(R, 1.0/3.0)
-    elif R<0.0:
-      R3 = - math.pow(abs(R), 1.0/3.0)
-      roots[0] = 2.0*R3 - b/(3.0*a)
-      roots[1] =  -R3 - b/(3.0*a)
-      roots[2] =   x2
-   #print "the Q and R are:", Q,R
-  return(roots)
+  R = (9.0*a*b*c - 27.0*a**2*d - 2.0*b**3)/(54.0*a**3)
+  D = Q**3 + R**2
+  shift = b/(3.0*a)
+  roots = np.full((3,) + a.shape, np.nan)
+
+  # three real roots
+  three = D < 0.0
+  sQ = np.sqrt(np.where(three, -Q, 1.0))
+  theta = np.arccos(np.clip(np.where(three, R/sQ**3, 0.0), -1.0, 1.0))
+  for k in range(3):
+    roots[k] = np.where(three, 2.0*sQ*np.cos((theta + 2.0*k*np.pi)/3.0) - shift, np.nan)
+
+  # one real root and two complex conjugates (or a double root if D=0)
+  sD = np.sqrt(np.where(three, 0.0, D))
+  S = np.cbrt(R + sD)
+  T = np.cbrt(R - sD)
+  roots[0] = np.where(three, roots[0], S + T - shift)
+  double = np.where(D == 0.0, -S - shift, np.nan)
+  roots[1] = np.where(three, roots[1], double)
+  roots[2] = np.where(three, roots[2], double)
+
+  return -np.sort(-roots, axis=0)
+
+
+def getCompressibilityPR(A,B):
+  # The compressibility factor Z = pv/(RT) of the Peng-Robinson fluid at
+  # (p, T), given A = a p/(RT)^2 and B = b p/(RT) (arrays), i.e. the
+  # root of
+  #   Z^3 - (1-B) Z^2 + (A - 3B^2 - 2B) Z - (AB - B^2 - B^3) = 0
+  # with Z > B.  Where there are three, the liquid-like (smallest) or
+  # vapor-like (largest) root is the one of smallest Gibbs energy,
+  #   (g - g_ideal)/RT = Z - 1 - ln(Z-B) - A/(2 sqrt2 B) ln((Z + (1+sqrt2)B)/(Z + (1-sqrt2)B))
+  A = np.asarray(A, dtype=np.float64)
+  B = np.asarray(B, dtype=np.float64)
+  Z = cubicSolver(1.0, B - 1.0, A - 3.0*B**2 - 2.0*B, B**3 + B**2 - A*B)
+
+  s2 = np.sqrt(2.0)
+  valid = Z > B
+  with np.errstate(invalid='ignore', divide='ignore'):
+    g = Z - 1.0 - np.log(Z - B) - A/(2.0*s2*B)*np.log((Z + (1.0 + s2)*B)/(Z + (1.0 - s2)*B))
+  g = np.where(valid, g, np.inf)
+
+  Z = np.take_along_axis(Z, np.argmin(g, axis=0)[np.newaxis], axis=0)[0]
+  return np.where(valid.any(axis=0), Z, np.nan)
 
 
 
-def viscosity_Sutherland(T_in,muref,Tref,Sref):
-  return muref*(T_in/Tref)**(3./2.)*((Tref+Sref)/(T_in+Sref))
+#------------------------------------------------------------------
+# Vectorized, safeguarded Newton solver for the temperature
+#------------------------------------------------------------------
+# running totals over all the solves, see newtonSolveT
+newton_stats = {'calls': 0, 'cells': 0, 'iterations': 0,
+                'cell_iterations': 0, 'bisections': 0, 'unconverged': 0}
 
+def resetNewtonStats():
+  for key in newton_stats:
+    newton_stats[key] = 0
 
+def newtonSolveT(func, target, T_guess=300.0, T_min=20.0, T_max=1.0e4,
+                 xtol=1.0e-10, maxiter=50, stats=None):
+  ''' Solves func(T) = target for the temperature in every cell, where
+      func is increasing in T (e.g. e(T) or p(T) at fixed density).
 
-def readCritPropDatabase(path_CritProp,specie):
-  ''' Reads the critical property database'''
-  species =[]
-  Pcrit=[] 
-  Tcrit=[]
-  rhocrit=[]
-  omega =[]
-  Gasphase=[]
-  dipole=[]
-  MW=[]
-  f = open(path_CritProp, 'r')
-  lines = f.readlines()
-  for line in lines[6:46]:     #I am lazy...I should add the correct MW
-    splitline=line.split()
-    species.append(splitline[0])
-    Pcrit.append(float(splitline[2]))
-    Tcrit.append(float(splitline[3]))
-    rhocrit.append(float(splitline[4]))
-    omega.append(float(splitline[5]))
-    dipole.append(float(splitline[6]))
-    MW.append(float(splitline[7]))  
-  index=species.index(specie)
-  return MW[index],Pcrit[index],Tcrit[index], rhocrit[index],omega[index] 
+      Each cell is frozen as soon as its Newton step falls below
+      xtol*T, so the work of an iteration is proportional to the number
+      of cells still converging.  Every cell keeps a bracket [lo, hi]
+      of its root, tightened with the sign of the residual at each
+      iterate; a Newton step that leaves the bracket (or is not finite)
+      is replaced by a bisection step, so the iteration cannot diverge.
 
+      @param func     func(T, idx) -> (f, dfdT), evaluated for the cells
+                      idx (indices into the flattened target) only
+      @param target   the value of func to solve for (array)
+      @param T_guess  initial guess: a scalar or an array of the shape of
+                      target, e.g. the temperature of the previous step
+      @param T_min    lower end of the initial bracket [K]
+      @param T_max    upper end of the initial bracket [K]
+      @param stats    optional dict, filled with the statistics of this
+                      solve (the running totals are kept in newton_stats)
+      @return T       the temperature, with the shape of target '''
 
-def parse_database_xml(path_NASA,myspecie):
-  ''' Reads the NASA polynomial database and outputs the temperature bounds and the coefficiants'''
+  target = np.asarray(target, dtype=np.float64)
+  shape = target.shape
+  target = target.ravel()
+  n = target.size
+
+  T = np.empty(n)
+  T[:] = np.ravel(T_guess)
+  T = np.clip(T, T_min, T_max)
+
+  lo = np.full(n, T_min)
+  hi = np.full(n, T_max)
+
+  act = np.arange(n)
+  itera = 0
+  cell_itera = 0
+  nbisect = 0
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    while act.size > 0 and itera < maxiter:
+      itera += 1
+      cell_itera += act.size
 
+      T_a = T[act]
+      f, dfdT = func(T_a, act)
+      res = f - target[act]
 
-  if myspecie.lower() == 'c12h26':
-    # Manual read for dodecane	>>> Not available in xml database
-    tempBounds = np.array([200.,1000.,1000.,3500.])
-    lowT = np.array([3.70187925E+01, 5.54721488E-02, -1.92079548E-05, 3.08175574E-09, -1.84800617E-13, -5.26984458E+04, -1.61453501E+02])
-    highT = np.array([2.13264480E+01, -3.86394002E-02, 3.99476113E-04, -5.06681097E-07, 2.00697878E-10, -4.22475053E+04, -4.85848300E+01])
+      # f is increasing in T, so the sign of the residual tells us on
+      # which side of the root we are
+      above = res > 0.0
+      hi[act] = np.where(above, T_a, hi[act])
+      lo[act] = np.where(above, lo[act], T_a)
 
-  elif myspecie.lower() == 'r134a':
-    # Manual read for R-134a (C2H2F4)	>>> Not available in xml database
-    tempBounds = np.array([200.,1000.,1000.,6000.])
-    lowT = np.array([2.29239681, 0.030310848, -5.33714E-6, -2.19457E-8, 1.2997E-11, -111790.431, 16.2830568])
-    highT = np.array([12.5551115, 0.008401861, -3.12077E-6, 5.12285E-10, -3.1011E-14, -114846.319, -38.0374329])
+      T_n = T_a - res/dfdT
 
+      outside = ~np.isfinite(T_n) | (T_n < lo[act]) | (T_n > hi[act])
+      T_n[outside] = 0.5*(lo[act][outside] + hi[act][outside])
+      nbisect += int(np.count_nonzero(outside))
 
-  else:
-	  #ElementTree to open the database
-	  document = ElementTree.parse(path_NASA)
+      T[act] = T_n
 
-	  #Find all the species elements
-	  species=document.findall(".//species")
+      converged = np.abs(T_n - T_a) <= xtol*T_a
+      act = act[~converged]
 
-	  #Loop to ID the desired specie
-	  selected=-1
-	  for specie in species:
-	    if specie.attrib.get('name')==myspecie:
-	      selected=specie
+  call_stats = {'calls': 1, 'cells': n, 'iterations': itera,
+                'cell_iterations': cell_itera, 'bisections': nbisect,
+                'unconverged': act.size}
 
+  for key in newton_stats:
+    newton_stats[key] += call_stats[key]
 
-	  if selected==-1: 
-	    quit("Species () was not found in the database")
+  if stats is not None:
+    stats.update(call_stats)
 
-	  # the database structure tells us that 'thermo' is the third
-	  thermo=selected[2]
+  return T.reshape(shape)
 
-	  # Temperature bounds
-	  tempBounds=np.zeros(4)
-	  tempBounds[0]=thermo[0].attrib.get('Tmin')
-	  tempBounds[1]=thermo[0].attrib.get('Tmax')
-	  tempBounds[2]=thermo[1].attrib.get('Tmin')
-	  tempBounds[3]=thermo[1].attrib.get('Tmax')
 
-	  lowT=[float(x) for x in thermo[0][0].text.replace("\n", "").split(",")]
-	  highT=[float(x) for x in thermo[1][0].text.replace("\n", "").split(",")]
-	  lowT = np.array(lowT)
-	  highT = np.array(highT)
+def viscosity_Sutherland(T_in,muref,Tref,Sref):
+  return muref*(T_in/Tref)**(3./2.)*((Tref+Sref)/(T_in+Sref))
 
-  return   tempBounds,lowT,highT
 
 
+def readCritPropDatabase(path_CritProp,specie):
+  ''' Reads the critical property database: MW, Pcrit, Tcrit, rhocrit
+      and omega of the species.  The database is compiled once (see
+      species_db.py), so this is a dict lookup after the first call'''
+  return species_db.crit_props(specie, crit_path=path_CritProp)
 
+
+def parse_database_xml(path_NASA,myspecie):
+  ''' Reads the NASA polynomial database and outputs the temperature
+      bounds and the coefficiants (from the compiled database, see
+      species_db.py)'''
+  return species_db.nasa_polynomials(myspecie, nasa_path=path_NASA)
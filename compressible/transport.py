@@ -0,0 +1,384 @@
+"""
+The transport properties: the dynamic viscosity mu [Pa s] and the
+thermal conductivity k [W/(m K)] of one fluid.  As the EOS backends
+(see eos_backends.py), every model has the same vectorized interface,
+on arrays of any shape -- cell-centered fields, the interface states of
+the flux computation, or the face averages of face_average():
+
+  evaluate(dens, T)    mu and k at (rho, T)
+  props(dens, eint)    mu and k at (rho, e), with T from the EOS in use
+                       (eos.state), or a single lookup for the table
+
+The model is chosen with the runtime parameters
+
+  [transport]
+  model = chung
+
+where model is one of
+
+  sutherland   Sutherland's law for mu, and k = cp mu / Pr with the
+               ideal gas cp -- dilute gases only
+  chung        the dense-fluid correlations of Chung et al., Ind. Eng.
+               Chem. Res. 27, 671 (1988), for mu and k, from the
+               critical properties of the species database
+  coolprop     the CoolProp reference correlations
+  table        the model transport.table_reference, tabulated in
+               (rho, e) on the grid of the EOS table (the eos.table_*
+               bounds) and interpolated with eos_table.EOSTable, so a
+               lookup costs what an EOS table lookup does
+
+and the fluid is eos.fluid.  Cells with dens < 0.1 (the empty cells of
+the solids) get mu = k = 0.  Other models are added with register().
+
+  model = get_model("chung", "Nitrogen", rp)
+  mu, k = model.props(dens, eint)
+  mu_x = face_average(mu, 1)
+
+"""
+
+from __future__ import print_function
+
+import os
+
+import numpy as np
+
+import CoolProp.CoolProp as CP
+
+import compressible.eos as eos
+import compressible.eos_backends as eos_backends
+import compressible.eos_table as eos_table
+import compressible.species_db as species_db
+import compressible.thermodynamics_tools as tools
+from util import msg
+
+
+# the species database names of the fluids of eos_backends.fluids
+species = {"Nitrogen": "N2", "Oxygen": "O2", "CarbonDioxide": "CO2"}
+
+
+def face_average(q, idir):
+    """
+    The arithmetic average of the cell-centered field q (an
+    ArrayIndexer) on the faces normal to idir (1 = x, 2 = y), indexed as
+    the fluxes: face i is between the cells i-1 and i.
+    """
+    myg = q.g
+    f = myg.scratch_array()
+    b = myg.ng - 1
+    if idir == 1:
+        f.v(buf=b)[:,:] = 0.5*(q.ip(-1, buf=b) + q.v(buf=b))
+    else:
+        f.v(buf=b)[:,:] = 0.5*(q.jp(-1, buf=b) + q.v(buf=b))
+    return f
+
+
+class TransportModel(object):
+    """
+    the interface of the transport models.  Each model sets the name it
+    is registered under.
+    """
+
+    name = None
+
+    def __init__(self, fluid, rp=None):
+        """
+        Set up the transport properties of a fluid.
+
+        Parameters
+        ----------
+        fluid : str
+            The CoolProp name of the fluid
+        rp : RuntimeParameters object, optional
+            The runtime parameters, for the models that have options
+
+        """
+        self.fluid = fluid
+
+    def key(self):
+        """
+        the description of this model that the cached tables are keyed
+        by: anything that changes the results must be in it
+        """
+        return {"model": self.name, "fluid": self.fluid}
+
+    def evaluate(self, dens, T):
+        """ mu and k, given the density and temperature """
+        raise NotImplementedError()
+
+    def props(self, dens, eint):
+        """ mu and k, given the density and specific internal energy """
+        dens = np.asarray(dens, dtype=np.float64)
+        valid = dens >= 0.1
+        T = eos.state(np.where(valid, dens, 1.0), eint)[1]
+        mu, k = self.evaluate(np.where(valid, dens, 1.0), np.where(valid, T, 300.0))
+        return np.where(valid, mu, 0.0), np.where(valid, k, 0.0)
+
+
+class SutherlandTransport(TransportModel):
+    """
+    Sutherland's law, mu = muref (T/Tref)^3/2 (Tref + S)/(T + S), with a
+    constant Prandtl number
+    """
+
+    name = "sutherland"
+
+    def __init__(self, fluid, rp=None):
+        TransportModel.__init__(self, fluid, rp)
+
+        MW, _, _, _, self.coef = eos_backends.fluid_constants(fluid)
+        self.R = 8.314/MW
+
+        if rp is None:
+            self.muref, self.Tref, self.Sref, self.Pr = 1.716e-5, 273.15, 110.4, 0.7
+        else:
+            self.muref = rp.get_param("transport.sutherland_muref")
+            self.Tref = rp.get_param("transport.sutherland_tref")
+            self.Sref = rp.get_param("transport.sutherland_sref")
+            self.Pr = rp.get_param("transport.prandtl")
+
+    def key(self):
+        k = TransportModel.key(self)
+        k.update(muref=self.muref, Tref=self.Tref, Sref=self.Sref, Pr=self.Pr)
+        return k
+
+    def evaluate(self, dens, T):
+        T = np.asarray(T, dtype=np.float64)
+        mu = tools.viscosity_Sutherland(T, self.muref, self.Tref, self.Sref)
+        k = tools.getCp_ideal(self.coef, T, self.R)*mu/self.Pr
+        return mu, k
+
+
+class ChungTransport(TransportModel):
+    """
+    the dense-fluid correlations of Chung et al. (1988), as given in
+    Poling, Prausnitz and O'Connell, The Properties of Gases and
+    Liquids, 5th ed., eqs. 9-6.18 and 10-5.5 (nonpolar, non-associating
+    fluids unless the species database gives a dipole moment)
+    """
+
+    name = "chung"
+
+    # the coefficients a_i, b_i, c_i, d_i of E_i (viscosity) and B_i
+    # (conductivity) = a_i + b_i omega + c_i mu_r^4 + d_i kappa
+    _E = np.array([[6.32402, 50.41190, -51.68010, 1189.02000],
+                   [0.0012102, -0.0011536, -0.0062571, 0.037283],
+                   [5.28346, 254.20900, -168.48100, 3898.27000],
+                   [6.62263, 38.09570, -8.46414, 31.41780],
+                   [19.74540, 7.63034, -14.35440, 31.52670],
+                   [-1.89992, -12.53670, 4.98529, -18.15070],
+                   [24.27450, 3.44945, -11.29130, 69.34660],
+                   [0.79716, 1.11764, 0.012348, -4.11661],
+                   [-0.23816, 0.067695, -0.81630, 4.02528],
+                   [0.068629, 0.34793, 0.59256, -0.72663]])
+
+    _B = np.array([[2.4166, 0.74824, -0.91858, 121.72],
+                   [-0.50924, -1.5094, -49.991, 69.983],
+                   [6.6107, 5.6207, 64.760, 27.039],
+                   [14.543, -8.9139, -5.6379, 74.344],
+                   [0.79274, 0.82019, -0.69369, 6.3173],
+                   [-5.8634, 12.801, 9.5893, 65.529],
+                   [91.089, 128.11, -54.217, 523.81]])
+
+    def __init__(self, fluid, rp=None):
+        TransportModel.__init__(self, fluid, rp)
+
+        MW, self.Tc, _, self.omega, self.coef = eos_backends.fluid_constants(fluid)
+        self.M = 1.e3*MW                    # [g/mol]
+
+        if fluid not in species:
+            msg.fail("ERROR: no species database entry for fluid {}".format(fluid))
+        rhoc = species_db.crit_props(species[fluid])[3]
+        dipole = float(species_db.lookup(species[fluid])["dipole"])
+
+        self.Vc = self.M/rhoc*1.e3          # [cm^3/mol]
+        self.mur = 131.3*np.nan_to_num(dipole)/np.sqrt(self.Vc*self.Tc)
+        self.kappa = 0.0
+
+        self.Fc = 1.0 - 0.2756*self.omega + 0.059035*self.mur**4 + self.kappa
+
+        x = np.array([1.0, self.omega, self.mur**4, self.kappa])
+        self.E = np.dot(self._E, x)
+        self.B = np.dot(self._B, x)
+
+    @staticmethod
+    def _G2(A, y, G1):
+        """ the density function G2 (H2 for the conductivity) of the coefficients A """
+        return (A[0]*(1.0 - np.exp(-A[3]*y))/y + A[1]*G1*np.exp(A[4]*y) + A[2]*G1) / \
+            (A[0]*A[3] + A[1] + A[2])
+
+    def evaluate(self, dens, T):
+        dens = np.asarray(dens, dtype=np.float64)
+        T = np.asarray(T, dtype=np.float64)
+        E, B = self.E, self.B
+
+        Ts = 1.2593*T/self.Tc
+        omega_v = (1.16145*Ts**-0.14874 + 0.52487*np.exp(-0.77320*Ts) +
+                   2.16178*np.exp(-2.43787*Ts) -
+                   6.435e-4*Ts**0.14874*np.sin(18.0323*Ts**-0.76830 - 7.27371))
+
+        # the reduced density, from the molar density [mol/cm^3]
+        y = 1.e-3*dens/self.M*self.Vc/6.0
+        G1 = (1.0 - 0.5*y)/(1.0 - y)**3
+
+        # viscosity [micropoise]
+        G2 = self._G2(E, y, G1)
+        eta2 = E[6]*y**2*G2*np.exp(E[7] + E[8]/Ts + E[9]/Ts**2)
+        eta = (np.sqrt(Ts)/omega_v*self.Fc*(1.0/G2 + E[5]*y) + eta2) * \
+            36.344*np.sqrt(self.M*self.Tc)/self.Vc**(2.0/3.0)
+
+        # the low pressure viscosity [Pa s]
+        eta0 = 4.0785e-6*self.Fc*np.sqrt(self.M*T)/(self.Vc**(2.0/3.0)*omega_v)
+
+        alpha = tools.getCp_ideal(self.coef, T, 1.0) - 2.5
+        beta = 0.7862 - 0.7109*self.omega + 1.3168*self.omega**2
+        Z = 2.0 + 10.5*(T/self.Tc)**2
+        psi = 1.0 + alpha*(0.215 + 0.28288*alpha - 1.061*beta + 0.26665*Z) / \
+            (0.6366 + beta*Z + 1.061*alpha*beta)
+
+        H2 = self._G2(B, y, G1)
+        q = 3.586e-3*np.sqrt(self.Tc/(1.e-3*self.M))/self.Vc**(2.0/3.0)
+        k = 31.2*eta0*psi/(1.e-3*self.M)*(1.0/H2 + B[5]*y) + \
+            q*B[6]*y**2*np.sqrt(T/self.Tc)*H2
+
+        return 1.e-7*eta, k
+
+
+class CoolPropTransport(TransportModel):
+    """
+    the CoolProp viscosity and conductivity, evaluated like the
+    CoolProp EOS backend
+    """
+
+    name = "coolprop"
+
+    def __init__(self, fluid, rp=None):
+        TransportModel.__init__(self, fluid, rp)
+        self._cp = eos_backends.CoolPropEOS(fluid)
+
+    def key(self):
+        k = TransportModel.key(self)
+        k["version"] = CP.get_global_param_string("version")
+        return k
+
+    def evaluate(self, dens, T):
+        return self._cp._eval(CP.DmassT_INPUTS, dens, T,
+                              [CP.iviscosity, CP.iconductivity])
+
+    def props(self, dens, eint):
+        valid = np.asarray(dens) >= 0.1
+        mu, k = self._cp._eval(CP.DmassUmass_INPUTS, dens, eint,
+                               [CP.iviscosity, CP.iconductivity], valid)
+        mu[~valid] = 0.0
+        k[~valid] = 0.0
+        return mu, k
+
+
+class TableTransport(TransportModel):
+    """
+    the model transport.table_reference, tabulated in (rho, e) over the
+    range of the eos.table_* parameters (with T from the EOS in use),
+    stored in float32 if eos.float32 is set, and kept in
+    eos.table_cache_dir if eos.table_cache is set.  evaluate(dens,
+    T) is passed on to the reference model.
+    """
+
+    name = "table"
+
+    def __init__(self, fluid, rp=None):
+        TransportModel.__init__(self, fluid, rp)
+
+        self.reference = get_model(rp.get_param("transport.table_reference"), fluid, rp)
+
+        rho_min = rp.get_param("eos.table_rho_min")
+        rho_max = rp.get_param("eos.table_rho_max")
+        nrho = rp.get_param("eos.table_nrho")
+        e_min = rp.get_param("eos.table_e_min")
+        e_max = rp.get_param("eos.table_e_max")
+        ne = rp.get_param("eos.table_ne")
+        interp = rp.get_param("eos.table_interp")
+        dtype = np.float32 if rp.get_param("eos.float32") else np.float64
+
+        path = None
+        if rp.get_param("eos.table_cache"):
+            name = eos_table.table_key(transport=self.reference.key(),
+                                       eos=eos.get_backend().key(),
+                                       rho_min=rho_min, rho_max=rho_max, nrho=nrho,
+                                       e_min=e_min, e_max=e_max, ne=ne,
+                                       dtype=np.dtype(dtype).name)
+            cache_dir = os.path.expanduser(rp.get_param("eos.table_cache_dir"))
+            path = os.path.join(cache_dir, "transport_table_{}.bin".format(name))
+            if os.path.isfile(path):
+                self.table = eos_table.load_table(path, interp=interp)
+                if self.table is not None:
+                    return
+
+        rho = rho_min + (rho_max - rho_min)/(nrho - 1)*np.arange(nrho)
+        e = e_min + (e_max - e_min)/(ne - 1)*np.arange(ne)
+        rho2d, e2d = np.meshgrid(rho, e, indexing="ij")
+
+        mu, k = self.reference.props(rho2d, e2d)
+        self.table = eos_table.EOSTable(rho_min, rho_max, e_min, e_max,
+                                        {"mu": mu, "k": k}, interp=interp)
+        if dtype != np.float64:
+            ref = self.table
+            self.table = ref.astype(dtype)
+            eos_table.precision_report(self.table, ref)
+
+        if path is not None:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            eos_table.save_table(self.table, path, meta={"transport": self.reference.key()})
+            self.table = eos_table.load_table(path, interp=interp)
+
+    def key(self):
+        k = TransportModel.key(self)
+        k["reference"] = self.reference.key()
+        return k
+
+    def evaluate(self, dens, T):
+        return self.reference.evaluate(dens, T)
+
+    def props(self, dens, eint):
+        mu, k = self.table.lookup(dens, eint, ["mu", "k"])
+        low = np.asarray(dens) < 0.1
+        mu[low] = 0.0
+        k[low] = 0.0
+        return mu, k
+
+
+# the registered models, by name
+models = {}
+
+def register(name, cls):
+    """
+    Register a transport model class (a subclass of TransportModel)
+    under name, the value of transport.model that selects it.
+    """
+    models[name] = cls
+
+for _cls in [SutherlandTransport, ChungTransport, CoolPropTransport, TableTransport]:
+    register(_cls.name, _cls)
+
+
+def get_model(name, fluid, rp=None):
+    """
+    Create the transport model registered under name, for a fluid.
+
+    Parameters
+    ----------
+    name : str
+        The name of the model (transport.model)
+    fluid : str
+        The CoolProp name of the fluid (eos.fluid)
+    rp : RuntimeParameters object, optional
+        The runtime parameters, for the models that have options
+
+    Returns
+    -------
+    out : TransportModel object
+
+    """
+    if name not in models:
+        msg.fail("ERROR: transport model {} unknown, the models are {}".format(
+            name, ", ".join(sorted(models))))
+    return models[name](fluid, rp)
@@ -17,6 +17,31 @@ discussed in the Colella paper).
   use_flattening   = 1 to use the multidimensional flattening
                      algorithm at shocks
 
+  batched_eos      = 1 to evaluate the EOS for all the interface
+                     states at once in python and pass p, gamma and
+                     c to the Fortran kernels as arrays, instead of
+                     having the kernels call back into python for
+                     every interface (the CGF solver takes a second
+                     EOS call, for the gamma of its star states)
+
+  eos.backend      = pr_native to evaluate the EOS inside the Fortran
+                     kernels with the Peng-Robinson module of
+                     preos.f90 (this supersedes batched_eos); with the
+                     other backends of eos_backends.py the kernels
+                     call back into the backend
+
+  double_flux      = 1 to use the double-flux model (Abgrall & Karni
+                     2001, Ma, Lv & Ihme 2017): in each cell, the EOS
+                     is frozen to the gamma-law rho e = p/(gamma* - 1)
+                     + rho e0* that matches it at the start of the
+                     step, with gamma* = rho c^2/p.  Each interface is
+                     solved with the frozen EOS of the cell on either
+                     side, so that a cell only sees fluxes of its own
+                     EOS and contacts keep the pressure uniform.  The
+                     RK stages make no EOS calls at all; the energy is
+                     reset to the real EOS at the end of the step (see
+                     simulation.py)
+
   delta, z0, z1      these are the flattening parameters.  The default
                      are the values listed in Colella 1990.
 
@@ -136,12 +161,11 @@ import thermodynamics_tools as tools
 from util import msg
 from CoolProp.CoolProp import PropsSI
 from CoolProp.CoolProp import PhaseSI
-fluid = 'Nitrogen'
 import preos_cy as PREOS
 #import preos 
 #PREOS = preos.peng_robinson_fluid()
 
-def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
+def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt, frozen=None):
     """
     unsplitFluxes returns the fluxes through the x and y interfaces by
     doing an unsplit reconstruction of the interface values and then
@@ -166,11 +190,17 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
         The timers we are using to profile
     dt : float
         The timestep we are advancing through.
+    frozen : (ndarray, ndarray), optional
+        The double-flux cell fields gamma* and e0* (see
+        double_flux_fields).  If given, the fluxes are those of the
+        double-flux model
 
     Returns
     -------
     out : ndarray, ndarray
-        The fluxes on the x- and y-interfaces
+        The fluxes on the x- and y-interfaces.  With the double-flux
+        model, each is a pair (F_lo, F_hi) of the fluxes seen by the
+        cell below (i-1 or j-1) and above (i or j) the interface
 
     """
 
@@ -191,7 +221,12 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     ymom = my_data.get_var("y-momentum")
     ener = my_data.get_var("energy")
 
-    r, u, v, p = my_data.get_var("primitive")
+    # the primitive variables and the sound speed come from the same
+    # EOS evaluation -- or from the frozen EOS of the double-flux model
+    if frozen is not None:
+        r, u, v, p, c = frozen_primitives(my_data, frozen)
+    else:
+        r, u, v, p, c = my_data.get_var(["primitive", "soundspeed"])
     smallp = 1.e-10
     p = p.clip(smallp)   # apply a floor to the pressure
 
@@ -244,17 +279,59 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     tm_states = tc.timer("interfaceStates")
     tm_states.begin()
 
-    V_l, V_r = interface_f.states(1, myg.qx, myg.qy, myg.ng, myg.dx, dt,
-                                  ivars.nvar,
-                                  speed,
-                                  r, u, v, p,
-                                  ldelta_rx, ldelta_ux, ldelta_vx, ldelta_px)
+    batched_eos = rp.get_param("compressible.batched_eos")
+
+    # with the Fortran EOS, the kernels evaluate the EOS themselves and
+    # the python callbacks are never called
+    native_eos = int(eos.get_backend().native)
+    if native_eos:
+        batched_eos = 0
+        if not interface_f.pr_eos.pr_initialized:
+            msg.fail("ERROR: the Fortran PR EOS is not set up (pr_eos.pr_init was not called)")
+
+    # the double-flux model passes the frozen gamma* to the batched
+    # kernels and never calls the EOS at the interfaces
+    double_flux = frozen is not None
+    if double_flux:
+        batched_eos = 1
+        native_eos = 0
+
+        gstar, e0star = frozen
+
+        # the frozen EOS of the cells below (lo) and above (hi) each
+        # interface
+        frames_x = [(_lower(gstar, 1), _lower(e0star, 1)), (gstar, e0star)]
+        frames_y = [(_lower(gstar, 2), _lower(e0star, 2)), (gstar, e0star)]
+
+    if batched_eos:
+        # the cell-centered sound speed, evaluated once for both
+        # directions
+        cs = myg.scratch_array()
+        cs[:,:] = 1.0
+        cs.v(buf=2)[:,:] = c.v(buf=2)
+
+        V_l, V_r = interface_f.states_batched(1, myg.qx, myg.qy, myg.ng, myg.dx, dt,
+                                              ivars.nvar,
+                                              r, u, v, p, cs,
+                                              ldelta_rx, ldelta_ux, ldelta_vx, ldelta_px)
+    else:
+        V_l, V_r = interface_f.states(1, myg.qx, myg.qy, myg.ng, myg.dx, dt,
+                                      ivars.nvar, native_eos,
+                                      speed,
+                                      r, u, v, p,
+                                      ldelta_rx, ldelta_ux, ldelta_vx, ldelta_px)
 
     tm_states.end()
 
-    # transform interface states back into conserved variables
-    U_xl = comp.prim_to_cons(V_l, gamma, ivars, myg)
-    U_xr = comp.prim_to_cons(V_r, gamma, ivars, myg)
+    # transform interface states back into conserved variables -- with
+    # the double-flux model, each with the frozen EOS of the cell it
+    # comes from
+    if double_flux:
+        U_xl = prim_to_cons_frozen(V_l, frames_x[0], ivars, myg)
+        U_xr = prim_to_cons_frozen(V_r, frames_x[1], ivars, myg)
+    else:
+        U_xl = comp.prim_to_cons(V_l, gamma, ivars, myg)
+        U_xr = comp.prim_to_cons(V_r, gamma, ivars, myg)
 
     #=========================================================================
     # y-direction
@@ -264,18 +341,28 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     # left and right primitive variable states
     tm_states.begin()
 
-    V_l, V_r = interface_f.states(2, myg.qx, myg.qy, myg.ng, myg.dy, dt,
-                                  ivars.nvar,
-                                  speed,
-                                  r, u, v, p,
-                                  ldelta_ry, ldelta_uy, ldelta_vy, ldelta_py)
+    if batched_eos:
+        V_l, V_r = interface_f.states_batched(2, myg.qx, myg.qy, myg.ng, myg.dy, dt,
+                                              ivars.nvar,
+                                              r, u, v, p, cs,
+                                              ldelta_ry, ldelta_uy, ldelta_vy, ldelta_py)
+    else:
+        V_l, V_r = interface_f.states(2, myg.qx, myg.qy, myg.ng, myg.dy, dt,
+                                      ivars.nvar, native_eos,
+                                      speed,
+                                      r, u, v, p,
+                                      ldelta_ry, ldelta_uy, ldelta_vy, ldelta_py)
 
     tm_states.end()
 
 
     # transform interface states back into conserved variables
-    U_yl = comp.prim_to_cons(V_l, gamma, ivars, myg)
-    U_yr = comp.prim_to_cons(V_r, gamma, ivars, myg)
+    if double_flux:
+        U_yl = prim_to_cons_frozen(V_l, frames_y[0], ivars, myg)
+        U_yr = prim_to_cons_frozen(V_r, frames_y[1], ivars, myg)
+    else:
+        U_yl = comp.prim_to_cons(V_l, gamma, ivars, myg)
+        U_yr = comp.prim_to_cons(V_r, gamma, ivars, myg)
 
     #=========================================================================
     # apply source terms
@@ -316,25 +403,42 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     riemann = rp.get_param("compressible.riemann")
     riemann = "CGF"
     if riemann == "HLLC":
-        riemannFunc = interface_f.riemann_hllc
+        if batched_eos:
+            riemannFunc = interface_f.riemann_hllc_batched
+        else:
+            riemannFunc = interface_f.riemann_hllc
     elif riemann == "CGF":
-        riemannFunc = interface_f.riemann_cgf
+        if batched_eos:
+            riemannFunc = interface_f.riemann_cgf_batched
+        else:
+            riemannFunc = interface_f.riemann_cgf
     else:
         msg.fail("ERROR: Riemann solver undefined")
 
-    _fx = riemannFunc(1, myg.qx, myg.qy, myg.ng,
-                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
-                      solid.xl, solid.xr,
-                      real_gamma, pres, U_xl, U_xr)
+    tm_eos = tc.timer("interfaceEOS")
 
-    _fy = riemannFunc(2, myg.qx, myg.qy, myg.ng,
-                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
-                      solid.yl, solid.yr,
-                      real_gamma, pres, U_yl, U_yr)
+    if double_flux:
+        F_x = frozen_fluxes(riemannFunc, 1, U_xl, U_xr, frames_x, ivars, solid, myg)
+        F_y = frozen_fluxes(riemannFunc, 2, U_yl, U_yr, frames_y, ivars, solid, myg)
+
+    elif batched_eos:
+        _fx, _fy = batched_fluxes(riemannFunc, U_xl, U_xr, U_yl, U_yr,
+                                  ivars, solid, myg, tm_eos)
+    else:
+        _fx = riemannFunc(1, myg.qx, myg.qy, myg.ng,
+                          ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                          solid.xl, solid.xr, native_eos,
+                          real_gamma, pres, U_xl, U_xr)
+
+        _fy = riemannFunc(2, myg.qx, myg.qy, myg.ng,
+                          ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                          solid.yl, solid.yr, native_eos,
+                          real_gamma, pres, U_yl, U_yr)
+
+    if not double_flux:
+        F_x = ai.ArrayIndexer(d=_fx, grid=myg)
+        F_y = ai.ArrayIndexer(d=_fy, grid=myg)
 
-    F_x = ai.ArrayIndexer(d=_fx, grid=myg)
-    F_y = ai.ArrayIndexer(d=_fy, grid=myg)    
-    
     tm_riem.end()
     #keyboard()
     #=========================================================================
@@ -392,23 +496,32 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     
     b = (2,1)
 
+    # a cell sees the fluxes of its own frozen EOS: the lo flux
+    # through its upper face and the hi flux through its lower face
+    if double_flux:
+        F_x_lo, F_x_hi = F_x
+        F_y_lo, F_y_hi = F_y
+    else:
+        F_x_lo = F_x_hi = F_x
+        F_y_lo = F_y_hi = F_y
+
     for n in range(ivars.nvar):
             
         # U_xl[i,j,:] = U_xl[i,j,:] - 0.5*dt/dy * (F_y[i-1,j+1,:] - F_y[i-1,j,:])
         U_xl.v(buf=b, n=n)[:,:] += \
-            - 0.5*dtdy*(F_y.ip_jp(-1, 1, buf=b, n=n) - F_y.ip(-1, buf=b, n=n))
+            - 0.5*dtdy*(F_y_lo.ip_jp(-1, 1, buf=b, n=n) - F_y_hi.ip(-1, buf=b, n=n))
 
         # U_xr[i,j,:] = U_xr[i,j,:] - 0.5*dt/dy * (F_y[i,j+1,:] - F_y[i,j,:])
         U_xr.v(buf=b, n=n)[:,:] += \
-            - 0.5*dtdy*(F_y.jp(1, buf=b, n=n) - F_y.v(buf=b, n=n))
+            - 0.5*dtdy*(F_y_lo.jp(1, buf=b, n=n) - F_y_hi.v(buf=b, n=n))
 
         # U_yl[i,j,:] = U_yl[i,j,:] - 0.5*dt/dx * (F_x[i+1,j-1,:] - F_x[i,j-1,:])
         U_yl.v(buf=b, n=n)[:,:] += \
-            - 0.5*dtdx*(F_x.ip_jp(1, -1, buf=b, n=n) - F_x.jp(-1, buf=b, n=n))
+            - 0.5*dtdx*(F_x_lo.ip_jp(1, -1, buf=b, n=n) - F_x_hi.jp(-1, buf=b, n=n))
 
         # U_yr[i,j,:] = U_yr[i,j,:] - 0.5*dt/dx * (F_x[i+1,j,:] - F_x[i,j,:])
         U_yr.v(buf=b, n=n)[:,:] += \
-            - 0.5*dtdx*(F_x.ip(1, buf=b, n=n) - F_x.v(buf=b, n=n))
+            - 0.5*dtdx*(F_x_lo.ip(1, buf=b, n=n) - F_x_hi.v(buf=b, n=n))
         
     tm_transverse.end()
 
@@ -422,19 +535,28 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     #keyboard()
     tm_riem.begin()
 
-    _fx = riemannFunc(1, myg.qx, myg.qy, myg.ng,
-                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
-                      solid.xl, solid.xr,
-                      real_gamma, pres, U_xl, U_xr)
+    if double_flux:
+        F_x = frozen_fluxes(riemannFunc, 1, U_xl, U_xr, frames_x, ivars, solid, myg)
+        F_y = frozen_fluxes(riemannFunc, 2, U_yl, U_yr, frames_y, ivars, solid, myg)
 
-    _fy = riemannFunc(2, myg.qx, myg.qy, myg.ng,
-                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
-                      solid.yl, solid.yr,
-                      real_gamma, pres, U_yl, U_yr)
+    elif batched_eos:
+        _fx, _fy = batched_fluxes(riemannFunc, U_xl, U_xr, U_yl, U_yr,
+                                  ivars, solid, myg, tm_eos)
+    else:
+        _fx = riemannFunc(1, myg.qx, myg.qy, myg.ng,
+                          ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                          solid.xl, solid.xr, native_eos,
+                          real_gamma, pres, U_xl, U_xr)
+
+        _fy = riemannFunc(2, myg.qx, myg.qy, myg.ng,
+                          ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                          solid.yl, solid.yr, native_eos,
+                          real_gamma, pres, U_yl, U_yr)
+
+    if not double_flux:
+        F_x = ai.ArrayIndexer(d=_fx, grid=myg)
+        F_y = ai.ArrayIndexer(d=_fy, grid=myg)
 
-    F_x = ai.ArrayIndexer(d=_fx, grid=myg)
-    F_y = ai.ArrayIndexer(d=_fy, grid=myg)
-    
     tm_riem.end()
     #keyboard()
     #=========================================================================
@@ -450,7 +572,25 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     avisco_y = ai.ArrayIndexer(d=_ay, grid=myg)    
     
     b = (2,1)
-    
+
+    if double_flux:
+        # the energy jump is taken with the frozen EOS of each flux,
+        # so that the viscosity keeps a uniform pressure uniform too
+        for idir, avisco, F_pair, frames in [(1, avisco_x, F_x, frames_x),
+                                             (2, avisco_y, F_y, frames_y)]:
+            for F, frame in zip(F_pair, frames):
+                for n in range(ivars.nvar):
+                    if n == ivars.iener:
+                        jump = frozen_energy_jump(r, u, v, p, frame, idir, b)
+                    else:
+                        var = my_data.get_var_by_index(n)
+                        jump = _lower(var, idir).v(buf=b) - var.v(buf=b)
+
+                    F.v(buf=b, n=n)[:,:] += avisco.v(buf=b)*jump
+
+        tm_flux.end()
+        return F_x, F_y
+
     for n in range(ivars.nvar):
         # F_x = F_x + avisco_x * (U(i-1,j) - U(i,j))
         var = my_data.get_var_by_index(n)
@@ -466,78 +606,390 @@ def unsplit_fluxes(my_data, my_aux, rp, ivars, solid, tc, dt):
     #keyboard()
     return F_x, F_y
 
-eqnst = 'coolprop'
-
-if eqnst == 'PREOS':
-
-  def pres(densener):
-    densener[1] = tools.convertMassToMolar(densener[1], 28.0134)
-    T_in = PREOS.getTfromEandRho(densener[1],densener[0])
-    p = PREOS.getPfromTandRho(T_in, densener[0])
-
-    #pressure = PropsSI('P', 'UMASS', densener[1],'DMASS', densener[0], fluid)
-    #pressure = np.array(pressure, order = 'F')
-    return p
-
-  def real_gamma(denspres):
-    #T_in = PREOS.getTfromPandRho(denspres[1], denspres[0])
-    sos = PREOS.getSos([denspres[1], denspres[0]])
-
-    #sos = PropsSI('A', 'P', denspres[1], 'DMASS', denspres[0], fluid)
-    rg = np.array((sos**2)*denspres[0]/denspres[1], order = 'F')
-    return rg
-
-  def speed(prho):
-    #print prho
-    #T_in = PREOS.getTfromPandRho(prho[1], prho[0])
-    sos = PREOS.getSos([prho[0], prho[1]])
-
-    #sos = PropsSI('A', 'P', prho[0], 'DMASS', prho[1], "Oxygen")
-    #sos = np.array(sos, order = 'F')
-    return sos
-
-elif eqnst == 'coolprop':
-
-  def pres(densener):
-    # MW = 28.0314
-    # vol = tools.getVfromRho(densener[0], MW)
-    # keyboard()
-    # T_in = PREOS.NewtonIterate_TemperaturefromEv(densener[1],vol, T_in,eps=1E-6,omega=1.0)
-    # p = PREOS.getPressurefromVolumeTemperature(vol,T_in)
-    pressure = PropsSI('P', 'UMASS', densener[1],'DMASS', densener[0], fluid)
-    #pressure = np.array(pressure, order = 'F')
-    #print "The thermodynamic state is, ", densener, 
-    #print "Pressure: ", pressure
-    return pressure
-
-  def real_gamma(denspres):
-    #print "[ density, pressure ]"
-    #print denspres
-    #T_in = PREOS.NewtonIterate_TemperaturefromPrho(denspres[0], denspres[1], T_in = 300.0, eps= 1E-10, omega = 1.0)
-    #sos = PREOS.getSpeedOfSound(denspres[1], T_in)
-    sos = PropsSI('A', 'P', denspres[1], 'DMASS', denspres[0], fluid)
-    rg = np.array((sos**2)*denspres[0]/denspres[1], order = 'F')
-    return rg
-
-  def speed(prho):
-    #T_in = PREOS.NewtonIterate_TemperaturefromPrho(prho[1], prho[0], T_in = 300.0, eps= 1E-10, omega = 1.0)
-    #sos = PREOS.getSpeedOfSound(prho[0], T_in)
-    sos = PropsSI('A', 'P', prho[0], 'DMASS', prho[1], fluid)
-    sos = np.array(sos, order = 'F')
-    return sos
-
-elif eqnst == 'ideal':
-
-  def pres(densener):
-    rhoe_l = densener[0]*densener[1]
-    pressure = rhoe_l*(1.4 - 1.0)
-
-    return pressure
-
-  def real_gamma(denspres):
-    rg = 1.4
-    return rg
-
-  def speed(prho):
-    sos = np.sqrt(1.4*prho[0]/prho[1])
-    return sos
\ No newline at end of file
+
+def double_flux_fields(my_data, dtype=np.float64):
+    """
+    The frozen EOS of the double-flux model: in each cell, gamma* =
+    rho c^2/p and e0* = e - p/(rho (gamma* - 1)), so that the gamma-law
+    rho e = p/(gamma* - 1) + rho e0* has the pressure and the sound
+    speed of the real EOS at the cell state.  These come from the
+    single EOS evaluation of the derived primitive variables, once per
+    step: all the RK stages share them, since a linear combination of
+    increments of different frozen EOS would not keep the pressure of
+    a contact uniform.
+
+    Parameters
+    ----------
+    my_data : CellCenterData2d object
+        The state at the start of the step
+    dtype : dtype, optional
+        The type gamma* is stored as.  e0* is always float64, and is
+        computed from the rounded gamma*, so that the frozen EOS gives
+        the pressure of the cell exactly (rounding e0* to float32 would
+        put noise of ~1.e-6 p in a uniform pressure)
+
+    Returns
+    -------
+    out : ndarray, ndarray
+        gamma* and e0*
+
+    """
+
+    smallp = 1.e-10
+
+    ener = my_data.get_var("energy")
+    r, u, v, p, c = my_data.get_var(["primitive", "soundspeed"])
+    p = p.clip(smallp)
+
+    e = (ener - 0.5*r*(u**2 + v**2))/r
+
+    # cells outside of the EOS (e.g. of the low-density floor) keep a
+    # gamma-law all the same
+    gstar = np.where(c > 0.0, c**2*r/p, 1.4)
+    gstar = np.asarray(np.maximum(gstar, 1.0 + 1.e-6), dtype=dtype)
+
+    e0star = e - p/(r*(gstar - 1.0))
+
+    return ai.ArrayIndexer(d=gstar, grid=my_data.grid), \
+        ai.ArrayIndexer(d=np.asarray(e0star, dtype=np.float64), grid=my_data.grid)
+
+
+def frozen_primitives(my_data, frozen):
+    """
+    the primitive variables rho, u, v, p and the sound speed of
+    my_data with the frozen EOS of the double-flux model
+    """
+
+    gstar, e0star = frozen
+
+    dens = my_data.get_var("density")
+    xmom = my_data.get_var("x-momentum")
+    ymom = my_data.get_var("y-momentum")
+    ener = my_data.get_var("energy")
+
+    u = xmom/dens
+    v = ymom/dens
+
+    p = (gstar - 1.0)*(ener - 0.5*dens*(u**2 + v**2) - dens*e0star)
+    c = np.sqrt(gstar*np.maximum(p, 1.e-10)/dens)
+
+    return dens, u, v, p, c
+
+
+def reset_energy(my_data, frozen, ivars):
+    """
+    Reset the total energy of the valid cells of my_data, updated with
+    the double-flux fluxes, to the real EOS: the pressure follows from
+    the frozen EOS of the fluxes, p = (gamma* - 1)(rho e - rho e0*),
+    and rho e from the real EOS at (rho, p).
+
+    Parameters
+    ----------
+    my_data : CellCenterData2d object
+        The updated state
+    frozen : (ndarray, ndarray)
+        gamma* and e0* the fluxes were computed with
+    ivars : Variables object
+        The Variables object that tells us which indices refer to which
+        variables
+
+    """
+
+    smallp = 1.e-10
+
+    gstar, e0star = frozen
+
+    dens = my_data.get_var("density").v()
+    xmom = my_data.get_var("x-momentum").v()
+    ymom = my_data.get_var("y-momentum").v()
+    ener = my_data.get_var("energy").v()
+
+    ekin = 0.5*(xmom**2 + ymom**2)/dens
+
+    p = (gstar.v() - 1.0)*(ener - ekin - dens*e0star.v())
+    p = np.maximum(p, smallp)
+
+    ener[:,:] = eos.rhoe(dens, p) + ekin
+
+
+def prim_to_cons_frozen(q, frame, ivars, myg):
+    """
+    convert primitive interface states to conserved variables with the
+    frozen EOS frame = (gamma*, e0*) of the double-flux model
+    """
+
+    gstar, e0star = frame
+
+    U = myg.scratch_array(nvar=ivars.nvar)
+
+    U[:,:,ivars.idens] = q[:,:,ivars.irho]
+    U[:,:,ivars.ixmom] = q[:,:,ivars.iu]*U[:,:,ivars.idens]
+    U[:,:,ivars.iymom] = q[:,:,ivars.iv]*U[:,:,ivars.idens]
+
+    rhoe = q[:,:,ivars.ip]/(gstar - 1.0) + q[:,:,ivars.irho]*e0star
+
+    U[:,:,ivars.iener] = rhoe + 0.5*q[:,:,ivars.irho]*(q[:,:,ivars.iu]**2 +
+                                                       q[:,:,ivars.iv]**2)
+
+    if ivars.naux > 0:
+        U[:,:,ivars.irhox] = q[:,:,ivars.ix]*q[:,:,ivars.irho]
+
+    return U
+
+
+def frozen_fluxes(riemannFunc, idir, U_l, U_r, frames, ivars, solid, myg):
+    """
+    Solve the Riemann problems through the idir interfaces once with
+    each of the frozen EOS of frames = [(gamma*, e0*) below, (gamma*,
+    e0*) above].  U_l and U_r hold the interface states with the
+    frozen EOS of their own cell; their pressure is kept and their
+    energy is recast with the EOS of the solve.
+
+    Returns
+    -------
+    out : (ndarray, ndarray)
+        The fluxes with the EOS of the cell below and above
+
+    """
+
+    smallp = 1.e-10
+
+    if idir == 1:
+        lower_solid, upper_solid = solid.xl, solid.xr
+    else:
+        lower_solid, upper_solid = solid.yl, solid.yr
+
+    # the outermost ghost states are never set (zero density); they
+    # are not used by the Riemann solvers
+    with np.errstate(invalid="ignore", divide="ignore"):
+
+        # the pressure of each state, from the EOS of its own cell
+        p_l = np.maximum(_frozen_pres(U_l, frames[0], ivars), smallp)
+        p_r = np.maximum(_frozen_pres(U_r, frames[1], ivars), smallp)
+
+        UU = [(_recast(U_l, p_l, gstar, e0star, ivars),
+               _recast(U_r, p_r, gstar, e0star, ivars)) for gstar, e0star in frames]
+
+    fluxes = []
+    for (gstar, _), (UU_l, UU_r) in zip(frames, UU):
+
+        # with a gamma-law EOS, the star states have the same gamma
+        thermo = [p_l, p_r, gstar, gstar]
+        if riemannFunc is interface_f.riemann_cgf_batched:
+            thermo += [gstar, gstar]
+
+        _f = riemannFunc(idir, myg.qx, myg.qy, myg.ng,
+                         ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                         lower_solid, upper_solid,
+                         UU_l, UU_r, *thermo)
+
+        fluxes.append(ai.ArrayIndexer(d=_f, grid=myg))
+
+    return tuple(fluxes)
+
+
+def frozen_energy_jump(r, u, v, p, frame, idir, b):
+    """
+    the jump rho E(i-1) - rho E(i) (or j) of the cell energies
+    recast with the frozen EOS frame of the interfaces
+    """
+
+    gstar, e0star = frame
+
+    def ener(q):
+        r_, u_, v_, p_ = q
+        return p_/(gstar.v(buf=b) - 1.0) + r_*e0star.v(buf=b) + 0.5*r_*(u_**2 + v_**2)
+
+    return ener([_lower(a, idir).v(buf=b) for a in (r, u, v, p)]) - \
+        ener([a.v(buf=b) for a in (r, u, v, p)])
+
+
+def _frozen_pres(U, frame, ivars):
+    """ the pressure of the conserved states U with the frozen EOS frame """
+    gstar, e0star = frame
+    rho = U[:,:,ivars.idens]
+    rhoe = U[:,:,ivars.iener] - 0.5*(U[:,:,ivars.ixmom]**2 + U[:,:,ivars.iymom]**2)/rho
+    return (gstar - 1.0)*(rhoe - rho*e0star)
+
+
+def _recast(U, p, gstar, e0star, ivars):
+    """ U with the energy of pressure p with the frozen EOS (gstar, e0star) """
+    UU = U.copy()
+    rho = U[:,:,ivars.idens]
+    UU[:,:,ivars.iener] = p/(gstar - 1.0) + rho*e0star + \
+        0.5*(U[:,:,ivars.ixmom]**2 + U[:,:,ivars.iymom]**2)/rho
+    return UU
+
+
+def _lower(a, idir):
+    """
+    a cell-centered array shifted by one cell, so that its [i,j] entry
+    is a[i-1,j] (idir = 1) or a[i,j-1] (idir = 2), as the interface
+    arrays are indexed
+    """
+    s = a.copy()
+    if idir == 1:
+        s[1:,:] = a[:-1,:]
+    else:
+        s[:,1:] = a[:,:-1]
+    return s
+
+
+def batched_fluxes(riemannFunc, U_xl, U_xr, U_yl, U_yr, ivars, solid, myg, tm_eos):
+    """
+    Solve the Riemann problems through the x and y interfaces with one
+    of the batched kernels, riemann_cgf_batched or
+    riemann_hllc_batched.  The thermodynamics of the interface states
+    come from one vectorized EOS call (interface_thermo); the CGF
+    solver also needs the effective gamma of its star states, which
+    takes a second one (star_gamma).
+
+    Returns
+    -------
+    out : (ndarray, ndarray)
+        The x and y fluxes
+
+    """
+
+    tm_eos.begin()
+    (p_xl, g_xl), (p_xr, g_xr), (p_yl, g_yl), (p_yr, g_yr) = \
+        interface_thermo([U_xl, U_xr, U_yl, U_yr], ivars, myg)
+    tm_eos.end()
+
+    thermo_x = [p_xl, p_xr, g_xl, g_xr]
+    thermo_y = [p_yl, p_yr, g_yl, g_yr]
+
+    if riemannFunc is interface_f.riemann_cgf_batched:
+        rs_xl, rs_xr, ps_x = interface_f.riemann_cgf_star(
+            1, myg.qx, myg.qy, myg.ng,
+            ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+            U_xl, U_xr, *thermo_x)
+
+        rs_yl, rs_yr, ps_y = interface_f.riemann_cgf_star(
+            2, myg.qx, myg.qy, myg.ng,
+            ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+            U_yl, U_yr, *thermo_y)
+
+        tm_eos.begin()
+        gs_xl, gs_xr, gs_yl, gs_yr = \
+            star_gamma([rs_xl, rs_xr, rs_yl, rs_yr], [ps_x, ps_x, ps_y, ps_y], myg)
+        tm_eos.end()
+
+        thermo_x += [gs_xl, gs_xr]
+        thermo_y += [gs_yl, gs_yr]
+
+    _fx = riemannFunc(1, myg.qx, myg.qy, myg.ng,
+                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                      solid.xl, solid.xr,
+                      U_xl, U_xr, *thermo_x)
+
+    _fy = riemannFunc(2, myg.qx, myg.qy, myg.ng,
+                      ivars.nvar, ivars.idens, ivars.ixmom, ivars.iymom, ivars.iener,
+                      solid.yl, solid.yr,
+                      U_yl, U_yr, *thermo_y)
+
+    return _fx, _fy
+
+
+def star_gamma(rho_states, p_states, myg):
+    """
+    The effective ratio of specific heats, gamma = rho c^2 / p, of a
+    list of (rho, p) star states of the CGF solver (from
+    riemann_cgf_star), with one vectorized eos.sound call.  As in
+    interface_thermo, only the interfaces that the Riemann solvers use
+    are evaluated.
+
+    Returns
+    -------
+    out : list of ndarray
+        gamma for each of the states
+
+    """
+
+    b = 1
+
+    rho = np.concatenate([ai.ArrayIndexer(d=r, grid=myg).v(buf=b) for r in rho_states])
+    p = np.concatenate([ai.ArrayIndexer(d=p_s, grid=myg).v(buf=b) for p_s in p_states])
+
+    gamma = eos.sound(p, rho)**2*rho/p
+
+    out = []
+    for g_s in np.split(gamma, len(rho_states)):
+        g_full = myg.scratch_array()
+        g_full[:,:] = 1.0
+        g_full.v(buf=b)[:,:] = g_s
+        out.append(g_full)
+
+    return out
+
+
+def interface_thermo(U_states, ivars, myg):
+    """
+    Evaluate the pressure and the effective ratio of specific heats,
+    gamma = rho c^2 / p, of a list of conserved interface states with
+    one vectorized eos.state call.  The states are stacked together, so the
+    EOS sees a single array no matter how many states are passed.
+    This replaces the per-interface pres and real_gamma callbacks from
+    the Riemann solvers.
+
+    Only the interfaces that the Riemann solvers use (one ghost cell
+    around the valid region) are evaluated.
+
+    Parameters
+    ----------
+    U_states : list of ndarray
+        The conserved interface states
+    ivars : Variables object
+        The Variables object that tells us which indices refer to which
+        variables
+    myg : Grid2d object
+        The grid
+
+    Returns
+    -------
+    out : list of (ndarray, ndarray)
+        The pressure and gamma for each of the states
+
+    """
+
+    smallp = 1.e-10
+
+    b = 1
+
+    rho = np.concatenate([U.v(buf=b, n=ivars.idens) for U in U_states])
+    mx = np.concatenate([U.v(buf=b, n=ivars.ixmom) for U in U_states])
+    my = np.concatenate([U.v(buf=b, n=ivars.iymom) for U in U_states])
+    E = np.concatenate([U.v(buf=b, n=ivars.iener) for U in U_states])
+
+    e = (E - 0.5*(mx**2 + my**2)/rho)/rho
+
+    p, _, _, gamma = eos.state(rho, e)
+    p = np.maximum(p, smallp)
+
+    thermo = []
+    for p_s, g_s in zip(np.split(p, len(U_states)), np.split(gamma, len(U_states))):
+        p_full = myg.scratch_array()
+        p_full[:,:] = smallp
+        p_full.v(buf=b)[:,:] = p_s
+
+        g_full = myg.scratch_array()
+        g_full[:,:] = 1.0
+        g_full.v(buf=b)[:,:] = g_s
+
+        thermo.append((p_full, g_full))
+
+    return thermo
+
+# the callbacks of the Fortran kernels, which evaluate the EOS of one
+# interface state at a time.  They call the EOS backend of eos.py
+# directly, so that single states do not go through the memoization
+
+def pres(densener):
+  return eos.direct("pres")(densener[0], densener[1])
+
+def real_gamma(denspres):
+  sos = eos.direct("sound")(denspres[1], denspres[0])
+  return sos**2*denspres[0]/denspres[1]
+
+def speed(prho):
+  return eos.direct("sound")(prho[0], prho[1])
@@ -26,6 +26,12 @@ calls.
 
 tc.report() prints out a summary of the timing.
 
+Other statistics (e.g. cache hit rates) can be added to the report:
+
+tc.add_report('my stats', func)
+
+where func() returns the lines to print.
+
 Warning: At present, no enforcement is done to ensure proper
 nesting.
 
@@ -42,6 +48,7 @@ class TimerCollection(object):
         Initialize the collection of timers
         """
         self.timers = []
+        self.reports = []
 
 
     def timer(self, name):
@@ -81,6 +88,24 @@ class TimerCollection(object):
         return t_new
 
 
+    def add_report(self, name, func):
+        """
+        Add a section to the report.  If one with that name already
+        exists, it is replaced.
+
+        Parameters
+        ----------
+        name : str
+            Name of the section
+        func : function
+            Called with no arguments when the report is generated,
+            returns a list of the lines to print
+
+        """
+        self.reports = [r for r in self.reports if r[0] != name]
+        self.reports.append((name, func))
+
+
     def report(self):
         """
         Generate a timing summary report
@@ -90,6 +115,11 @@ class TimerCollection(object):
         for t in self.timers:
             print(t.stack_count*spacing + t.name + ': ', t.elapsed_time)
 
+        for name, func in self.reports:
+            print(name + ':')
+            for line in func():
+                print(spacing + line)
+
 
 class Timer(object):
 